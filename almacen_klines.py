@@ -0,0 +1,196 @@
+# almacen_klines.py
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from parser_klines import DTYPE_KLINES, intervalo_a_ms, klines_a_array
+
+# --- CONFIGURACIÓN DEL ALMACÉN ---
+DIRECTORIO_KLINES = 'datos_klines'
+# Tope de velas por (símbolo, intervalo) para que los intervalos pequeños no crezcan sin límite
+MAX_VELAS_ALMACENADAS = 2600000  # 30 días de velas de 1s
+
+MS_POR_DIA = 24 * 60 * 60 * 1000
+
+
+class TramosDescargados:
+    """
+    Velas descargadas por tramos (p. ej. las ventanas en disco de descarga_historica) que el
+    almacén escribe una a una, sin juntarlas en memoria. `tramos()` devuelve cada vez un
+    iterable nuevo con los tramos en orden; `al_confirmar()` se llama cuando el almacén ya ha
+    guardado las velas (p. ej. para borrar los puntos de control de la descarga).
+    """
+
+    def __init__(self, tramos, al_confirmar=None):
+        self._tramos = tramos
+        self._al_confirmar = al_confirmar
+
+    def __iter__(self):
+        return iter(self._tramos())
+
+    def confirmar(self):
+        if self._al_confirmar is not None:
+            self._al_confirmar()
+
+
+def _como_tramos(resultado):
+    """TramosDescargados de lo que devuelve una función de descarga (lista de listas, array o tramos)."""
+    if isinstance(resultado, TramosDescargados):
+        return resultado
+    datos = klines_a_array(resultado)
+    return TramosDescargados(lambda: [datos])
+
+
+class AlmacenKlines:
+    """
+    Almacén local de velas por (símbolo, intervalo).
+
+    Cada par se guarda como un fichero .npy (leído con mmap) más un pequeño fichero .json con
+    el inicio de la historia que ya está cubierta. En las siguientes ejecuciones solo se
+    descarga la cola que falta desde el último 'Open Time' guardado. Las velas se escriben
+    tramo a tramo en el fichero, así una historia larga nunca está entera en memoria.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_KLINES, max_velas=MAX_VELAS_ALMACENADAS):
+        self.directorio = directorio
+        self.max_velas = max_velas
+        self._locks = {}
+        self._lock_global = threading.Lock()
+
+    def _lock(self, simbolo, intervalo):
+        with self._lock_global:
+            return self._locks.setdefault((simbolo, intervalo), threading.Lock())
+
+    def _rutas(self, simbolo, intervalo):
+        base = os.path.join(self.directorio, intervalo, simbolo)
+        return base + '.npy', base + '.json'
+
+    def leer(self, simbolo, intervalo):
+        """Devuelve (datos, inicio_cubierto) o (None, None) si el par no está almacenado."""
+        ruta_datos, ruta_meta = self._rutas(simbolo, intervalo)
+        if not (os.path.exists(ruta_datos) and os.path.exists(ruta_meta)):
+            return None, None
+        try:
+            with open(ruta_meta) as f:
+                meta = json.load(f)
+            datos = np.load(ruta_datos, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            print(f"Almacén de velas corrupto para {simbolo} {intervalo}, se descargará de nuevo: {e}")
+            return None, None
+        return datos, meta['inicio_cubierto']
+
+    def simbolos_guardados(self, intervalo):
+        """Símbolos que tienen velas almacenadas para `intervalo`."""
+        directorio = os.path.join(self.directorio, intervalo)
+        if not os.path.isdir(directorio):
+            return []
+        return sorted(nombre[:-len('.npy')] for nombre in os.listdir(directorio)
+                      if nombre.endswith('.npy') and not nombre.endswith('.tmp.npy'))
+
+    def _escribir_temporal(self, simbolo, intervalo, partes, inicio_cubierto):
+        """
+        Copia en el fichero temporal los tramos de `partes` (iterables de arrays que se pueden
+        recorrer dos veces), quitando las velas más antiguas por encima de max_velas. Devuelve
+        los metadatos que hay que guardar, o None si no hay velas.
+        """
+        ruta_datos, _ = self._rutas(simbolo, intervalo)
+        os.makedirs(os.path.dirname(ruta_datos), exist_ok=True)
+
+        def tramos():
+            for parte in partes:
+                for tramo in parte:
+                    if len(tramo):
+                        yield tramo
+
+        total = sum(len(tramo) for tramo in tramos())
+        if not total:
+            return None
+        saltar = max(0, total - self.max_velas)
+        destino = np.lib.format.open_memmap(ruta_datos + '.tmp.npy', mode='w+', dtype=DTYPE_KLINES,
+                                            shape=(total - saltar,))
+        posicion = 0
+        for tramo in tramos():
+            if saltar >= len(tramo):
+                saltar -= len(tramo)
+                continue
+            tramo = tramo[saltar:]
+            saltar = 0
+            destino[posicion:posicion + len(tramo)] = tramo
+            posicion += len(tramo)
+        destino.flush()
+
+        if total > self.max_velas:
+            inicio_cubierto = int(destino['Open Time'][0])
+        meta = {'inicio_cubierto': int(inicio_cubierto), 'ultimo_open_time': int(destino['Open Time'][-1])}
+        del destino
+        return meta
+
+    def _confirmar(self, simbolo, intervalo, meta):
+        """Sustituye los ficheros del par por los temporales (os.replace, atómico)."""
+        ruta_datos, ruta_meta = self._rutas(simbolo, intervalo)
+        os.replace(ruta_datos + '.tmp.npy', ruta_datos)
+        with open(ruta_meta + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(ruta_meta + '.tmp', ruta_meta)
+
+    def guardar(self, simbolo, intervalo, datos, inicio_cubierto):
+        """
+        Escribe las velas de forma atómica (fichero temporal + os.replace). `datos` es un array
+        o unos TramosDescargados.
+        """
+        meta = self._escribir_temporal(simbolo, intervalo, [_como_tramos(datos)], inicio_cubierto)
+        if meta is not None:
+            self._confirmar(simbolo, intervalo, meta)
+
+    def obtener(self, simbolo, intervalo, dias, funcion_descarga):
+        """
+        Devuelve las velas de los últimos `dias` días (admite decimales) leyendo del almacén.
+
+        `funcion_descarga(inicio)` debe devolver las klines desde `inicio` (timestamp en ms),
+        ya sea como lista de listas, como array estructurado o como TramosDescargados
+        (descarga_historica.descargar_historia). Los tramos se confirman después de guardarlos.
+        El resultado es una vista (mmap) del fichero del almacén.
+        """
+        return self.obtener_desde(simbolo, intervalo, int(time.time() * 1000 - dias * MS_POR_DIA),
+                                  funcion_descarga)
+
+    def obtener_desde(self, simbolo, intervalo, inicio, funcion_descarga):
+        """Como obtener, pero con el inicio de la historia explícito (timestamp en ms)."""
+        intervalo_ms = intervalo_a_ms(intervalo) or 0
+
+        with self._lock(simbolo, intervalo):
+            guardados, inicio_cubierto = self.leer(simbolo, intervalo)
+
+            if guardados is not None and len(guardados) and inicio_cubierto <= inicio + intervalo_ms:
+                # Solo falta la cola: se vuelve a pedir la última vela porque pudo guardarse sin cerrar
+                nuevos = _como_tramos(funcion_descarga(int(guardados['Open Time'][-1])))
+                primero = next((int(tramo['Open Time'][0]) for tramo in nuevos if len(tramo)), None)
+                if primero is None:
+                    partes = []
+                else:
+                    partes = [[guardados[:np.searchsorted(guardados['Open Time'], primero)]], nuevos]
+            else:
+                # Sin historia suficiente: descarga completa del rango pedido
+                nuevos = _como_tramos(funcion_descarga(inicio))
+                inicio_cubierto = inicio
+                partes = [nuevos]
+
+            meta = self._escribir_temporal(simbolo, intervalo, partes, inicio_cubierto) if partes else None
+            del guardados, partes  # liberar el mmap antes de reemplazar el fichero
+            if meta is not None:
+                self._confirmar(simbolo, intervalo, meta)
+            # Los puntos de control de la descarga solo se borran con las velas ya en el almacén
+            nuevos.confirmar()
+            datos, _ = self.leer(simbolo, intervalo)
+
+        if datos is None:
+            return np.empty(0, dtype=DTYPE_KLINES)
+        return datos[np.searchsorted(datos['Open Time'], inicio):]
+
+
+# Almacén compartido por app.py y main.py
+almacen_global = AlmacenKlines()
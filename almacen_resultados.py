@@ -0,0 +1,218 @@
+# almacen_resultados.py
+#
+# Resultados de los escaneos en una base SQLite indexada por ejecución, fecha, intervalo y
+# categoría. Sustituye a los CSV con fecha en el nombre: la última ejecución es una consulta
+# por índice y el CSV se genera al descargarlo.
+#
+# Importar los CSV antiguos: python almacen_resultados.py importar [directorio]
+
+import glob
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+from estrategias import ESTRATEGIA_POR_DEFECTO
+
+# --- CONFIGURACIÓN DEL ALMACÉN DE RESULTADOS ---
+RUTA_RESULTADOS = 'resultados_escaneos.db'
+COLUMNAS_RESULTADOS = ('simbolo', 'estrategia', 'score', 'precio_cierre', 'rsi', 'vol_ratio',
+                       'temporalidades', 'num_temporalidades')
+# Los resultados sin estrategia (CSV importados) son de la estrategia flexible
+VALORES_POR_DEFECTO = {'estrategia': ESTRATEGIA_POR_DEFECTO}
+FORMATO_FECHA = '%Y-%m-%d_%H-%M-%S'
+COLUMNAS_ORDENABLES = ('score', 'rsi', 'vol_ratio')
+
+# analisis_binance_[categoria_]intervalo[-intervalo...]_Ndias_fecha.csv (webapp y main.py)
+PATRON_CSV = re.compile(r"analisis_binance_(?:(?P<categoria>[a-z0-9_]+?)_)?"
+                        r"(?P<intervalo>\d+[smhdwM](?:-\d+[smhdwM])*)_(?P<dias>\d+)dias_"
+                        r"(?P<fecha>\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})\.csv$")
+
+_almacen = None
+_lock_almacen = threading.Lock()
+
+
+class AlmacenResultados:
+    """
+    Una fila por ejecución (tabla `ejecuciones`) y una por candidato y estrategia (tabla
+    `resultados`). La comparten la webapp, main.py y gemini-analysis.py.
+    """
+
+    def __init__(self, ruta=RUTA_RESULTADOS):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, timeout=30)
+        self._conexion.row_factory = sqlite3.Row
+        with self._lock, self._conexion:
+            self._conexion.execute("""
+                CREATE TABLE IF NOT EXISTS ejecuciones (
+                    id TEXT PRIMARY KEY,
+                    creado REAL NOT NULL,
+                    intervalo TEXT NOT NULL,
+                    categoria TEXT NOT NULL,
+                    dias INTEGER NOT NULL,
+                    num_resultados INTEGER NOT NULL
+                )
+            """)
+            self._conexion.execute("""
+                CREATE TABLE IF NOT EXISTS resultados (
+                    ejecucion_id TEXT NOT NULL REFERENCES ejecuciones (id),
+                    simbolo TEXT NOT NULL,
+                    estrategia TEXT NOT NULL,
+                    score REAL NOT NULL,
+                    precio_cierre REAL,
+                    rsi REAL,
+                    vol_ratio REAL,
+                    temporalidades TEXT,
+                    num_temporalidades INTEGER,
+                    PRIMARY KEY (ejecucion_id, estrategia, simbolo)
+                )
+            """)
+            self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_ejecuciones_creado ON ejecuciones (creado)")
+            self._conexion.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ejecuciones_intervalo ON ejecuciones (intervalo, creado)")
+            self._conexion.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ejecuciones_categoria ON ejecuciones (categoria, creado)")
+            for columna in COLUMNAS_ORDENABLES:
+                self._conexion.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_resultados_{columna} ON resultados (ejecucion_id, {columna})")
+
+    def guardar_ejecucion(self, resultados, intervalo, categoria, dias, ejecucion_id=None, creado=None):
+        """Guarda los candidatos de un escaneo (dicts con COLUMNAS_RESULTADOS) y devuelve el id."""
+        ejecucion_id = ejecucion_id or uuid.uuid4().hex[:12]
+        creado = creado if creado is not None else time.time()
+        filas = [(ejecucion_id, *(r.get(columna, VALORES_POR_DEFECTO.get(columna)) for columna in COLUMNAS_RESULTADOS))
+                 for r in resultados]
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO ejecuciones VALUES (?, ?, ?, ?, ?, ?)",
+                (ejecucion_id, creado, intervalo, categoria, math.ceil(float(dias)), len(filas)))
+            self._conexion.execute("DELETE FROM resultados WHERE ejecucion_id = ?", (ejecucion_id,))
+            self._conexion.executemany(
+                f"INSERT INTO resultados (ejecucion_id, {', '.join(COLUMNAS_RESULTADOS)}) "
+                f"VALUES ({', '.join('?' * (len(COLUMNAS_RESULTADOS) + 1))})", filas)
+        return ejecucion_id
+
+    def ultima_ejecucion(self, intervalo=None, categoria=None):
+        """Ejecución más reciente (opcionalmente de un intervalo y/o categoría) o None."""
+        condiciones = []
+        parametros = []
+        if intervalo is not None:
+            condiciones.append("intervalo = ?")
+            parametros.append(intervalo)
+        if categoria is not None:
+            condiciones.append("categoria = ?")
+            parametros.append(categoria)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+        with self._lock:
+            fila = self._conexion.execute(
+                f"SELECT * FROM ejecuciones {where} ORDER BY creado DESC LIMIT 1", parametros).fetchone()
+        return dict(fila) if fila is not None else None
+
+    def obtener_ejecucion(self, ejecucion_id):
+        with self._lock:
+            fila = self._conexion.execute("SELECT * FROM ejecuciones WHERE id = ?", (ejecucion_id,)).fetchone()
+        return dict(fila) if fila is not None else None
+
+    def resultados(self, ejecucion_id):
+        """Candidatos de una ejecución ordenados por puntaje (sin las columnas vacías)."""
+        return self.consultar(ejecucion_id)[1]
+
+    def consultar(self, ejecucion_id, orden='score', descendente=True, limite=None, desplazamiento=0,
+                  minimos=None, busqueda=None, estrategia=None):
+        """
+        Página de candidatos de una ejecución filtrada y ordenada en SQLite.
+
+        `minimos` es {columna: valor mínimo} sobre COLUMNAS_ORDENABLES, `busqueda` filtra los
+        símbolos que contienen el texto y `estrategia` deja solo los de esa estrategia.
+        Devuelve (total que cumple los filtros, filas de la página).
+        """
+        if orden not in COLUMNAS_ORDENABLES:
+            raise ValueError(f"Orden no válido: {orden}")
+        condiciones = ["ejecucion_id = ?"]
+        parametros = [ejecucion_id]
+        for columna, minimo in (minimos or {}).items():
+            if columna not in COLUMNAS_ORDENABLES:
+                raise ValueError(f"Filtro no válido: {columna}")
+            condiciones.append(f"{columna} >= ?")
+            parametros.append(minimo)
+        if busqueda:
+            condiciones.append("instr(simbolo, ?) > 0")
+            parametros.append(busqueda.upper())
+        if estrategia:
+            condiciones.append("estrategia = ?")
+            parametros.append(estrategia)
+        where = ' AND '.join(condiciones)
+        sentido = 'DESC' if descendente else 'ASC'
+
+        with self._lock:
+            total = self._conexion.execute(f"SELECT COUNT(*) FROM resultados WHERE {where}", parametros).fetchone()[0]
+            # El símbolo desempata para que la paginación sea estable
+            filas = self._conexion.execute(
+                f"SELECT {', '.join(COLUMNAS_RESULTADOS)} FROM resultados WHERE {where} "
+                f"ORDER BY {orden} {sentido}, simbolo LIMIT ? OFFSET ?",
+                parametros + [limite if limite is not None else -1, desplazamiento]).fetchall()
+        return total, [{clave: fila[clave] for clave in fila.keys() if fila[clave] is not None} for fila in filas]
+
+    def exportar_csv(self, ejecucion_id):
+        """CSV de una ejecución con el mismo formato que escribían los escaneos."""
+        df = pd.DataFrame(self.resultados(ejecucion_id))
+        columnas = [columna for columna in COLUMNAS_RESULTADOS if columna in df]
+        return df[columnas].to_csv(index=False, float_format='%.2f')
+
+    def nombre_csv(self, ejecucion):
+        """Nombre de descarga con el formato de los antiguos ficheros de resultados."""
+        fecha = datetime.fromtimestamp(ejecucion['creado']).strftime(FORMATO_FECHA)
+        return f"analisis_binance_{ejecucion['categoria']}_{ejecucion['intervalo']}_{ejecucion['dias']}dias_{fecha}.csv"
+
+    def importar_csv(self, ruta):
+        """Importa un CSV antiguo de resultados; devuelve el id o None si el nombre no encaja."""
+        coincidencia = PATRON_CSV.search(os.path.basename(ruta))
+        if not coincidencia:
+            return None
+        creado = datetime.strptime(coincidencia['fecha'], FORMATO_FECHA).timestamp()
+        df = pd.read_csv(ruta)
+        resultados = [{clave: valor for clave, valor in fila.items() if pd.notna(valor)}
+                      for fila in df.to_dict('records')]
+        # Id estable por fichero para que importar dos veces no duplique la ejecución
+        ejecucion_id = os.path.splitext(os.path.basename(ruta))[0]
+        return self.guardar_ejecucion(resultados, coincidencia['intervalo'], coincidencia['categoria'] or 'todos',
+                                      coincidencia['dias'], ejecucion_id=ejecucion_id, creado=creado)
+
+
+def obtener_almacen_resultados():
+    """Devuelve el almacén de resultados compartido (se abre en el primer uso)."""
+    global _almacen
+    with _lock_almacen:
+        if _almacen is None:
+            _almacen = AlmacenResultados()
+        return _almacen
+
+
+def establecer_almacen_resultados(almacen):
+    """Sustituye el almacén compartido (p. ej. por AlmacenResultados(':memory:') en pruebas)."""
+    global _almacen
+    with _lock_almacen:
+        _almacen = almacen
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != 'importar':
+        print("Uso: python almacen_resultados.py importar [directorio]")
+        sys.exit(1)
+    directorio = sys.argv[2] if len(sys.argv) > 2 else '.'
+    almacen = obtener_almacen_resultados()
+    importados = 0
+    for ruta in sorted(glob.glob(os.path.join(directorio, 'analisis_binance_*.csv'))):
+        if almacen.importar_csv(ruta):
+            importados += 1
+        else:
+            print(f"Se omite {ruta}: el nombre no sigue el formato de los resultados")
+    print(f"✅ {importados} ejecuciones importadas en {almacen.ruta}")
@@ -0,0 +1,359 @@
+# analisis_ia.py
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache_analisis import CacheAnalisis, version_prompt
+
+# --- CONFIGURACIÓN DEL ANÁLISIS CON GEMINI ---
+MODELO_GEMINI = 'gemini-2.5-flash'
+MAX_ANALISIS_SIMULTANEOS = 4
+PETICIONES_POR_MINUTO = 60      # Ritmo sostenido del limitador (token bucket)
+RAFAGA_MAXIMA = 5               # Peticiones que pueden salir seguidas con el cubo lleno
+REINTENTOS_429 = 4
+BACKOFF_INICIAL = 2.0           # Segundos; se duplica en cada reintento
+TAMANO_LOTE = 5                 # Símbolos por petición en el modo por lotes
+VERSION_LOTE = '1'              # Subirla a mano si cambia el prompt del lote o lo que acepta su parser
+
+CLAVES_ANALISIS = ('risk_level', 'summary', 'long_term_outlook', 'medium_term_outlook', 'short_term_outlook')
+
+_modelo = None
+_cache = None
+_api_key = None
+_lock_modelo = threading.Lock()
+
+
+class LimitadorTokens:
+    """Token bucket seguro entre hilos: `tasa` fichas por segundo, hasta `capacidad` acumuladas."""
+
+    def __init__(self, tasa, capacidad):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self._fichas = float(capacidad)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """Bloquea hasta obtener una ficha."""
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                espera = (1 - self._fichas) / self.tasa
+            time.sleep(espera)
+
+
+# Limitador compartido por todas las peticiones a Gemini del proceso
+limitador_gemini = LimitadorTokens(PETICIONES_POR_MINUTO / 60.0, RAFAGA_MAXIMA)
+
+
+def configurar_gemini(api_key):
+    """Guarda la clave de la API; el SDK se importa y se configura al crear el modelo."""
+    global _api_key
+    with _lock_modelo:
+        _api_key = api_key
+
+
+def obtener_modelo():
+    """
+    Devuelve la instancia única del modelo de Gemini (se crea en el primer uso). El SDK de
+    Gemini tarda en importarse, así que solo se carga cuando hay que llamar a la API.
+    """
+    global _modelo
+    with _lock_modelo:
+        if _modelo is None:
+            import google.generativeai as genai
+            if _api_key is not None:
+                genai.configure(api_key=_api_key)
+            _modelo = genai.GenerativeModel(MODELO_GEMINI)
+        return _modelo
+
+
+def establecer_modelo(modelo):
+    """
+    Sustituye el modelo compartido, p. ej. por un stub local en pruebas. El stub solo necesita
+    un método generate_content(prompt) que devuelva un objeto con atributo `text`.
+    """
+    global _modelo
+    with _lock_modelo:
+        _modelo = modelo
+
+
+def obtener_cache():
+    """Devuelve la cache persistente de análisis compartida (se abre en el primer uso)."""
+    global _cache
+    with _lock_modelo:
+        if _cache is None:
+            _cache = CacheAnalisis()
+        return _cache
+
+
+def establecer_cache(cache):
+    """Sustituye la cache compartida (p. ej. por CacheAnalisis(':memory:') en pruebas)."""
+    global _cache
+    with _lock_modelo:
+        _cache = cache
+
+
+def _es_limite_de_tasa(error):
+    """True si el error es un 429 (ResourceExhausted de la API de Google o equivalente)."""
+    return getattr(error, 'code', None) == 429 or 'ResourceExhausted' in type(error).__name__
+
+
+def generar_con_reintentos(modelo, prompt, limitador=None, reintentos=REINTENTOS_429, backoff=BACKOFF_INICIAL):
+    """Llama a generate_content respetando el limitador y reintentando con backoff ante 429."""
+    if limitador is None:
+        limitador = limitador_gemini
+    for intento in range(reintentos + 1):
+        limitador.adquirir()
+        try:
+            return modelo.generate_content(prompt)
+        except Exception as e:
+            if not _es_limite_de_tasa(e) or intento == reintentos:
+                raise
+            # Backoff exponencial con jitter para no reintentar todos a la vez
+            time.sleep(backoff * (2 ** intento) * (0.5 + random.random()))
+
+
+def parsear_respuesta(texto, symbol):
+    """Convierte la respuesta de la IA (JSON, a veces envuelto en ```json) en un diccionario."""
+    cleaned_response = texto.strip().replace('```json', '').replace('```', '')
+    analysis = json.loads(cleaned_response)
+    analysis['symbol'] = symbol
+    return analysis
+
+
+def resultado_error(symbol, error):
+    """Resultado con el mismo esquema que un análisis correcto, para los símbolos que fallan."""
+    return {
+        "symbol": symbol,
+        "risk_level": "Error de Análisis",
+        "summary": f"No se pudo completar el análisis debido a un error: {str(error)}",
+        "long_term_outlook": "N/A",
+        "medium_term_outlook": "N/A",
+        "short_term_outlook": "N/A"
+    }
+
+
+def analizar_simbolo(symbol, construir_prompt, modelo=None, limitador=None, cache=None, consultar_cache=True):
+    """
+    Analiza un símbolo con Gemini. Nunca lanza excepciones: los errores se devuelven como resultado.
+    Los análisis correctos se guardan en la cache persistente; los errores no. Con
+    consultar_cache=False no se busca en la cache (el llamador ya lo hizo y contó el fallo).
+    """
+    project_name = symbol.replace('USDT', '')
+    try:
+        modelo = modelo if modelo is not None else obtener_modelo()
+        cache = cache if cache is not None else obtener_cache()
+        version = version_prompt(construir_prompt)
+        nombre_modelo = getattr(modelo, 'model_name', MODELO_GEMINI)
+
+        if consultar_cache:
+            guardado = cache.obtener(symbol, version, nombre_modelo)
+            if guardado is not None:
+                return guardado
+
+        response = generar_con_reintentos(modelo, construir_prompt(project_name), limitador)
+        analysis = parsear_respuesta(response.text, symbol)
+        cache.guardar(symbol, version, nombre_modelo, analysis)
+        return analysis
+    except Exception as e:
+        return resultado_error(symbol, e)
+
+
+def analizar_simbolos(symbols, construir_prompt, modelo=None, max_simultaneos=MAX_ANALISIS_SIMULTANEOS,
+                      limitador=None, al_terminar=None, cache=None, consultar_cache=True):
+    """
+    Analiza varios símbolos en paralelo con una única instancia del modelo y devuelve los
+    resultados en el mismo orden que `symbols`. `al_terminar(resultado)` se llama al completar cada uno.
+    """
+    if not symbols:
+        return []
+    modelo = modelo if modelo is not None else obtener_modelo()
+
+    def tarea(symbol):
+        resultado = analizar_simbolo(symbol, construir_prompt, modelo, limitador, cache, consultar_cache)
+        if al_terminar is not None:
+            al_terminar(resultado)
+        return resultado
+
+    with ThreadPoolExecutor(max_workers=min(max_simultaneos, len(symbols)), thread_name_prefix='gemini') as executor:
+        return list(executor.map(tarea, symbols))
+
+
+# --- MODO POR LOTES ---
+def build_batch_analysis_prompt(symbols):
+    """Prompt que pide el análisis de varios proyectos en una sola respuesta (array JSON)."""
+    lista = "\n".join(f'    - "{symbol}" (proyecto {symbol.replace("USDT", "")})' for symbol in symbols)
+    return f"""
+    Actúa como un analista financiero experto en criptomonedas, escéptico y centrado en los fundamentales.
+    Analiza por separado cada uno de estos proyectos de criptomoneda:
+{lista}
+
+    Basándote en información pública y verificable (casos de uso reales, equipo, tokenomics, actividad de desarrollo en repositorios como GitHub, comunidad, auditorías de seguridad, y posibles "red flags" o riesgos), proporciona un análisis conciso de cada uno.
+
+    Devuelve tu respuesta ÚNICAMENTE como un array JSON con un objeto por proyecto, en el mismo orden, con esta estructura:
+    [
+      {{
+        "symbol": "string",
+        "risk_level": "string",
+        "summary": "string",
+        "long_term_outlook": "string",
+        "medium_term_outlook": "string",
+        "short_term_outlook": "string"
+      }}
+    ]
+
+    Instrucciones para cada clave:
+    - "symbol": El símbolo exacto de la lista anterior (por ejemplo "BTCUSDT").
+    - "risk_level": Clasifica el riesgo fundamental como "Bajo", "Medio", "Alto" o "Muy Alto / Estafa Potencial".
+    - "summary": Un resumen de 1 a 2 frases sobre qué es el proyecto y cuál es su principal fortaleza o debilidad.
+    - "long_term_outlook": Análisis para inversión a largo plazo (1-3 años). Evalúa si tiene potencial de adopción masiva o si es probable que quede obsoleto. Sé crítico.
+    - "medium_term_outlook": Análisis para Swing Trading (semanas a meses). Evalúa si se ve afectado por narrativas, eventos del roadmap o si su volatilidad es predecible.
+    - "short_term_outlook": Análisis para Day Trading. Evalúa si tiene la liquidez y volatilidad necesarias. Menciona si es sensible a noticias diarias.
+
+    No incluyas disclaimers, introducciones ni texto adicional. Solo el array JSON.
+    """
+
+
+def _objetos_json(texto):
+    """Extrae los objetos JSON de primer nivel de un texto, aunque el array esté cortado o mal formado."""
+    objetos = []
+    profundidad = 0
+    inicio = None
+    en_cadena = False
+    escape = False
+    for i, caracter in enumerate(texto):
+        if en_cadena:
+            if escape:
+                escape = False
+            elif caracter == '\\':
+                escape = True
+            elif caracter == '"':
+                en_cadena = False
+            continue
+        if caracter == '"':
+            en_cadena = True
+        elif caracter == '{':
+            if profundidad == 0:
+                inicio = i
+            profundidad += 1
+        elif caracter == '}' and profundidad > 0:
+            profundidad -= 1
+            if profundidad == 0:
+                try:
+                    objetos.append(json.loads(texto[inicio:i + 1]))
+                except ValueError:
+                    pass  # Este objeto está mal formado; el resto puede servir
+    return objetos
+
+
+def parsear_respuesta_lote(texto, symbols):
+    """
+    Reparte la respuesta de un lote en resultados por símbolo. Devuelve {symbol: análisis}
+    solo con los símbolos cuyo objeto se pudo leer completo; los demás quedan fuera.
+    """
+    cleaned_response = texto.strip().replace('```json', '').replace('```', '')
+    try:
+        elementos = json.loads(cleaned_response)
+        if isinstance(elementos, dict):
+            elementos = [elementos]
+    except ValueError:
+        elementos = _objetos_json(cleaned_response)
+
+    por_nombre = {}
+    for symbol in symbols:
+        por_nombre[symbol.upper()] = symbol
+        por_nombre[symbol.replace('USDT', '').upper()] = symbol
+
+    resultados = {}
+    for elemento in elementos if isinstance(elementos, list) else []:
+        if not isinstance(elemento, dict) or not all(clave in elemento for clave in CLAVES_ANALISIS):
+            continue
+        symbol = por_nombre.get(str(elemento.get('symbol', '')).strip().upper())
+        if symbol is None or symbol in resultados:
+            continue
+        analysis = {clave: elemento[clave] for clave in CLAVES_ANALISIS}
+        analysis['symbol'] = symbol
+        resultados[symbol] = analysis
+    return resultados
+
+
+def version_lote(construir_prompt):
+    """
+    Versión de las entradas de la cache del modo por lotes. Es un espacio propio ('lote-') que
+    cambia con el prompt individual y con VERSION_LOTE.
+    """
+    return f"lote-{VERSION_LOTE}-" + version_prompt(construir_prompt)
+
+
+def analizar_simbolos_en_lotes(symbols, construir_prompt, tamano_lote=TAMANO_LOTE, modelo=None,
+                               max_simultaneos=MAX_ANALISIS_SIMULTANEOS, limitador=None, al_terminar=None,
+                               cache=None):
+    """
+    Como analizar_simbolos, pero pide `tamano_lote` símbolos por llamada a generate_content.
+    Los símbolos que falten en la respuesta de un lote se analizan después con llamadas
+    individuales; si la llamada del lote falla (ya agotados los reintentos), sus símbolos
+    reciben un resultado de error como en analizar_simbolo. Las respuestas de los lotes se
+    guardan en la cache con su propia versión (version_lote); los análisis individuales
+    también se reutilizan.
+    """
+    if not symbols:
+        return []
+    if tamano_lote <= 1:
+        return analizar_simbolos(symbols, construir_prompt, modelo, max_simultaneos, limitador, al_terminar, cache)
+
+    modelo = modelo if modelo is not None else obtener_modelo()
+    cache = cache if cache is not None else obtener_cache()
+    version = version_lote(construir_prompt)
+    nombre_modelo = getattr(modelo, 'model_name', MODELO_GEMINI)
+
+    resultados = {}
+    pendientes = []
+    for symbol in dict.fromkeys(symbols):
+        # Una sola consulta contada por símbolo: el fallo solo cuenta si tampoco está el análisis individual
+        guardado = cache.obtener(symbol, version, nombre_modelo, contar_fallo=False)
+        if guardado is None:
+            guardado = cache.obtener(symbol, version_prompt(construir_prompt), nombre_modelo)
+        if guardado is not None:
+            resultados[symbol] = guardado
+            if al_terminar is not None:
+                al_terminar(guardado)
+        else:
+            pendientes.append(symbol)
+
+    def tarea_lote(lote):
+        try:
+            response = generar_con_reintentos(modelo, build_batch_analysis_prompt(lote), limitador)
+            analizados = parsear_respuesta_lote(response.text, lote)
+            for symbol, analysis in analizados.items():
+                cache.guardar(symbol, version, nombre_modelo, analysis)
+        except Exception as e:
+            # Los errores no se guardan en la cache ni se reintentan uno a uno
+            analizados = {symbol: resultado_error(symbol, e) for symbol in lote}
+        for analysis in analizados.values():
+            if al_terminar is not None:
+                al_terminar(analysis)
+        return analizados
+
+    lotes = [pendientes[i:i + tamano_lote] for i in range(0, len(pendientes), tamano_lote)]
+    if lotes:
+        with ThreadPoolExecutor(max_workers=min(max_simultaneos, len(lotes)), thread_name_prefix='gemini') as executor:
+            for analizados in executor.map(tarea_lote, lotes):
+                resultados.update(analizados)
+
+    # Solo los símbolos que faltan vuelven al modo individual (ya se buscaron en la cache)
+    faltantes = [symbol for symbol in pendientes if symbol not in resultados]
+    if faltantes:
+        individuales = analizar_simbolos(faltantes, construir_prompt, modelo, max_simultaneos, limitador,
+                                         al_terminar, cache, consultar_cache=False)
+        resultados.update(zip(faltantes, individuales))
+
+    return [resultados[symbol] for symbol in symbols]
@@ -1,15 +1,27 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import pandas as pd
-import numpy as np
-from binance.client import Client
 import config
 from datetime import datetime
-import os
-import glob
 import json
-import google.generativeai as genai
-import threading
+import gzip
 import time
+from werkzeug.http import generate_etag
+from gestor_trabajos import GestorTrabajos
+from analisis_ia import TAMANO_LOTE, analizar_simbolo, analizar_simbolos_en_lotes, configurar_gemini, obtener_cache
+from almacen_klines import almacen_global
+from almacen_resultados import COLUMNAS_ORDENABLES, obtener_almacen_resultados
+from parser_klines import array_a_dataframe
+from cliente_binance import configurar_cliente
+from descarga_historica import descargar_historia, validar_dias_intervalo
+from instantanea_mercado import instantanea_global
+from panel_indicadores import construir_panel
+from estado_indicadores import calcular_indicadores_ultima_vela
+from estrategias import (INDICADORES_ULTIMA_VELA, calcular_indicadores,
+                         columnas_necesarias, estrategias_global, evaluar_panel, evaluar_simbolo,
+                         obtener_estrategias, velas_necesarias)
+from escaner_tiempo_real import EscanerTiempoReal, FuenteBinanceWebsocket
+from multi_temporalidad import dias_necesarios, evaluar_temporalidades, ordenar_intervalos
+from metricas import MedicionEscaneo, cronometrar, metricas_global
 
 app = Flask(__name__)
 
@@ -17,107 +29,87 @@ app = Flask(__name__)
 try:
     api_key = config.binance_api_key
     api_secret = config.binance_api_secret
-    genai.configure(api_key=config.gemini_api_key)
+    gemini_api_key = config.gemini_api_key
 except AttributeError:
     print("FATAL: No se encontraron las claves en config.py.")
     exit()
 
+# Los SDK de Binance y Gemini se importan en el primer uso: aquí solo se guardan las claves
+configurar_gemini(gemini_api_key)
+
+# Cliente de Binance compartido (pool de conexiones reutilizable entre hilos)
+configurar_cliente(api_key, api_secret)
+
 # --- CONFIGURACIÓN DE INTERVALOS DISPONIBLES ---
+# Mismos valores que Client.KLINE_INTERVAL_* (sin importar python-binance al arrancar)
 INTERVALOS_DISPONIBLES = {
-    '1s': Client.KLINE_INTERVAL_1SECOND,
-    '1m': Client.KLINE_INTERVAL_1MINUTE,
-    '3m': Client.KLINE_INTERVAL_3MINUTE,
-    '5m': Client.KLINE_INTERVAL_5MINUTE,
-    '15m': Client.KLINE_INTERVAL_15MINUTE,
-    '30m': Client.KLINE_INTERVAL_30MINUTE,
-    '1h': Client.KLINE_INTERVAL_1HOUR,
-    '2h': Client.KLINE_INTERVAL_2HOUR,
-    '4h': Client.KLINE_INTERVAL_4HOUR,
-    '6h': Client.KLINE_INTERVAL_6HOUR,
-    '8h': Client.KLINE_INTERVAL_8HOUR,
-    '12h': Client.KLINE_INTERVAL_12HOUR,
-    '1d': Client.KLINE_INTERVAL_1DAY,
-    '3d': Client.KLINE_INTERVAL_3DAY,
-    '1w': Client.KLINE_INTERVAL_1WEEK,
-    '1M': Client.KLINE_INTERVAL_1MONTH
+    '1s': '1s',
+    '1m': '1m',
+    '3m': '3m',
+    '5m': '5m',
+    '15m': '15m',
+    '30m': '30m',
+    '1h': '1h',
+    '2h': '2h',
+    '4h': '4h',
+    '6h': '6h',
+    '8h': '8h',
+    '12h': '12h',
+    '1d': '1d',
+    '3d': '3d',
+    '1w': '1w',
+    '1M': '1M'
+}
+
+# Configuración por defecto de un escaneo
+CONFIG_POR_DEFECTO = {
+    'intervalo': '1d',
+    'dias': None,  # Sin días: solo la historia que necesitan los indicadores
+    'categoria': 'todos',
+    'estrategias': ['flexible'],
+    'modo_lote': True  # Indicadores de todo el universo en una sola pasada vectorizada
 }
 
-# Variables globales para el estado de la aplicación
-analysis_status = {
+# Estado que se devuelve cuando todavía no se ha lanzado ningún escaneo
+ESTADO_SIN_TRABAJOS = {
     'is_running': False,
     'progress': 0,
     'total_symbols': 0,
     'current_symbol': '',
     'results': [],
     'error': None,
-    'config': {
-        'intervalo': Client.KLINE_INTERVAL_1DAY,
-        'dias': 350,
-        'categoria': 'todos'
-    }
+    'config': CONFIG_POR_DEFECTO
 }
 
+# Paginación de los resultados en la API (/api/get-latest-results y /api/analysis-status)
+LIMITE_RESULTADOS_POR_DEFECTO = 100
+MAX_LIMITE_RESULTADOS = 1000
+FILTROS_MINIMOS = {'min_score': 'score', 'min_rsi': 'rsi', 'min_vol_ratio': 'vol_ratio'}
+MIN_BYTES_GZIP = 1024  # Por debajo de esto no compensa comprimir
+
+# Escáner continuo sobre websockets (None si no está activo)
+escaner_tiempo_real = None
+
+# Cada cuánto revisa el stream SSE si hay cambios, y cada cuánto envía un keep-alive
+INTERVALO_STREAM = 0.5
+INTERVALO_KEEPALIVE = 15
+
 # --- FUNCIONES DEL MAIN.PY ---
 def obtener_simbolos_spot(quote_asset='USDT'):
     """Obtiene una lista de todos los símbolos del mercado SPOT que están actualmente en TRADING."""
-    client = Client(api_key, api_secret)
-    simbolos_filtrados = []
     try:
-        exchange_info = client.get_exchange_info()
-        for s in exchange_info['symbols']:
-            if s['isSpotTradingAllowed'] and s['status'] == 'TRADING' and s['quoteAsset'] == quote_asset and 'UP' not in s['symbol'] and 'DOWN' not in s['symbol'] and s['baseAsset'] not in ['USDC', 'TUSD', 'BUSD']:
-                simbolos_filtrados.append(s['symbol'])
-        return simbolos_filtrados
+        return instantanea_global.simbolos(quote_asset)
     except Exception as e:
         print(f"Error al obtener símbolos: {e}")
         return []
 
 def obtener_info_simbolos_detallada(quote_asset='USDT'):
-    """Obtiene información detallada de todos los símbolos incluyendo volumen y otros datos."""
-    client = Client(api_key, api_secret)
-    simbolos_info = []
-    
+    """
+    Obtiene información detallada de todos los símbolos incluyendo volumen y otros datos.
+    Lee de la instantánea en memoria, que refresca exchange info y tickers en segundo plano.
+    """
     try:
-        # Obtener información del exchange
-        exchange_info = client.get_exchange_info()
-        
-        # Obtener estadísticas de 24h para todos los símbolos
-        ticker_24h = client.get_ticker()
-        ticker_dict = {t['symbol']: t for t in ticker_24h}
-        
-        for s in exchange_info['symbols']:
-            if (s['isSpotTradingAllowed'] and s['status'] == 'TRADING' and 
-                s['quoteAsset'] == quote_asset and 'UP' not in s['symbol'] and 
-                'DOWN' not in s['symbol'] and s['baseAsset'] not in ['USDC', 'TUSD', 'BUSD']):
-                
-                symbol_info = {
-                    'symbol': s['symbol'],
-                    'baseAsset': s['baseAsset'],
-                    'quoteAsset': s['quoteAsset'],
-                    'onboardDate': s.get('onboardDate', None),  # Fecha de listado
-                    'permissions': s.get('permissions', []),
-                    'volume_24h': 0,
-                    'quoteVolume_24h': 0,
-                    'count_24h': 0,
-                    'priceChange_24h': 0,
-                    'priceChangePercent_24h': 0
-                }
-                
-                # Añadir datos de volumen si están disponibles
-                if s['symbol'] in ticker_dict:
-                    ticker = ticker_dict[s['symbol']]
-                    symbol_info.update({
-                        'volume_24h': float(ticker.get('volume', 0)),
-                        'quoteVolume_24h': float(ticker.get('quoteVolume', 0)),
-                        'count_24h': int(ticker.get('count', 0)),
-                        'priceChange_24h': float(ticker.get('priceChange', 0)),
-                        'priceChangePercent_24h': float(ticker.get('priceChangePercent', 0))
-                    })
-                
-                simbolos_info.append(symbol_info)
-        
-        return simbolos_info
-        
+        return instantanea_global.info_detallada(quote_asset)
     except Exception as e:
         print(f"Error al obtener información detallada de símbolos: {e}")
         return []
@@ -142,8 +134,10 @@ def filtrar_simbolos_por_categoria(simbolos_info, categoria='todos'):
     if categoria == 'todos':
         return [s['symbol'] for s in simbolos_info]
     
-    # Ordenar por volumen de trading (descendente)
-    simbolos_ordenados = sorted(simbolos_info, key=lambda x: x['quoteVolume_24h'], reverse=True)
+    # Ordenar por volumen de trading (descendente); la instantánea ya trae el índice ordenado
+    simbolos_ordenados = getattr(simbolos_info, 'por_volumen', None)
+    if simbolos_ordenados is None:
+        simbolos_ordenados = sorted(simbolos_info, key=lambda x: x['quoteVolume_24h'], reverse=True)
     
     if categoria == 'populares':
         # Top 50 por volumen
@@ -203,75 +197,34 @@ def obtener_categorias_disponibles():
     }
 
 def obtener_datos_historicos_binance(simbolo, intervalo, dias):
-    """Obtiene los datos históricos desde la API de Binance."""
-    client = Client(api_key, api_secret)
-    fecha_inicio = f"{dias} days ago UTC"
+    """Obtiene los datos históricos leyendo a través del almacén local de velas."""
     try:
-        klines = client.get_historical_klines(simbolo, intervalo, fecha_inicio)
+        # Solo se descarga de Binance la parte que falta en el almacén (por ventanas si es larga)
+        datos = almacen_global.obtener(simbolo, intervalo, dias,
+                                       lambda inicio: descargar_historia(simbolo, intervalo, inicio))
     except Exception as e:
         print(f"Error obteniendo datos para {simbolo}: {e}")
         return pd.DataFrame()
 
-    columnas = ['Open Time', 'Open', 'High', 'Low', 'Close', 'Volume', 'Close Time', 'Quote Asset Volume', 'Number of Trades', 'Taker Buy Base Asset Volume', 'Taker Buy Quote Asset Volume', 'Ignore']
-    df = pd.DataFrame(klines, columns=columnas)
-    if df.empty: return df
-    
-    cols_num = ['Open', 'High', 'Low', 'Close', 'Volume']
-    for col in cols_num:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    df['Open Time'] = pd.to_datetime(df['Open Time'], unit='ms')
-    return df
-
-def calcular_sma(data, length):
-    return data.rolling(window=length).mean()
-
-def calcular_rsi(data, length=14):
-    delta = data.diff()
-    gain = (delta.where(delta > 0, 0)).fillna(0)
-    loss = (-delta.where(delta < 0, 0)).fillna(0)
-    avg_gain = gain.ewm(com=length - 1, adjust=False, min_periods=length).mean()
-    avg_loss = loss.ewm(com=length - 1, adjust=False, min_periods=length).mean()
-    if avg_loss.iloc[-1] == 0: return 100.0
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
-
-def calcular_indicadores(df):
-    """Añade las columnas de indicadores al DataFrame."""
-    if df is None or df.empty: return pd.DataFrame()
-    df['SMA_50'] = calcular_sma(df['Close'], 50)
-    df['SMA_200'] = calcular_sma(df['Close'], 200)
-    df['RSI_14'] = calcular_rsi(df['Close'], 14)
-    df['VOLUME_SMA_20'] = calcular_sma(df['Volume'], 20)
-    df.dropna(inplace=True)
-    df.reset_index(drop=True, inplace=True)
-    return df
+    with cronometrar('dataframe'):
+        return array_a_dataframe(datos)
 
 def verificar_senal_de_compra(df):
-    """Verifica si los datos cumplen con la ESTRATEGIA FLEXIBLE de tendencia alcista."""
-    if df is None or len(df) < 1:
-        return False, None
-
-    ultima_vela = df.iloc[-1]
+    """Verifica si la última vela cumple la ESTRATEGIA FLEXIBLE (definida en estrategias.py)."""
+    return obtener_estrategias()[0].verificar(df)
 
-    # Condiciones flexibilizadas
-    cond_tendencia_alcista = ultima_vela['SMA_50'] > ultima_vela['SMA_200']
-    cond_rsi = 45 < ultima_vela['RSI_14'] < 80
-    cond_volumen = ultima_vela['Volume'] > ultima_vela['VOLUME_SMA_20'] and ultima_vela['VOLUME_SMA_20'] > 0
-
-    if cond_tendencia_alcista and cond_rsi and cond_volumen:
-        vol_ratio = ultima_vela['Volume'] / ultima_vela['VOLUME_SMA_20']
-        score = ultima_vela['RSI_14'] * vol_ratio
-        
-        detalles = {
-            "precio_cierre": ultima_vela['Close'],
-            "rsi": ultima_vela['RSI_14'],
-            "vol_ratio": vol_ratio,
-            "score": score
-        }
-        return True, detalles
-    
-    return False, None
+def estrategias_solicitadas(data):
+    """
+    Estrategias de la petición: 'estrategias' (lista de ids) o 'estrategia' (un id); por defecto
+    la flexible. Lanza ValueError si alguna no existe.
+    """
+    ids = data.get('estrategias') or ([data['estrategia']] if data.get('estrategia') else None)
+    if ids is not None and (not isinstance(ids, list) or any(not isinstance(i, str) for i in ids)):
+        raise ValueError('Estrategia no válida')
+    try:
+        return obtener_estrategias(ids)
+    except KeyError as e:
+        raise ValueError(f'Estrategia no válida: {e.args[0]}')
 
 # --- FUNCIONES DEL GEMINI-ANALYSIS.PY ---
 def build_analysis_prompt(project_name):
@@ -302,156 +255,161 @@ def build_analysis_prompt(project_name):
     """
 
 def analyze_with_gemini(symbol):
-    """Llama a la API de Gemini para obtener el análisis."""
-    project_name = symbol.replace('USDT', '')
-    
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        prompt = build_analysis_prompt(project_name)
-        response = model.generate_content(prompt)
-        
-        cleaned_response = response.text.strip().replace('```json', '').replace('```', '')
-        analysis = json.loads(cleaned_response)
-        analysis['symbol'] = symbol
-        return analysis
+    """Llama a la API de Gemini para obtener el análisis (modelo compartido, con reintentos)."""
+    return analizar_simbolo(symbol, build_analysis_prompt)
 
-    except Exception as e:
-        return {
-            "symbol": symbol,
-            "risk_level": "Error de Análisis",
-            "summary": f"No se pudo completar el análisis debido a un error: {str(e)}",
-            "long_term_outlook": "N/A", 
-            "medium_term_outlook": "N/A", 
-            "short_term_outlook": "N/A"
-        }
-
-def find_latest_csv():
-    """Encuentra el archivo .csv de análisis técnico más reciente."""
-    list_of_files = glob.glob('analisis_binance_*.csv')
-    if not list_of_files:
-        return None
-    return max(list_of_files, key=os.path.getctime)
+def dias_validos(dias):
+    """Los días son opcionales; si se indican, deben ser un entero entre 30 y 1000."""
+    return dias is None or (isinstance(dias, int) and 30 <= dias <= 1000)
 
 def validar_configuracion(intervalo, dias):
     """Valida que la configuración sea apropiada para el análisis."""
-    # Para intervalos muy pequeños, limitar la cantidad de días para evitar demasiados datos
-    if intervalo in [Client.KLINE_INTERVAL_1SECOND, Client.KLINE_INTERVAL_1MINUTE]:
-        if dias > 7:
-            return False, "Para intervalos de 1 segundo o 1 minuto, se recomienda máximo 7 días."
-    
-    # Para intervalos pequeños, limitar días para evitar sobrecarga
-    elif intervalo in [Client.KLINE_INTERVAL_3MINUTE, Client.KLINE_INTERVAL_5MINUTE]:
-        if dias > 30:
-            return False, "Para intervalos pequeños, se recomienda máximo 30 días."
+    # Los escaneos tienen todo el universo en memoria: se limitan los intervalos pequeños
+    mensaje_error = validar_dias_intervalo(intervalo, dias, escaneo=True)
+    if mensaje_error:
+        return False, mensaje_error
     
     return True, None
 
 # --- FUNCIÓN DE ANÁLISIS EN BACKGROUND ---
-def run_technical_analysis():
-    """Ejecuta el análisis técnico en background."""
-    global analysis_status
+def run_technical_analysis(trabajo, gestor):
+    """Ejecuta el análisis técnico de un trabajo en background."""
+    # Obtener configuración del trabajo
+    intervalo = trabajo.config['intervalo']
+    categoria = trabajo.config.get('categoria', 'todos')
+    modo_lote = trabajo.config.get('modo_lote', True)
+    # Modo multi-temporalidad: se descarga solo el intervalo más fino y el resto se remuestrea
+    intervalos = trabajo.config.get('intervalos') or [intervalo]
+    multi_temporalidad = len(intervalos) > 1
+    # Varias estrategias comparten la descarga y los indicadores comunes
+    estrategias = obtener_estrategias(trabajo.config.get('estrategias'))
+    # Los días son opcionales: por defecto se piden solo las velas que calientan los indicadores
+    dias = trabajo.config.get('dias') or dias_necesarios(intervalos, velas_necesarias(estrategias))
+    # Tiempos por etapa, bytes, velas, reintentos y esperas del escaneo
+    medicion = MedicionEscaneo()
     
-    try:
-        analysis_status['is_running'] = True
-        analysis_status['progress'] = 0
-        analysis_status['error'] = None
-        analysis_status['results'] = []
-        
-        # Obtener configuración actual
-        intervalo = analysis_status['config']['intervalo']
-        dias = analysis_status['config']['dias']
-        categoria = analysis_status['config'].get('categoria', 'todos')
-        
-        # Validar configuración
-        es_valido, mensaje_error = validar_configuracion(intervalo, dias)
-        if not es_valido:
-            analysis_status['error'] = mensaje_error
-            analysis_status['is_running'] = False
-            return
-        
-        # Obtener información detallada de símbolos
-        print(f"Obteniendo información detallada de símbolos...")
+    # Validar configuración
+    es_valido, mensaje_error = validar_configuracion(intervalo, dias)
+    if not es_valido:
+        trabajo.finalizar(error=mensaje_error)
+        return
+    
+    # Obtener información detallada de símbolos
+    print(f"Obteniendo información detallada de símbolos...")
+    with medicion.etapa('simbolos'):
         simbolos_info = obtener_info_simbolos_detallada(quote_asset='USDT')
-        if not simbolos_info:
-            analysis_status['error'] = "No se pudo obtener la información de símbolos."
-            analysis_status['is_running'] = False
-            return
-        
-        # Filtrar símbolos por categoría
         symbols_a_analizar = filtrar_simbolos_por_categoria(simbolos_info, categoria)
-        if not symbols_a_analizar:
-            analysis_status['error'] = f"No se encontraron símbolos para la categoría '{categoria}'."
-            analysis_status['is_running'] = False
-            return
-        
-        analysis_status['total_symbols'] = len(symbols_a_analizar)
-        resultados_positivos = []
-
-        for i, symbol in enumerate(symbols_a_analizar):
-            if not analysis_status['is_running']:  # Check if cancelled
-                break
-                
-            analysis_status['current_symbol'] = symbol
-            analysis_status['progress'] = int((i / len(symbols_a_analizar)) * 100)
+    if not simbolos_info:
+        trabajo.finalizar(error="No se pudo obtener la información de símbolos.", metrics=medicion.finalizar())
+        return
+    
+    # Filtrar símbolos por categoría
+    if not symbols_a_analizar:
+        trabajo.finalizar(error=f"No se encontraron símbolos para la categoría '{categoria}'.",
+                          metrics=medicion.finalizar())
+        return
+    
+    trabajo.actualizar(total_symbols=len(symbols_a_analizar))
+    resultados_positivos = []
+    datos_por_simbolo = {}
+
+    # Las descargas usan el pool compartido por todos los trabajos; cada símbolo se procesa
+    # en cuanto llegan sus datos y la cancelación del trabajo detiene las pendientes
+    descargas = gestor.descargar(trabajo, symbols_a_analizar, obtener_datos_historicos_binance, intervalo, dias,
+                                 medicion=medicion)
+
+    # El tiempo de 'descarga' es la espera por los datos: las etapas internas se descuentan
+    with medicion.etapa('descarga'):
+        for i, (symbol, df_historico) in enumerate(descargas, start=1):
+            medicion.sumar(simbolos=1, filas=len(df_historico))
+            trabajo.actualizar(current_symbol=symbol, progress=int((i / len(symbols_a_analizar)) * 100),
+                               metrics=medicion.resumen())
             
-            df_historico = obtener_datos_historicos_binance(symbol, intervalo, dias)
             if df_historico.empty: 
                 continue
 
-            df_con_indicadores = calcular_indicadores(df_historico.copy())
-            hay_senal, detalles = verificar_senal_de_compra(df_con_indicadores)
-            
-            if hay_senal:
-                detalles['simbolo'] = symbol
-                resultados_positivos.append(detalles)
-
-        # Guardar resultados
-        if resultados_positivos:
-            resultados_ordenados = sorted(resultados_positivos, key=lambda x: x['score'], reverse=True)
-            df_resultados = pd.DataFrame(resultados_ordenados)
-            df_resultados = df_resultados[['simbolo', 'score', 'precio_cierre', 'rsi', 'vol_ratio']]
-            
-            nombre_archivo = f"analisis_binance_{categoria}_{intervalo}_{dias}dias_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.csv"
-            df_resultados.to_csv(nombre_archivo, index=False, float_format='%.2f')
+            if modo_lote or multi_temporalidad:
+                datos_por_simbolo[symbol] = df_historico
+                continue
+
+            with medicion.etapa('indicadores'):
+                df_con_indicadores = calcular_indicadores_ultima_vela(df_historico, clave=(symbol, intervalo))
+            with medicion.etapa('senal'):
+                candidatos = evaluar_simbolo(symbol, df_historico, estrategias, fila=df_con_indicadores)
             
-            analysis_status['results'] = df_resultados.to_dict('records')
+            if candidatos:
+                resultados_positivos.extend(candidatos)
+                trabajo.anadir_candidatos(candidatos)
+
+    if multi_temporalidad and datos_por_simbolo:
+        with medicion.etapa('indicadores'):
+            resultados_positivos, _ = evaluar_temporalidades(datos_por_simbolo, intervalo, intervalos,
+                                                             estrategias=estrategias)
+        trabajo.anadir_candidatos(resultados_positivos)
+
+    # Modo por lotes: indicadores (los compartidos una sola vez) y señales para todos los símbolos a la vez
+    elif modo_lote and datos_por_simbolo:
+        with medicion.etapa('panel'):
+            panel = construir_panel(datos_por_simbolo, columnas_necesarias(estrategias))
+        with medicion.etapa('indicadores'):
+            calcular_indicadores(panel, estrategias)
+        with medicion.etapa('senal'):
+            resultados_positivos = evaluar_panel(panel, estrategias)
+        trabajo.anadir_candidatos(resultados_positivos)
+
+    # Guardar resultados
+    resultados = []
+    if resultados_positivos:
+        resultados_ordenados = sorted(resultados_positivos, key=lambda x: x['score'], reverse=True)
+        df_resultados = pd.DataFrame(resultados_ordenados)
+        columnas = ['simbolo', 'estrategia', 'score', 'precio_cierre', 'rsi', 'vol_ratio']
+        if multi_temporalidad:
+            columnas += ['temporalidades', 'num_temporalidades']
+        df_resultados = df_resultados[[columna for columna in columnas if columna in df_resultados]]
         
-        analysis_status['progress'] = 100
-        analysis_status['is_running'] = False
-        
-    except Exception as e:
-        analysis_status['error'] = str(e)
-        analysis_status['is_running'] = False
+        resultados = df_resultados.to_dict('records')
+        nombre_intervalo = '-'.join(intervalos) if multi_temporalidad else intervalo
+        with medicion.etapa('guardar'):
+            obtener_almacen_resultados().guardar_ejecucion(resultados, nombre_intervalo, categoria, dias,
+                                                           ejecucion_id=trabajo.id)
+    
+    trabajo.finalizar(results=resultados, progress=100 if trabajo.continuar() else trabajo['progress'],
+                      metrics=medicion.finalizar())
+
+# Gestor de escaneos: cada análisis es un trabajo con su propio id y estado
+gestor_trabajos = GestorTrabajos(run_technical_analysis)
 
 # --- RUTAS DE FLASK ---
 @app.route('/')
 def index():
     return render_template('index.html', 
                          intervalos=INTERVALOS_DISPONIBLES,
-                         categorias=obtener_categorias_disponibles())
+                         categorias=obtener_categorias_disponibles(),
+                         estrategias={e.id: e.nombre for e in estrategias_global.values()})
 
 @app.route('/api/start-analysis', methods=['POST'])
 def start_analysis():
-    """Inicia el análisis técnico en background."""
-    global analysis_status
-    
-    if analysis_status['is_running']:
-        return jsonify({'error': 'Análisis ya en progreso'}), 400
-    
+    """Crea un trabajo de análisis técnico que se ejecuta en background."""
     # Obtener configuración del usuario
     data = request.get_json()
     intervalo_input = data.get('intervalo', '1d')
-    dias = data.get('dias', 350)
+    dias = data.get('dias')
     categoria = data.get('categoria', 'todos')
+    modo_lote = bool(data.get('modo_lote', True))
+    # Opcional: varios intervalos a la vez (confluencia multi-temporalidad)
+    intervalos_input = data.get('intervalos') or [intervalo_input]
     
-    # Validar intervalo
-    if intervalo_input not in INTERVALOS_DISPONIBLES:
+    # Validar intervalos
+    if (not isinstance(intervalos_input, list) or
+            any(not isinstance(i, str) or i not in INTERVALOS_DISPONIBLES for i in intervalos_input)):
         return jsonify({'error': 'Intervalo no válido'}), 400
     
-    intervalo = INTERVALOS_DISPONIBLES[intervalo_input]
+    intervalos = ordenar_intervalos(INTERVALOS_DISPONIBLES[i] for i in intervalos_input)
+    # Con varios intervalos solo se descarga el más fino
+    intervalo = intervalos[0]
     
-    # Validar días
-    if not isinstance(dias, int) or dias < 30 or dias > 1000:
+    # Validar días (opcionales)
+    if not dias_validos(dias):
         return jsonify({'error': 'La cantidad de días debe estar entre 30 y 1000'}), 400
     
     # Validar categoría
@@ -459,42 +417,204 @@ def start_analysis():
     if categoria not in categorias_disponibles:
         return jsonify({'error': 'Categoría no válida'}), 400
     
-    # Validar configuración
-    es_valido, mensaje_error = validar_configuracion(intervalo, dias)
+    # Validar estrategias (una o varias sobre la misma descarga)
+    try:
+        estrategias = estrategias_solicitadas(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Validar configuración (con los días automáticos si no se indican: en multi-temporalidad
+    # el intervalo más fino se descarga para cubrir el más grueso)
+    dias_descarga = dias or dias_necesarios(intervalos, velas_necesarias(estrategias))
+    es_valido, mensaje_error = validar_configuracion(intervalo, dias_descarga)
     if not es_valido:
         return jsonify({'error': mensaje_error}), 400
     
-    # Actualizar configuración
-    analysis_status['config']['intervalo'] = intervalo
-    analysis_status['config']['dias'] = dias
-    analysis_status['config']['categoria'] = categoria
-    
-    # Reset status
-    analysis_status['is_running'] = False
-    analysis_status['progress'] = 0
-    analysis_status['total_symbols'] = 0
-    analysis_status['current_symbol'] = ''
-    analysis_status['results'] = []
-    analysis_status['error'] = None
-    
-    # Start analysis in background thread
-    thread = threading.Thread(target=run_technical_analysis)
-    thread.daemon = True
-    thread.start()
+    trabajo = gestor_trabajos.crear({
+        'intervalo': intervalo,
+        'dias': dias,
+        'categoria': categoria,
+        'modo_lote': modo_lote,
+        'intervalos': intervalos,
+        'estrategias': [e.id for e in estrategias]
+    })
+    if trabajo is None:
+        return jsonify({'error': 'Demasiados análisis en curso, inténtalo más tarde'}), 429
     
     return jsonify({
         'message': 'Análisis iniciado',
+        'job_id': trabajo.id,
         'config': {
             'intervalo': intervalo_input,
+            'intervalos': intervalos,
             'dias': dias,
-            'categoria': categoria
+            'categoria': categoria,
+            'estrategias': [e.id for e in estrategias]
         }
     })
 
+def _trabajo_solicitado():
+    """Trabajo indicado por ?job_id=, o el último creado si no se indica."""
+    id_trabajo = request.args.get('job_id')
+    if id_trabajo:
+        return gestor_trabajos.obtener(id_trabajo)
+    return gestor_trabajos.ultimo()
+
+def _consulta_resultados():
+    """
+    Lee de la petición la página (limit, offset), el orden (sort, order), los mínimos
+    (min_score, min_rsi, min_vol_ratio), la búsqueda por símbolo (q) y la estrategia
+    (estrategia). Lanza ValueError si algún parámetro no es válido.
+    """
+    args = request.args
+    limite = int(args.get('limit', LIMITE_RESULTADOS_POR_DEFECTO))
+    desplazamiento = int(args.get('offset', 0))
+    if not 1 <= limite <= MAX_LIMITE_RESULTADOS or desplazamiento < 0:
+        raise ValueError(f"limit debe estar entre 1 y {MAX_LIMITE_RESULTADOS} y offset no puede ser negativo")
+    orden = args.get('sort', 'score')
+    if orden not in COLUMNAS_ORDENABLES:
+        raise ValueError(f"sort debe ser uno de: {', '.join(COLUMNAS_ORDENABLES)}")
+    sentido = args.get('order', 'desc')
+    if sentido not in ('asc', 'desc'):
+        raise ValueError("order debe ser 'asc' o 'desc'")
+    minimos = {columna: float(args[parametro]) for parametro, columna in FILTROS_MINIMOS.items()
+               if args.get(parametro, '') != ''}
+    return {
+        'orden': orden,
+        'descendente': sentido == 'desc',
+        'limite': limite,
+        'desplazamiento': desplazamiento,
+        'minimos': minimos,
+        'busqueda': args.get('q', '').strip() or None,
+        'estrategia': args.get('estrategia') or None,
+    }
+
+def _pagina_resultados(ejecucion_id, consulta):
+    """Página de resultados de una ejecución con el total que cumple los filtros."""
+    total, filas = obtener_almacen_resultados().consultar(ejecucion_id, **consulta)
+    return {'results': filas, 'results_total': total,
+            'limit': consulta['limite'], 'offset': consulta['desplazamiento']}
+
+def _respuesta_json(datos):
+    """
+    JSON con ETag (304 si el cliente ya tiene esta versión) y gzip si el cliente lo acepta.
+    La representación comprimida son otros bytes, así que lleva su propio ETag ('-gzip').
+    """
+    cuerpo = app.json.dumps(datos).encode('utf-8')
+    comprimir = len(cuerpo) >= MIN_BYTES_GZIP and 'gzip' in request.accept_encodings
+    respuesta = Response(cuerpo, mimetype='application/json')
+    etag = generate_etag(cuerpo)
+    respuesta.set_etag(etag + '-gzip' if comprimir else etag)
+    respuesta.vary.add('Accept-Encoding')
+    respuesta.make_conditional(request)
+    if comprimir and respuesta.status_code == 200:
+        respuesta.set_data(gzip.compress(cuerpo))
+        respuesta.headers['Content-Encoding'] = 'gzip'
+    return respuesta
+
 @app.route('/api/analysis-status')
 def get_analysis_status():
-    """Obtiene el estado actual del análisis."""
-    return jsonify(analysis_status)
+    """
+    Obtiene el estado de un análisis (?job_id=) o del último lanzado. Los resultados se
+    paginan, ordenan y filtran con los parámetros de _consulta_resultados.
+    """
+    trabajo = _trabajo_solicitado()
+    if trabajo is None:
+        if request.args.get('job_id'):
+            return jsonify({'error': 'Trabajo no encontrado'}), 404
+        return jsonify(ESTADO_SIN_TRABAJOS)
+    try:
+        consulta = _consulta_resultados()
+    except ValueError as e:
+        return jsonify({'error': f'Parámetros no válidos: {e}'}), 400
+
+    # Los resultados se guardan en el almacén (con el id del trabajo) al terminar el escaneo
+    estado = trabajo.estado()
+    estado.update(_pagina_resultados(trabajo.id, consulta))
+    return _respuesta_json(estado)
+
+@app.route('/api/jobs')
+def list_jobs():
+    """Lista los trabajos de análisis (sin los resultados completos)."""
+    return jsonify({'jobs': gestor_trabajos.listar()})
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Obtiene el estado de un trabajo, con los resultados paginados igual que /api/analysis-status."""
+    trabajo = gestor_trabajos.obtener(job_id)
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    try:
+        consulta = _consulta_resultados()
+    except ValueError as e:
+        return jsonify({'error': f'Parámetros no válidos: {e}'}), 400
+
+    estado = trabajo.estado()
+    estado.update(_pagina_resultados(trabajo.id, consulta))
+    return _respuesta_json(estado)
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancela un trabajo en cola o en ejecución."""
+    trabajo = gestor_trabajos.cancelar(job_id)
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify({'message': 'Cancelación solicitada', 'job_id': job_id})
+
+def _evento_sse(evento, datos):
+    """Formatea un evento Server-Sent Events."""
+    return f"event: {evento}\ndata: {json.dumps(datos, default=float)}\n\n"
+
+@app.route('/api/analysis-stream')
+def analysis_stream():
+    """
+    Stream SSE de un análisis (?job_id=, o el último). Solo envía cambios: progreso y símbolo
+    actual cuando varían, cada candidato nuevo una vez, y al final un evento 'done' con el
+    número de resultados (se piden paginados a /api/get-latest-results?run_id=).
+    """
+    trabajo = _trabajo_solicitado()
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+
+    def generar():
+        ultimo_progreso = None
+        candidatos_enviados = 0
+        ultimo_envio = time.time()
+
+        while True:
+            estado = trabajo.estado()
+            progreso = (estado['progress'], estado['current_symbol'], estado['total_symbols'])
+            if progreso != ultimo_progreso:
+                ultimo_progreso = progreso
+                ultimo_envio = time.time()
+                yield _evento_sse('progress', {
+                    'progress': progreso[0],
+                    'current_symbol': progreso[1],
+                    'total_symbols': progreso[2]
+                })
+
+            nuevos = trabajo.candidatos[candidatos_enviados:]
+            for candidato in nuevos:
+                yield _evento_sse('candidate', candidato)
+            candidatos_enviados += len(nuevos)
+
+            if not estado['is_running']:
+                yield _evento_sse('done', {
+                    'job_id': trabajo.id,
+                    'progress': estado['progress'],
+                    'cancelled': estado['cancelled'],
+                    'error': estado['error'],
+                    'results_count': len(estado['results'])
+                })
+                return
+
+            if time.time() - ultimo_envio > INTERVALO_KEEPALIVE:
+                ultimo_envio = time.time()
+                yield ": keep-alive\n\n"
+            time.sleep(INTERVALO_STREAM)
+
+    return Response(stream_with_context(generar()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/add-symbol', methods=['POST'])
 def add_symbol():
@@ -502,7 +622,7 @@ def add_symbol():
     data = request.get_json()
     symbol = data.get('symbol', '').upper()
     intervalo_input = data.get('intervalo', '1d')
-    dias = data.get('dias', 350)
+    dias = data.get('dias')
     
     if not symbol:
         return jsonify({'error': 'Símbolo requerido'}), 400
@@ -513,27 +633,38 @@ def add_symbol():
     
     intervalo = INTERVALOS_DISPONIBLES[intervalo_input]
     
-    # Validar días
-    if not isinstance(dias, int) or dias < 30 or dias > 1000:
+    # Validar días (opcionales)
+    if not dias_validos(dias):
         return jsonify({'error': 'La cantidad de días debe estar entre 30 y 1000'}), 400
     
+    # Un solo símbolo admite historias largas (se descargan por ventanas reanudables)
+    mensaje_error = validar_dias_intervalo(intervalo, dias)
+    if mensaje_error:
+        return jsonify({'error': mensaje_error}), 400
+    
+    try:
+        estrategias = estrategias_solicitadas(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     # Añadir USDT si no está presente
     if not symbol.endswith('USDT'):
         symbol += 'USDT'
     
     # Analizar el símbolo
-    df_historico = obtener_datos_historicos_binance(symbol, intervalo, dias)
+    df_historico = obtener_datos_historicos_binance(
+        symbol, intervalo, dias or dias_necesarios([intervalo], velas_necesarias(estrategias)))
     if df_historico.empty:
         return jsonify({'error': f'No se pudieron obtener datos para {symbol}'}), 400
     
-    df_con_indicadores = calcular_indicadores(df_historico.copy())
-    hay_senal, detalles = verificar_senal_de_compra(df_con_indicadores)
+    df_con_indicadores = calcular_indicadores_ultima_vela(df_historico, clave=(symbol, intervalo))
+    candidatos = evaluar_simbolo(symbol, df_historico, estrategias, fila=df_con_indicadores)
     
-    if hay_senal:
-        detalles['simbolo'] = symbol
+    if candidatos:
         return jsonify({
             'success': True,
-            'result': detalles,
+            'result': max(candidatos, key=lambda x: x['score']),
+            'results': candidatos,
             'message': f'{symbol} cumple con los criterios técnicos'
         })
     else:
@@ -551,34 +682,67 @@ def analyze_with_ai():
     if not symbols:
         return jsonify({'error': 'Lista de símbolos requerida'}), 400
     
-    results = []
-    for symbol in symbols:
-        analysis = analyze_with_gemini(symbol)
-        results.append(analysis)
+    try:
+        batch_size = int(data.get('batch_size', TAMANO_LOTE))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'batch_size debe ser un número entero'}), 400
+    
+    # Varios símbolos por llamada (batch_size=1 desactiva los lotes), en paralelo y con límite
+    # de tasa; los resultados mantienen el orden de entrada
+    results = analizar_simbolos_en_lotes(symbols, build_analysis_prompt, tamano_lote=batch_size)
     
     return jsonify({'results': results})
 
+@app.route('/api/ai-cache-stats')
+def get_ai_cache_stats():
+    """Estadísticas de la cache de análisis de IA (aciertos, fallos, entradas)."""
+    return jsonify(obtener_cache().estadisticas())
+
 @app.route('/api/download-csv')
 def download_csv():
-    """Descarga el archivo CSV más reciente."""
-    csv_file = find_latest_csv()
-    if not csv_file:
-        return jsonify({'error': 'No se encontró archivo CSV'}), 404
+    """Descarga como CSV una ejecución (por defecto la más reciente)."""
+    almacen = obtener_almacen_resultados()
+    run_id = request.args.get('run_id')
+    ejecucion = almacen.obtener_ejecucion(run_id) if run_id else almacen.ultima_ejecucion()
+    if not ejecucion:
+        return jsonify({'error': 'No se encontraron resultados'}), 404
     
-    return send_file(csv_file, as_attachment=True)
+    return Response(almacen.exportar_csv(ejecucion['id']), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={almacen.nombre_csv(ejecucion)}'})
 
 @app.route('/api/get-latest-results')
 def get_latest_results():
-    """Obtiene los resultados del CSV más reciente."""
-    csv_file = find_latest_csv()
-    if not csv_file:
-        return jsonify({'error': 'No se encontró archivo CSV'}), 404
-    
+    """
+    Obtiene una página de resultados de una ejecución (?run_id=) o de la más reciente
+    (opcionalmente por intervalo/categoría), con los parámetros de _consulta_resultados.
+    """
+    almacen = obtener_almacen_resultados()
+    run_id = request.args.get('run_id')
+    if run_id:
+        ejecucion = almacen.obtener_ejecucion(run_id)
+    else:
+        ejecucion = almacen.ultima_ejecucion(intervalo=request.args.get('intervalo'),
+                                             categoria=request.args.get('categoria'))
+    if not ejecucion:
+        return jsonify({'error': 'No se encontraron resultados'}), 404
     try:
-        df = pd.read_csv(csv_file)
-        return jsonify({'results': df.to_dict('records')})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        consulta = _consulta_resultados()
+    except ValueError as e:
+        return jsonify({'error': f'Parámetros no válidos: {e}'}), 400
+    
+    return _respuesta_json({'run': ejecucion, **_pagina_resultados(ejecucion['id'], consulta)})
+
+@app.route('/metrics')
+def metrics():
+    """Métricas del escáner en formato de texto de Prometheus."""
+    return Response(metricas_global.exponer(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/get-strategies')
+def get_strategies():
+    """Obtiene las estrategias registradas (id, nombre y descripción)."""
+    return jsonify({
+        'strategies': [e.descripcion_publica() for e in estrategias_global.values()]
+    })
 
 @app.route('/api/get-categories')
 def get_categories():
@@ -593,11 +757,90 @@ def get_symbols_info():
     try:
         simbolos_info = obtener_info_simbolos_detallada(quote_asset='USDT')
         return jsonify({
-            'symbols': simbolos_info,
+            'symbols': list(simbolos_info),
             'total': len(simbolos_info)
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/realtime/start', methods=['POST'])
+def start_realtime():
+    """Inicia el escáner continuo sobre los streams de klines de Binance."""
+    global escaner_tiempo_real
+
+    if escaner_tiempo_real is not None and escaner_tiempo_real.activo:
+        return jsonify({'error': 'El escáner en tiempo real ya está activo'}), 400
+
+    data = request.get_json() or {}
+    intervalo_input = data.get('intervalo', '1h')
+    dias = data.get('dias')
+    categoria = data.get('categoria', 'top100')
+
+    if intervalo_input not in INTERVALOS_DISPONIBLES:
+        return jsonify({'error': 'Intervalo no válido'}), 400
+    if categoria not in obtener_categorias_disponibles():
+        return jsonify({'error': 'Categoría no válida'}), 400
+    if not dias_validos(dias):
+        return jsonify({'error': 'La cantidad de días debe estar entre 30 y 1000'}), 400
+    try:
+        estrategias = estrategias_solicitadas(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # El estado incremental del tiempo real solo mantiene Close, Volume, SMA_50, SMA_200, RSI_14
+    # y VOLUME_SMA_20
+    for estrategia in estrategias:
+        if not estrategia.usa_solo(INDICADORES_ULTIMA_VELA):
+            return jsonify({'error': f'La estrategia {estrategia.id} no está disponible en tiempo real'}), 400
+
+    intervalo = INTERVALOS_DISPONIBLES[intervalo_input]
+    dias = dias or dias_necesarios([intervalo], velas_necesarias(estrategias))
+    es_valido, mensaje_error = validar_configuracion(intervalo, dias)
+    if not es_valido:
+        return jsonify({'error': mensaje_error}), 400
+
+    simbolos = filtrar_simbolos_por_categoria(obtener_info_simbolos_detallada(quote_asset='USDT'), categoria)
+    if not simbolos:
+        return jsonify({'error': f"No se encontraron símbolos para la categoría '{categoria}'."}), 400
+
+    escaner_tiempo_real = EscanerTiempoReal(simbolos, intervalo, dias,
+                                            obtener_datos_historicos_binance,
+                                            {estrategia.id: estrategia.verificar for estrategia in estrategias},
+                                            fuente=FuenteBinanceWebsocket(api_key, api_secret))
+    # El calentamiento descarga la historia, así que se hace en segundo plano
+    escaner_tiempo_real.iniciar_en_segundo_plano()
+
+    return jsonify({
+        'message': 'Escáner en tiempo real iniciado',
+        'config': {
+            'intervalo': intervalo_input,
+            'dias': dias,
+            'categoria': categoria,
+            'estrategias': [estrategia.id for estrategia in estrategias],
+            'total_symbols': len(simbolos)
+        }
+    })
+
+@app.route('/api/realtime/stop', methods=['POST'])
+def stop_realtime():
+    """Detiene el escáner continuo."""
+    if escaner_tiempo_real is None or not escaner_tiempo_real.activo:
+        return jsonify({'error': 'El escáner en tiempo real no está activo'}), 400
+
+    escaner_tiempo_real.detener()
+    return jsonify({'message': 'Escáner en tiempo real detenido'})
+
+@app.route('/api/realtime/signals')
+def get_realtime_signals():
+    """Devuelve las señales detectadas por el escáner continuo desde el id indicado."""
+    if escaner_tiempo_real is None:
+        return jsonify({'active': False, 'signals': []})
+
+    desde = request.args.get('desde', 0, type=int)
+    return jsonify({
+        'active': escaner_tiempo_real.activo,
+        'symbols_ready': len(escaner_tiempo_real.estados),
+        'signals': escaner_tiempo_real.senales_desde(desde)
+    })
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -0,0 +1,296 @@
+# backtest.py
+#
+# Backtest vectorizado de una estrategia del registro (estrategias.py; por defecto la ESTRATEGIA
+# FLEXIBLE) sobre las velas del almacén local. Con una fecha de inicio, la historia que le falte
+# al almacén se descarga de Binance por ventanas (descarga_historica).
+#
+# Uso: python backtest.py [intervalo] [desde] [estrategia] [velas_mantenimiento] [stop_loss] [take_profit]
+#      p. ej. python backtest.py 1d "3 years ago UTC" flexible 10 0.08 0.2
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from almacen_klines import almacen_global
+from descarga_historica import descargar_historia
+from estrategias import ESTRATEGIA_POR_DEFECTO, calcular_indicadores, obtener_estrategias
+from panel_indicadores import construir_panel
+from parser_klines import marca_a_ms
+
+# --- CONFIGURACIÓN DEL BACKTEST ---
+VELAS_MANTENIMIENTO = 10   # Salida por tiempo: velas que se mantiene cada posición
+STOP_LOSS = None           # Fracción bajo el precio de entrada (0.08 = -8%), o None
+TAKE_PROFIT = None         # Fracción sobre el precio de entrada (0.2 = +20%), o None
+COMISION = 0.001           # Por lado (0.1% en Binance spot)
+COLUMNAS_BACKTEST = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+def cargar_panel_almacen(intervalo, simbolos=None, almacen=None):
+    """
+    Panel OHLCV (símbolos × tiempo) con las velas ya guardadas; no llama a Binance. Las columnas
+    son fechas ('Open Time'), así que los símbolos listados más tarde quedan a NaN al principio.
+    """
+    almacen = almacen if almacen is not None else almacen_global
+    if simbolos is None:
+        simbolos = almacen.simbolos_guardados(intervalo)
+    datos = {}
+    for simbolo in simbolos:
+        guardados, _ = almacen.leer(simbolo, intervalo)
+        if guardados is not None and len(guardados):
+            datos[simbolo] = guardados
+    return construir_panel(datos, COLUMNAS_BACKTEST, por_tiempo=True)
+
+
+def cargar_panel_historia(intervalo, inicio, simbolos=None, almacen=None):
+    """
+    Panel OHLCV (símbolos × tiempo) desde `inicio` (ms o fecha como en python-binance). Lo que
+    falte en el almacén se descarga con descargar_historia y queda guardado para la próxima vez.
+    Por defecto usa los símbolos que ya tiene el almacén para `intervalo`.
+    """
+    almacen = almacen if almacen is not None else almacen_global
+    if simbolos is None:
+        simbolos = almacen.simbolos_guardados(intervalo)
+    inicio_ms = marca_a_ms(inicio)
+    datos = {}
+    for simbolo in simbolos:
+        try:
+            datos[simbolo] = almacen.obtener_desde(simbolo, intervalo, inicio_ms,
+                                                   lambda desde: descargar_historia(simbolo, intervalo, desde))
+        except Exception as e:
+            print(f"Error obteniendo datos para {simbolo}: {e}")
+    return construir_panel(datos, COLUMNAS_BACKTEST, por_tiempo=True)
+
+
+def senales_historicas(panel, estrategia=None):
+    """
+    Máscara símbolos × tiempo con las velas en las que `estrategia` (una Estrategia de
+    obtener_estrategias(); por defecto la flexible) da señal de compra.
+    """
+    estrategia = estrategia if estrategia is not None else obtener_estrategias()[0]
+    calcular_indicadores(panel, [estrategia], historico=True)
+    valores = {columna: panel[columna] for columna in estrategia.columnas}
+    valores.update({nombre: panel[spec] for nombre, spec in estrategia.indicadores.items()})
+    senal, _, _ = estrategia.evaluar(valores)
+    return senal
+
+
+def _ultima_vela(cierre):
+    """Índice de la última vela con datos de cada símbolo (-1 si no tiene ninguna)."""
+    validas = ~np.isnan(cierre)
+    return np.where(validas.any(axis=1), cierre.shape[1] - 1 - np.argmax(validas[:, ::-1], axis=1), -1)
+
+
+def _activos(cierre):
+    """Máscara símbolos × tiempo de las fechas entre la primera y la última vela de cada símbolo."""
+    validas = ~np.isnan(cierre)
+    return np.logical_or.accumulate(validas, axis=1) & np.logical_or.accumulate(validas[:, ::-1], axis=1)[:, ::-1]
+
+
+def _rellenar_hacia_delante(valores):
+    """Rellena cada NaN con el último valor anterior de su fila (los huecos valen el último cierre)."""
+    indices = np.where(~np.isnan(valores), np.arange(valores.shape[1]), 0)
+    np.maximum.accumulate(indices, axis=1, out=indices)
+    return np.take_along_axis(valores, indices, axis=1)
+
+
+def _sin_solapamiento(fila, entrada, salida):
+    """Una sola posición por símbolo: descarta las señales que llegan con otra posición abierta."""
+    tomar = np.zeros(len(fila), dtype=bool)
+    fila_actual = -1
+    libre_desde = 0
+    for k, (f, e, s) in enumerate(zip(fila.tolist(), entrada.tolist(), salida.tolist())):
+        if f != fila_actual:
+            fila_actual = f
+            libre_desde = 0
+        if e >= libre_desde:
+            tomar[k] = True
+            libre_desde = s + 1
+    return tomar
+
+
+def simular_operaciones(panel, senales, velas_mantenimiento=VELAS_MANTENIMIENTO, stop_loss=STOP_LOSS,
+                        take_profit=TAKE_PROFIT, comision=COMISION, solapar=False):
+    """
+    Simula una operación por señal: entrada en la apertura de la vela siguiente y salida por
+    stop, take profit o al cierre de la vela `velas_mantenimiento`. Si en una misma vela se tocan
+    el stop y el take profit se asume el stop. Las posiciones que siguen abiertas al final de la
+    historia del símbolo se valoran a su último cierre y se marcan como 'abierta'. Si falta alguna
+    vela dentro de la posición, se valora al último cierre anterior.
+
+    Devuelve un dict de arrays (una posición por operación).
+    """
+    abrir, alto, bajo, cierre = panel['Open'], panel['High'], panel['Low'], panel['Close']
+    cierre_relleno = _rellenar_hacia_delante(cierre)
+    ultima_vela = _ultima_vela(cierre)
+
+    fila, col_senal = np.nonzero(senales[:, :-1])
+    entrada = col_senal + 1
+    precio_entrada = abrir[fila, entrada]
+    validas = precio_entrada > 0
+    fila, col_senal, entrada, precio_entrada = fila[validas], col_senal[validas], entrada[validas], precio_entrada[validas]
+
+    # Ventana de velas de cada operación (n_operaciones × velas_mantenimiento), sin pasar de la
+    # última vela del símbolo
+    ultima = ultima_vela[fila]
+    pasos = np.arange(velas_mantenimiento)
+    velas = entrada[:, None] + pasos[None, :]
+    dentro = velas <= ultima[:, None]
+    velas = np.minimum(velas, ultima[:, None])
+    ultimo_paso = np.minimum(velas_mantenimiento, ultima - entrada + 1) - 1
+
+    paso_salida = ultimo_paso.copy()
+    motivo = np.where(ultimo_paso < velas_mantenimiento - 1, 'abierta', 'tiempo').astype(object)
+    precio_salida = cierre_relleno[fila, velas[np.arange(len(fila)), paso_salida]]
+
+    # Primero el take profit y después el stop, para que el stop gane si ambos caen en la misma vela
+    for nivel, columna_precio, nombre, toca_nivel in (
+            (take_profit, alto, 'take_profit', lambda precios, nivel: precios >= nivel),
+            (stop_loss, bajo, 'stop_loss', lambda precios, nivel: precios <= nivel)):
+        if nivel is None:
+            continue
+        precio_nivel = precio_entrada * (1 + nivel if nombre == 'take_profit' else 1 - nivel)
+        toca = toca_nivel(columna_precio[fila[:, None], velas], precio_nivel[:, None]) & dentro
+        primer_paso = np.where(toca.any(axis=1), toca.argmax(axis=1), velas_mantenimiento)
+        salta = primer_paso <= paso_salida
+        paso_salida = np.where(salta, primer_paso, paso_salida)
+        # Si la vela abre más allá del nivel (hueco), se sale a la apertura
+        apertura = abrir[fila, velas[np.arange(len(fila)), np.minimum(primer_paso, velas_mantenimiento - 1)]]
+        con_hueco = np.maximum(apertura, precio_nivel) if nombre == 'take_profit' else np.minimum(apertura, precio_nivel)
+        precio_salida = np.where(salta, con_hueco, precio_salida)
+        motivo = np.where(salta, nombre, motivo)
+
+    salida = entrada + paso_salida
+    retorno = (precio_salida / precio_entrada) * (1 - comision) ** 2 - 1
+
+    if not solapar:
+        tomar = _sin_solapamiento(fila, entrada, salida)
+        fila, col_senal, entrada, salida = fila[tomar], col_senal[tomar], entrada[tomar], salida[tomar]
+        precio_entrada, precio_salida = precio_entrada[tomar], precio_salida[tomar]
+        retorno, motivo = retorno[tomar], motivo[tomar]
+
+    return {
+        'fila': fila,
+        'vela_senal': col_senal,
+        'vela_entrada': entrada,
+        'vela_salida': salida,
+        'precio_entrada': precio_entrada,
+        'precio_salida': precio_salida,
+        'retorno': retorno,
+        'motivo': motivo,
+    }
+
+
+def _max_drawdown(capital):
+    """Máxima caída desde máximos, por filas (o de una sola curva)."""
+    return np.max(1 - capital / np.maximum.accumulate(capital, axis=-1), axis=-1)
+
+
+def resumir_operaciones(panel, operaciones):
+    """
+    Estadísticas por símbolo y agregadas. El capital de cada símbolo se compone operación a
+    operación y se valora al cerrar cada una; en cada vela la cartera reparte el capital a partes
+    iguales entre los símbolos activos en esa fecha (ya listados y aún no retirados).
+    """
+    filas, columnas = panel['Close'].shape
+    fila = operaciones['fila']
+    retorno = operaciones['retorno']
+
+    rendimientos = np.zeros((filas, columnas))
+    np.add.at(rendimientos, (fila, operaciones['vela_salida']), np.log1p(retorno))
+    capital = np.exp(np.cumsum(rendimientos, axis=1))
+
+    num_operaciones = np.bincount(fila, minlength=filas)
+    aciertos = np.bincount(fila, weights=retorno > 0, minlength=filas)
+    suma_retornos = np.bincount(fila, weights=retorno, minlength=filas)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        por_simbolo = pd.DataFrame({
+            'simbolo': panel['simbolos'],
+            'operaciones': num_operaciones,
+            'tasa_acierto': aciertos / num_operaciones,
+            'retorno_medio': suma_retornos / num_operaciones,
+            'retorno_total': capital[:, -1] - 1 if columnas else np.zeros(filas),
+            'max_drawdown': _max_drawdown(capital) if columnas else np.zeros(filas),
+        })
+
+    if filas and columnas:
+        activos = _activos(panel['Close'])
+        num_activos = activos.sum(axis=0)
+        retorno_activos = np.where(activos, np.expm1(rendimientos), 0.0).sum(axis=0)
+        retorno_vela = np.divide(retorno_activos, num_activos, out=np.zeros(columnas), where=num_activos > 0)
+        cartera = np.cumprod(1 + retorno_vela)
+    else:
+        cartera = np.ones(1)
+    agregado = {
+        'simbolos': filas,
+        'simbolos_con_operaciones': int(np.count_nonzero(num_operaciones)),
+        'operaciones': len(retorno),
+        'tasa_acierto': float(np.mean(retorno > 0)) if len(retorno) else 0.0,
+        'retorno_medio': float(np.mean(retorno)) if len(retorno) else 0.0,
+        'retorno_mediano': float(np.median(retorno)) if len(retorno) else 0.0,
+        'velas_medias': float(np.mean(operaciones['vela_salida'] - operaciones['vela_entrada'] + 1)) if len(retorno) else 0.0,
+        'retorno_cartera': float(cartera[-1] - 1),
+        'max_drawdown_cartera': float(_max_drawdown(cartera)),
+    }
+    return por_simbolo, agregado
+
+
+def ejecutar_backtest(panel, senales=None, velas_mantenimiento=VELAS_MANTENIMIENTO, stop_loss=STOP_LOSS,
+                      take_profit=TAKE_PROFIT, comision=COMISION, solapar=False, estrategia=None):
+    """
+    Backtest completo sobre un panel OHLCV. Las señales son las de `estrategia` (por defecto la
+    flexible); `senales` permite pasar otra máscara (p. ej. con otros umbrales).
+    Devuelve (operaciones como DataFrame, estadísticas por símbolo, estadísticas agregadas).
+    """
+    if senales is None:
+        senales = senales_historicas(panel, estrategia)
+    operaciones = simular_operaciones(panel, senales, velas_mantenimiento, stop_loss, take_profit, comision, solapar)
+    por_simbolo, agregado = resumir_operaciones(panel, operaciones)
+
+    df_operaciones = pd.DataFrame(operaciones)
+    df_operaciones.insert(0, 'simbolo', np.asarray(panel['simbolos'], dtype=object)[operaciones['fila']]
+                          if len(operaciones['fila']) else [])
+    return df_operaciones.drop(columns='fila'), por_simbolo, agregado
+
+
+if __name__ == "__main__":
+    intervalo = sys.argv[1] if len(sys.argv) > 1 else '1d'
+    desde = sys.argv[2] if len(sys.argv) > 2 and sys.argv[2] else None
+    id_estrategia = sys.argv[3] if len(sys.argv) > 3 else ESTRATEGIA_POR_DEFECTO
+    velas_mantenimiento = int(sys.argv[4]) if len(sys.argv) > 4 else VELAS_MANTENIMIENTO
+    stop_loss = float(sys.argv[5]) if len(sys.argv) > 5 else STOP_LOSS
+    take_profit = float(sys.argv[6]) if len(sys.argv) > 6 else TAKE_PROFIT
+
+    try:
+        estrategia = obtener_estrategias([id_estrategia])[0]
+    except KeyError:
+        print(f"❌ Estrategia no válida: {id_estrategia}")
+        sys.exit(1)
+
+    if desde is None:
+        panel = cargar_panel_almacen(intervalo)
+    else:
+        # Sin velas guardadas de este intervalo se prueba sobre todo el universo USDT
+        simbolos = almacen_global.simbolos_guardados(intervalo)
+        if not simbolos:
+            from instantanea_mercado import instantanea_global
+            simbolos = instantanea_global.simbolos('USDT')
+        print(f"Cargando {len(simbolos)} símbolos de {intervalo} desde {desde}...")
+        panel = cargar_panel_historia(intervalo, desde, simbolos)
+    if not panel['simbolos']:
+        print(f"❌ No hay velas de {intervalo} en el almacén. Indica una fecha de inicio o ejecuta antes un escaneo.")
+        sys.exit(1)
+
+    print(f"Backtest de {estrategia.nombre} en {len(panel['simbolos'])} símbolos × "
+          f"{panel['Close'].shape[1]} velas de {intervalo}...")
+    operaciones, por_simbolo, agregado = ejecutar_backtest(panel, velas_mantenimiento=velas_mantenimiento,
+                                                           stop_loss=stop_loss, take_profit=take_profit,
+                                                           estrategia=estrategia)
+
+    print("\n--- RESULTADO AGREGADO ---")
+    for clave, valor in agregado.items():
+        print(f"{clave:>26}: {valor:.4f}" if isinstance(valor, float) else f"{clave:>26}: {valor}")
+
+    print("\n--- MEJORES SÍMBOLOS (retorno total) ---")
+    con_operaciones = por_simbolo[por_simbolo['operaciones'] > 0]
+    print(con_operaciones.sort_values('retorno_total', ascending=False).head(20).to_string(index=False))
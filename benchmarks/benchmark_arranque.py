@@ -0,0 +1,123 @@
+# benchmark_arranque.py
+#
+# Mide el arranque de los puntos de entrada (import de app, main, gemini-analysis...) en
+# procesos nuevos con `python -X importtime`: tiempo total, tiempo acumulado de cada módulo
+# que importan directamente y qué SDK pesados quedan cargados. Escribe los resultados en JSON
+# para comparar versiones, como benchmark_escaneo.py.
+#
+# Uso: python benchmarks/benchmark_arranque.py [--modulos app,main,gemini-analysis]
+#          [--repeticiones 5] [--salida resultados.json]
+#
+# Necesita config.py como app.py.
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+from benchmark_escaneo import DIRECTORIO_RESULTADOS, version_codigo
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULOS = ('app', 'main', 'gemini-analysis', 'backtest', 'optimizador')
+# Dependencias pesadas que conviene no cargar al arrancar
+SDK_PESADOS = ('binance', 'google.generativeai', 'pandas', 'numpy')
+MODULOS_MAS_LENTOS = 10
+
+CODIGO_MEDICION = """
+import json, sys, time
+inicio = time.perf_counter()
+__import__({modulo!r})  # importlib.import_module no aparece en -X importtime
+print(json.dumps({{'segundos': time.perf_counter() - inicio,
+                  'cargados': [m for m in {sdk!r} if m in sys.modules]}}))
+"""
+
+
+def _ejecutar(argumentos):
+    proceso = subprocess.run([sys.executable, *argumentos], cwd=RAIZ, capture_output=True, text=True,
+                             stdin=subprocess.DEVNULL)
+    if proceso.returncode != 0:
+        raise RuntimeError(proceso.stderr.strip().splitlines()[-1] if proceso.stderr.strip() else 'error')
+    return proceso
+
+
+def importaciones_directas(salida_importtime, modulo):
+    """{módulo: segundos acumulados} de lo que importa `modulo` directamente (nivel 1 de -X importtime)."""
+    hijos = {}
+    for linea in salida_importtime.splitlines():
+        if not linea.startswith('import time:') or '|' not in linea:
+            continue
+        _, acumulado, nombre = linea[len('import time:'):].split('|')
+        if not acumulado.strip().isdigit():
+            continue  # Cabecera
+        nivel = (len(nombre) - len(nombre.lstrip()) - 1) // 2
+        nombre = nombre.strip()
+        if nivel == 1:
+            hijos[nombre] = int(acumulado) / 1e6
+        elif nivel == 0:
+            # Las líneas salen al terminar cada import: los hijos van antes que su padre
+            if nombre == modulo:
+                return hijos
+            hijos = {}
+    return hijos
+
+
+def medir(modulo, repeticiones):
+    totales = []
+    por_modulo = {}
+    cargados = []
+    for _ in range(repeticiones):
+        proceso = _ejecutar(['-X', 'importtime', '-c', CODIGO_MEDICION.format(modulo=modulo, sdk=SDK_PESADOS)])
+        resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+        totales.append(resultado['segundos'])
+        cargados = resultado['cargados']
+        for nombre, segundos in importaciones_directas(proceso.stderr, modulo).items():
+            por_modulo.setdefault(nombre, []).append(segundos)
+
+    medianas = {nombre: statistics.median(valores) for nombre, valores in por_modulo.items()}
+    mas_lentos = sorted(medianas.items(), key=lambda x: x[1], reverse=True)[:MODULOS_MAS_LENTOS]
+    return {
+        'modulo': modulo,
+        'segundos_import': statistics.median(totales),
+        'segundos_import_min': min(totales),
+        'importaciones_mas_lentas': [[nombre, segundos] for nombre, segundos in mas_lentos],
+        'sdk_cargados': cargados,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del tiempo de arranque (imports por módulo)")
+    parser.add_argument('--modulos', default=','.join(MODULOS))
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--salida', default=None)
+    args = parser.parse_args()
+
+    mediciones = []
+    for modulo in args.modulos.split(','):
+        try:
+            medicion = medir(modulo, args.repeticiones)
+        except RuntimeError as e:
+            print(f"{modulo}: no se pudo importar ({e})")
+            continue
+        mediciones.append(medicion)
+        lentos = ', '.join(f"{nombre} {segundos:.3f}s" for nombre, segundos in medicion['importaciones_mas_lentas'][:5])
+        print(f"{modulo}: {medicion['segundos_import']:.3f}s | SDK cargados: "
+              f"{', '.join(medicion['sdk_cargados']) or 'ninguno'} | {lentos}")
+
+    resultado = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': version_codigo(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'parametros': vars(args),
+        'mediciones': mediciones,
+    }
+    salida = args.salida or os.path.join(
+        DIRECTORIO_RESULTADOS, f"arranque_{resultado['commit'] or 'local'}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w') as f:
+        json.dump(resultado, f, indent=2)
+    print(f"\nResultados guardados en {salida}")
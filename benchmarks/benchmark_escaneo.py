@@ -0,0 +1,167 @@
+# benchmark_escaneo.py
+#
+# Mide el escáner de app.py contra el cliente falso de Binance (sin conexión): descarga,
+# indicadores por símbolo (calcular_indicadores_ultima_vela), verificar_senal_de_compra y
+# run_technical_analysis completo, para
+# varios tamaños de universo e intervalos. Escribe los resultados en JSON para comparar versiones.
+#
+# Uso: python benchmarks/benchmark_escaneo.py [--simbolos 10,100,1000] [--intervalos 1d,4h]
+#          [--dias N] [--latencia 0.02] [--prob-429 0.0] [--fixtures] [--salida resultados.json]
+#
+# Necesita config.py como app.py, aunque no se conecta a Binance ni a Gemini.
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app
+import motor_descarga
+from almacen_resultados import RUTA_RESULTADOS, AlmacenResultados, establecer_almacen_resultados
+from cliente_binance import establecer_cliente
+from cliente_falso import LATENCIA, PROBABILIDAD_429, ClienteBinanceFalso, simbolos_en_fixtures
+from estado_indicadores import calcular_indicadores_ultima_vela
+from gestor_trabajos import GestorTrabajos, Trabajo
+from instantanea_mercado import InstantaneaMercado
+from multi_temporalidad import dias_necesarios
+
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados')
+
+
+def version_codigo():
+    """Commit actual (para saber qué versión se midió)."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def preparar_entorno(cliente, directorio):
+    """Cliente falso, almacenes vacíos en `directorio` e instantánea de mercado nueva."""
+    establecer_cliente(cliente)
+    app.almacen_global.directorio = os.path.join(directorio, 'datos_klines')
+    establecer_almacen_resultados(AlmacenResultados(os.path.join(directorio, RUTA_RESULTADOS)))
+    app.instantanea_global = InstantaneaMercado()
+    # El cliente falso simula los 429 por su cuenta; el limitador real solo añadiría esperas
+    motor_descarga.limitador_global = motor_descarga.LimitadorPeso(10**9)
+
+
+def ejecutar_escaneo(intervalo, dias):
+    """run_technical_analysis completo y síncrono sobre un gestor nuevo (sin cache de descargas)."""
+    gestor = GestorTrabajos(app.run_technical_analysis)
+    trabajo = Trabajo({'intervalo': intervalo, 'dias': dias, 'categoria': 'todos', 'modo_lote': True})
+    trabajo.actualizar(queued=False)
+    app.run_technical_analysis(trabajo, gestor)
+    return trabajo.estado()
+
+
+def medir(num_simbolos, intervalo, dias, latencia, probabilidad_429, simbolos=None):
+    cliente = ClienteBinanceFalso(num_simbolos, latencia, probabilidad_429, simbolos=simbolos)
+    cliente.preparar(intervalo)
+    num_simbolos = len(cliente.simbolos)
+    directorio = tempfile.mkdtemp(prefix='benchmark_escaneo_')
+    directorio_original = os.getcwd()
+    os.chdir(directorio)  # Las ventanas de descarga_historica se escriben aquí
+    try:
+        preparar_entorno(cliente, directorio)
+        simbolos = cliente.simbolos
+        dias_descarga = dias or dias_necesarios([intervalo])
+
+        # Descarga en frío (almacén vacío) con el motor concurrente, como hace el escaneo
+        segundos_descarga, datos = cronometrar(lambda: dict(motor_descarga.descargar_en_paralelo(
+            simbolos, app.obtener_datos_historicos_binance, intervalo, dias_descarga)))
+        datos = {s: df for s, df in datos.items() if not df.empty}
+        # Segunda descarga: solo la cola desde el almacén
+        segundos_almacen, _ = cronometrar(lambda: dict(motor_descarga.descargar_en_paralelo(
+            simbolos, app.obtener_datos_historicos_binance, intervalo, dias_descarga)))
+
+        segundos_indicadores, con_indicadores = cronometrar(
+            lambda: {s: calcular_indicadores_ultima_vela(df) for s, df in datos.items()})
+        segundos_senal, senales = cronometrar(
+            lambda: [app.verificar_senal_de_compra(df)[0] for df in con_indicadores.values()])
+
+        shutil.rmtree(app.almacen_global.directorio, ignore_errors=True)
+        app.instantanea_global = InstantaneaMercado()
+        peticiones_antes = cliente.peticiones
+        segundos_frio, estado = cronometrar(lambda: ejecutar_escaneo(intervalo, dias))
+        peticiones_escaneo = cliente.peticiones - peticiones_antes
+        segundos_caliente, _ = cronometrar(lambda: ejecutar_escaneo(intervalo, dias))
+    finally:
+        os.chdir(directorio_original)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    return {
+        'simbolos': num_simbolos,
+        'intervalo': intervalo,
+        'dias': dias_descarga,
+        'simbolos_con_datos': len(datos),
+        'velas_totales': int(sum(len(df) for df in datos.values())),
+        'senales': int(sum(senales)),
+        'candidatos_escaneo': len(estado['results']),
+        'error_escaneo': estado['error'],
+        'peticiones_escaneo': peticiones_escaneo,
+        'errores_429': cliente.errores_429,
+        'segundos': {
+            'descarga': segundos_descarga,
+            'descarga_almacen': segundos_almacen,
+            'calcular_indicadores': segundos_indicadores,
+            'verificar_senal_de_compra': segundos_senal,
+            'run_technical_analysis_frio': segundos_frio,
+            'run_technical_analysis_almacen': segundos_caliente,
+        },
+        'simbolos_por_segundo': num_simbolos / segundos_frio if segundos_frio else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del escáner con un cliente de Binance falso")
+    parser.add_argument('--simbolos', default='10,100,1000')
+    parser.add_argument('--intervalos', default='1d,4h')
+    parser.add_argument('--dias', type=int, default=None, help="Por defecto, los que necesitan los indicadores")
+    parser.add_argument('--latencia', type=float, default=LATENCIA)
+    parser.add_argument('--prob-429', type=float, default=PROBABILIDAD_429)
+    parser.add_argument('--salida', default=None)
+    parser.add_argument('--fixtures', action='store_true',
+                        help="Usa los símbolos grabados en benchmarks/fixtures en lugar de datos sintéticos")
+    args = parser.parse_args()
+
+    mediciones = []
+    for intervalo in args.intervalos.split(','):
+        grabados = simbolos_en_fixtures(intervalo) if args.fixtures else None
+        for num_simbolos in (int(n) for n in args.simbolos.split(',')):
+            simbolos = grabados[:num_simbolos] if grabados is not None else None
+            medicion = medir(num_simbolos, intervalo, args.dias, args.latencia, args.prob_429, simbolos)
+            mediciones.append(medicion)
+            tiempos = ' | '.join(f"{etapa}: {segundos:.3f}s" for etapa, segundos in medicion['segundos'].items())
+            print(f"{intervalo} × {num_simbolos} símbolos -> {tiempos}")
+
+    resultado = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': version_codigo(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'parametros': vars(args),
+        'mediciones': mediciones,
+    }
+    salida = args.salida or os.path.join(
+        DIRECTORIO_RESULTADOS, f"escaneo_{resultado['commit'] or 'local'}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w') as f:
+        json.dump(resultado, f, indent=2)
+    print(f"\nResultados guardados en {salida}")
@@ -0,0 +1,122 @@
+# benchmark_indicadores.py
+#
+# Compara el cálculo de indicadores original por símbolo (pandas: calcular_indicadores +
+# verificar_senal_de_compra, como el main.py de partida) con el camino que usa el escaneo por
+# lotes de la webapp (construir_panel + estrategias.calcular_indicadores + evaluar_panel) sobre
+# datos sintéticos. Solo importa los módulos de indicadores, así que no necesita config.py.
+#
+# Uso: python benchmarks/benchmark_indicadores.py [num_simbolos] [num_velas]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from estrategias import calcular_indicadores, columnas_necesarias, evaluar_panel, obtener_estrategias
+from panel_indicadores import construir_panel
+
+
+# --- CAMINO ORIGINAL POR SÍMBOLO (pandas) ---
+def calcular_sma(data, length):
+    return data.rolling(window=length).mean()
+
+
+def calcular_rsi(data, length=14):
+    delta = data.diff()
+    gain = (delta.where(delta > 0, 0)).fillna(0)
+    loss = (-delta.where(delta < 0, 0)).fillna(0)
+    avg_gain = gain.ewm(com=length - 1, adjust=False, min_periods=length).mean()
+    avg_loss = loss.ewm(com=length - 1, adjust=False, min_periods=length).mean()
+    if avg_loss.iloc[-1] == 0:
+        return 100.0
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+
+def calcular_indicadores_pandas(df):
+    df['SMA_50'] = calcular_sma(df['Close'], 50)
+    df['SMA_200'] = calcular_sma(df['Close'], 200)
+    df['RSI_14'] = calcular_rsi(df['Close'], 14)
+    df['VOLUME_SMA_20'] = calcular_sma(df['Volume'], 20)
+    df.dropna(inplace=True)
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+
+def verificar_senal_de_compra(df):
+    if df is None or len(df) < 1:
+        return False, None
+    ultima_vela = df.iloc[-1]
+    cond_tendencia_alcista = ultima_vela['SMA_50'] > ultima_vela['SMA_200']
+    cond_rsi = 45 < ultima_vela['RSI_14'] < 80
+    cond_volumen = ultima_vela['Volume'] > ultima_vela['VOLUME_SMA_20'] and ultima_vela['VOLUME_SMA_20'] > 0
+    if cond_tendencia_alcista and cond_rsi and cond_volumen:
+        vol_ratio = ultima_vela['Volume'] / ultima_vela['VOLUME_SMA_20']
+        return True, {"precio_cierre": ultima_vela['Close'], "rsi": ultima_vela['RSI_14'],
+                      "vol_ratio": vol_ratio, "score": ultima_vela['RSI_14'] * vol_ratio}
+    return False, None
+
+
+def generar_datos_sinteticos(num_simbolos, num_velas, semilla=42):
+    """Paseos aleatorios con longitudes distintas (algunos símbolos recién listados)."""
+    rng = np.random.default_rng(semilla)
+    datos = {}
+    for i in range(num_simbolos):
+        n = int(rng.integers(num_velas // 5, num_velas + 1))
+        close = 100 * np.exp(np.cumsum(rng.normal(0.001, 0.03, n)))
+        volume = rng.lognormal(10, 0.5, n)
+        datos[f"SIM{i}USDT"] = pd.DataFrame({'Close': close, 'Volume': volume})
+    return datos
+
+
+def camino_por_simbolo(datos):
+    resultados = []
+    for simbolo, df in datos.items():
+        hay_senal, detalles = verificar_senal_de_compra(calcular_indicadores_pandas(df.copy()))
+        if hay_senal:
+            detalles['simbolo'] = simbolo
+            resultados.append(detalles)
+    return resultados
+
+
+def camino_panel(datos):
+    # Lo mismo que el escaneo por lotes de app.py
+    estrategias = obtener_estrategias()
+    panel = construir_panel(datos, columnas_necesarias(estrategias))
+    calcular_indicadores(panel, estrategias)
+    return evaluar_panel(panel, estrategias)
+
+
+def cronometrar(funcion, datos, repeticiones=3):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(datos)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+if __name__ == "__main__":
+    num_simbolos = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    num_velas = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    datos = generar_datos_sinteticos(num_simbolos, num_velas)
+    tiempo_simbolo, res_simbolo = cronometrar(camino_por_simbolo, datos)
+    tiempo_panel, res_panel = cronometrar(camino_panel, datos)
+
+    # Ambos caminos deben encontrar las mismas señales con los mismos valores
+    por_simbolo = {r['simbolo']: r for r in res_simbolo}
+    por_panel = {r['simbolo']: r for r in res_panel}
+    assert por_simbolo.keys() == por_panel.keys(), "Los símbolos con señal no coinciden"
+    for simbolo, detalles in por_simbolo.items():
+        for clave in ('precio_cierre', 'rsi', 'vol_ratio', 'score'):
+            assert np.isclose(detalles[clave], por_panel[simbolo][clave], rtol=1e-9), (simbolo, clave)
+
+    print(f"Símbolos: {num_simbolos} | Velas máx.: {num_velas} | Señales: {len(res_panel)}")
+    print(f"Por símbolo (pandas): {tiempo_simbolo * 1000:.1f} ms")
+    print(f"Panel (estrategias):  {tiempo_panel * 1000:.1f} ms")
+    print(f"Aceleración: x{tiempo_simbolo / tiempo_panel:.1f}")
@@ -0,0 +1,170 @@
+# cliente_falso.py
+#
+# Sustituto local del cliente de Binance para los benchmarks: implementa get_exchange_info,
+# get_ticker y get_klines (una página de /api/v3/klines, la que pide cliente_binance.descargar_klines)
+# con velas sintéticas o grabadas, latencia configurable y errores 429 simulados.
+#
+# Grabar fixtures reales: python benchmarks/cliente_falso.py grabar 1d 350 BTCUSDT ETHUSDT
+
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+from binance.exceptions import BinanceAPIException
+from binance.helpers import interval_to_milliseconds
+
+DIRECTORIO_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+LATENCIA = 0.02              # Segundos por petición (cada página de 1000 velas es una petición)
+PROBABILIDAD_429 = 0.0       # Probabilidad de que una petición devuelva 429
+VELAS_POR_PAGINA = 1000
+MAX_VELAS_SINTETICAS = 200000
+
+
+class RespuestaFalsa:
+    """Lo mínimo de requests.Response que usa BinanceAPIException."""
+
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+        self.request = None
+
+
+class ClienteBinanceFalso:
+    """
+    Cliente de Binance en memoria. Las velas de cada símbolo salen de
+    `directorio_fixtures/{simbolo}_{intervalo}.json` si existe, o de un paseo aleatorio
+    determinista por (símbolo, intervalo). Cuenta las peticiones y los 429 devueltos.
+    """
+
+    def __init__(self, num_simbolos=100, latencia=LATENCIA, probabilidad_429=PROBABILIDAD_429,
+                 directorio_fixtures=DIRECTORIO_FIXTURES, semilla=42, simbolos=None):
+        # Con fixtures grabadas conviene pasar sus símbolos; si no, se inventan `num_simbolos`
+        self.simbolos = list(simbolos) if simbolos is not None else [f"SIM{i:04d}USDT" for i in range(num_simbolos)]
+        self.latencia = latencia
+        self.probabilidad_429 = probabilidad_429
+        self.directorio_fixtures = directorio_fixtures
+        self.semilla = semilla
+        self.ahora_ms = int(time.time() * 1000)
+        self.peticiones = 0
+        self.errores_429 = 0
+        self._series = {}
+        self._rng = np.random.default_rng(semilla)
+        self._lock = threading.Lock()
+
+    def _peticion(self):
+        """Simula la latencia de una petición y, a veces, un 429."""
+        with self._lock:
+            self.peticiones += 1
+            limite = self._rng.random() < self.probabilidad_429
+            if limite:
+                self.errores_429 += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+        if limite:
+            texto = json.dumps({'code': -1003, 'msg': 'Too many requests (simulado).'})
+            raise BinanceAPIException(RespuestaFalsa(429, texto), 429, texto)
+
+    def get_exchange_info(self):
+        self._peticion()
+        return {'symbols': [{
+            'symbol': simbolo,
+            'status': 'TRADING',
+            'baseAsset': simbolo[:-4],
+            'quoteAsset': 'USDT',
+            'isSpotTradingAllowed': True,
+            'permissions': ['SPOT'],
+        } for simbolo in self.simbolos]}
+
+    def get_ticker(self, **params):
+        self._peticion()
+        rng = np.random.default_rng(self.semilla)
+        volumenes = rng.lognormal(14, 2, len(self.simbolos))
+        cambios = rng.normal(0, 6, len(self.simbolos))
+        return [{
+            'symbol': simbolo,
+            'volume': f"{volumen / 10:.2f}",
+            'quoteVolume': f"{volumen:.2f}",
+            'count': int(volumen // 1000),
+            'priceChange': f"{cambio:.4f}",
+            'priceChangePercent': f"{cambio:.2f}",
+        } for simbolo, volumen, cambio in zip(self.simbolos, volumenes, cambios)]
+
+    def _serie(self, simbolo, intervalo):
+        """(velas como lista de listas con el formato de Binance, array de Open Time) de (símbolo, intervalo)."""
+        clave = (simbolo, intervalo)
+        with self._lock:
+            if clave in self._series:
+                return self._series[clave]
+
+        ruta = os.path.join(self.directorio_fixtures, f"{simbolo}_{intervalo}.json")
+        if os.path.exists(ruta):
+            with open(ruta) as f:
+                velas = json.load(f)
+        else:
+            velas = self._velas_sinteticas(simbolo, intervalo)
+        aperturas = np.array([v[0] for v in velas], dtype=np.int64)
+        with self._lock:
+            return self._series.setdefault(clave, (velas, aperturas))
+
+    def _velas_sinteticas(self, simbolo, intervalo):
+        duracion = interval_to_milliseconds(intervalo)
+        rng = np.random.default_rng([self.semilla, zlib.crc32(f"{simbolo}_{intervalo}".encode())])
+        n = min(MAX_VELAS_SINTETICAS, int(1100 * 24 * 60 * 60 * 1000 // duracion))
+        ultima_apertura = self.ahora_ms // duracion * duracion
+        apertura = ultima_apertura - duracion * np.arange(n - 1, -1, -1, dtype=np.int64)
+        # Tendencia propia de cada símbolo para que unos den señal y otros no
+        tendencia = rng.normal(0.0, 0.002)
+        close = 10 * np.exp(np.cumsum(rng.normal(tendencia, 0.02, n)))
+        open_ = np.concatenate(([close[0]], close[:-1]))
+        high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.01, n)))
+        low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.01, n)))
+        volume = rng.lognormal(10, 0.6, n)
+        return [[int(t), f"{o:.8f}", f"{h:.8f}", f"{l:.8f}", f"{c:.8f}", f"{v:.8f}", int(t + duracion - 1),
+                 f"{v * c:.8f}", 100, f"{v / 2:.8f}", f"{v * c / 2:.8f}", "0"]
+                for t, o, h, l, c, v in zip(apertura, open_, high, low, close, volume)]
+
+    def preparar(self, intervalo):
+        """Genera o carga las velas de todos los símbolos (para no cronometrar el generador)."""
+        for simbolo in self.simbolos:
+            self._serie(simbolo, intervalo)
+
+    def get_klines(self, symbol, interval, startTime=None, endTime=None, limit=500, **kwargs):
+        """Una página de /api/v3/klines: una petición, como mucho `limit` velas (máx. 1000)."""
+        self._peticion()
+        limit = min(limit, VELAS_POR_PAGINA)
+        velas, aperturas = self._serie(symbol, interval)
+        desde = 0 if startTime is None else int(np.searchsorted(aperturas, startTime, side='left'))
+        hasta = len(velas) if endTime is None else int(np.searchsorted(aperturas, endTime, side='right'))
+        if startTime is None:
+            desde = max(desde, hasta - limit)  # Sin inicio, Binance devuelve las más recientes
+        return velas[desde:min(hasta, desde + limit)]
+
+
+def simbolos_en_fixtures(intervalo, directorio=DIRECTORIO_FIXTURES):
+    """Símbolos con velas grabadas para `intervalo`."""
+    if not os.path.isdir(directorio):
+        return []
+    sufijo = f"_{intervalo}.json"
+    return sorted(nombre[:-len(sufijo)] for nombre in os.listdir(directorio) if nombre.endswith(sufijo))
+
+
+def grabar_fixtures(cliente, simbolos, intervalo, dias, directorio=DIRECTORIO_FIXTURES):
+    """Guarda las velas reales de `simbolos` para reproducirlas después sin conexión."""
+    os.makedirs(directorio, exist_ok=True)
+    for simbolo in simbolos:
+        velas = cliente.get_historical_klines(simbolo, intervalo, f"{dias} days ago UTC")
+        with open(os.path.join(directorio, f"{simbolo}_{intervalo}.json"), 'w') as f:
+            json.dump(velas, f)
+        print(f"{simbolo} {intervalo}: {len(velas)} velas grabadas")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 5 or sys.argv[1] != 'grabar':
+        print("Uso: python benchmarks/cliente_falso.py grabar <intervalo> <dias> <SIMBOLO> [SIMBOLO...]")
+        sys.exit(1)
+    from binance.client import Client
+    grabar_fixtures(Client(ping=False), sys.argv[4:], sys.argv[2], int(sys.argv[3]))
@@ -0,0 +1,94 @@
+# cache_analisis.py
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# --- CONFIGURACIÓN DE LA CACHE DE ANÁLISIS ---
+RUTA_CACHE = 'cache_gemini.db'
+TTL_SEGUNDOS = 24 * 60 * 60   # Los fundamentales apenas cambian en un día
+MAX_ENTRADAS = 2000           # Tope LRU: se descartan las menos usadas recientemente
+
+
+def version_prompt(construir_prompt):
+    """Huella corta de la plantilla del prompt: si el prompt cambia, la cache anterior deja de valer."""
+    return hashlib.sha1(construir_prompt('').encode('utf-8')).hexdigest()[:12]
+
+
+class CacheAnalisis:
+    """
+    Cache persistente (SQLite) de análisis de Gemini por (símbolo, versión del prompt, modelo),
+    con caducidad TTL y tope de tamaño LRU. La comparten la webapp y gemini-analysis.py.
+    """
+
+    def __init__(self, ruta=RUTA_CACHE, ttl=TTL_SEGUNDOS, max_entradas=MAX_ENTRADAS):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, timeout=30)
+        with self._lock, self._conexion:
+            self._conexion.execute("""
+                CREATE TABLE IF NOT EXISTS analisis (
+                    symbol TEXT NOT NULL,
+                    version_prompt TEXT NOT NULL,
+                    modelo TEXT NOT NULL,
+                    resultado TEXT NOT NULL,
+                    creado REAL NOT NULL,
+                    ultimo_acceso REAL NOT NULL,
+                    PRIMARY KEY (symbol, version_prompt, modelo)
+                )
+            """)
+            self._conexion.execute("CREATE INDEX IF NOT EXISTS idx_analisis_acceso ON analisis (ultimo_acceso)")
+
+    def obtener(self, symbol, version, modelo, contar_fallo=True):
+        """
+        Devuelve el análisis guardado si existe y no ha caducado; si no, None. Con
+        contar_fallo=False un fallo no suma en `misses` (consultas previas a otra clave).
+        """
+        ahora = time.time()
+        with self._lock, self._conexion:
+            fila = self._conexion.execute(
+                "SELECT resultado, creado FROM analisis WHERE symbol = ? AND version_prompt = ? AND modelo = ?",
+                (symbol, version, modelo)).fetchone()
+            if fila is None or ahora - fila[1] > self.ttl:
+                if contar_fallo:
+                    self.misses += 1
+                return None
+            self._conexion.execute(
+                "UPDATE analisis SET ultimo_acceso = ? WHERE symbol = ? AND version_prompt = ? AND modelo = ?",
+                (ahora, symbol, version, modelo))
+            self.hits += 1
+        return json.loads(fila[0])
+
+    def guardar(self, symbol, version, modelo, resultado):
+        """Guarda un análisis correcto y aplica el tope LRU."""
+        ahora = time.time()
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO analisis VALUES (?, ?, ?, ?, ?, ?)",
+                (symbol, version, modelo, json.dumps(resultado), ahora, ahora))
+            self._conexion.execute(
+                "DELETE FROM analisis WHERE creado < ?", (ahora - self.ttl,))
+            self._conexion.execute("""
+                DELETE FROM analisis WHERE rowid NOT IN (
+                    SELECT rowid FROM analisis ORDER BY ultimo_acceso DESC LIMIT ?
+                )
+            """, (self.max_entradas,))
+
+    def estadisticas(self):
+        with self._lock:
+            entradas = self._conexion.execute("SELECT COUNT(*) FROM analisis").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': entradas,
+                'ttl_seconds': self.ttl,
+                'max_entries': self.max_entradas
+            }
@@ -0,0 +1,138 @@
+# cliente_binance.py
+
+import threading
+import time
+
+import numpy as np
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import motor_descarga
+from metricas import registrar_espera, registrar_respuesta
+from parser_klines import DTYPE_KLINES, intervalo_a_ms, klines_a_array, klines_json_a_array, marca_a_ms
+
+# --- CONFIGURACIÓN DEL POOL DE CONEXIONES ---
+TAMANO_POOL = 16          # Conexiones HTTP reutilizables (>= descargas simultáneas)
+REINTENTOS = 3            # Reintentos ante errores transitorios y 429
+FACTOR_BACKOFF = 0.5      # Espera entre reintentos: 0.5s, 1s, 2s...
+ESTADOS_REINTENTABLES = (429, 500, 502, 503, 504)
+VELAS_POR_PAGINA = 1000   # Máximo de /api/v3/klines por petición
+TIMEOUT_KLINES = 10       # Segundos por página
+
+_configuracion = {'api_key': None, 'api_secret': None, 'version': 0}
+_adaptador = None
+_cliente_sustituto = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def configurar_cliente(api_key, api_secret, tamano_pool=TAMANO_POOL, reintentos=REINTENTOS,
+                       factor_backoff=FACTOR_BACKOFF):
+    """
+    Define las credenciales y el pool de conexiones que usarán todos los clientes del proceso.
+    Se llama una vez al arrancar (app.py / main.py).
+    """
+    global _adaptador
+    reintento = Retry(
+        total=reintentos,
+        backoff_factor=factor_backoff,
+        status_forcelist=ESTADOS_REINTENTABLES,
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # python-binance se encarga de convertir el último error en excepción
+    )
+    with _lock:
+        _configuracion['api_key'] = api_key
+        _configuracion['api_secret'] = api_secret
+        _adaptador = HTTPAdapter(pool_connections=tamano_pool, pool_maxsize=tamano_pool, max_retries=reintento)
+        # Los clientes creados con la configuración anterior se recrean en su próximo uso
+        _configuracion['version'] += 1
+
+
+def establecer_cliente(cliente):
+    """
+    Sustituye el cliente de todos los hilos por `cliente` (p. ej. el cliente falso de los
+    benchmarks). Con None se vuelve a usar el cliente real.
+    """
+    global _cliente_sustituto
+    _cliente_sustituto = cliente
+
+
+def obtener_cliente():
+    """
+    Devuelve el cliente de Binance del hilo actual.
+
+    Cada hilo tiene su propio objeto Client (python-binance guarda estado por petición),
+    pero todos comparten el mismo adaptador HTTP, es decir, el mismo pool de conexiones
+    y la misma política de reintentos. No se hace ping al crearlo.
+    """
+    if _cliente_sustituto is not None:
+        return _cliente_sustituto
+
+    cliente = getattr(_local, 'cliente', None)
+    if cliente is not None and _local.version == _configuracion['version']:
+        return cliente
+
+    if _adaptador is None:
+        configurar_cliente(_configuracion['api_key'], _configuracion['api_secret'])
+
+    from binance.client import Client  # python-binance tarda en importarse: solo al crear el primer cliente
+    cliente = Client(_configuracion['api_key'], _configuracion['api_secret'], ping=False)
+    cliente.session.mount('https://', _adaptador)
+    cliente.session.mount('http://', _adaptador)
+    # Bytes recibidos y reintentos para las métricas del escaneo
+    cliente.session.hooks['response'].append(registrar_respuesta)
+    _local.cliente = cliente
+    _local.version = _configuracion['version']
+    return cliente
+
+
+def descargar_klines(simbolo, intervalo, inicio, fin=None, cliente=None, limitador=None):
+    """
+    Velas de `simbolo` desde `inicio` hasta `fin` (timestamps en ms o fechas como en
+    python-binance) como array estructurado. Cada página reserva su peso en `limitador`
+    (por defecto motor_descarga.limitador_global) justo antes de pedirse: es el único sitio
+    donde se cobra el peso de /api/v3/klines.
+
+    Con el cliente real se piden las páginas de /api/v3/klines directamente y cada respuesta se
+    parsea en cuanto llega, así nunca existe la lista de listas de toda la historia. Los clientes
+    sustitutos (benchmarks) siguen la misma paginación pidiendo cada página con get_klines.
+    """
+    from binance.client import Client
+    from binance.exceptions import BinanceAPIException
+
+    cliente = cliente or obtener_cliente()
+    limitador = limitador if limitador is not None else motor_descarga.limitador_global
+    if isinstance(cliente, Client):
+        url = f"{cliente.API_URL}/{cliente.PUBLIC_API_VERSION}/klines"
+
+        def pedir_pagina(parametros):
+            respuesta = cliente.session.get(url, params=parametros, timeout=TIMEOUT_KLINES)
+            if not 200 <= respuesta.status_code < 300:
+                raise BinanceAPIException(respuesta, respuesta.status_code, respuesta.text)
+            return klines_json_a_array(respuesta.content)
+    else:
+        def pedir_pagina(parametros):
+            return klines_a_array(cliente.get_klines(**parametros))
+
+    parametros = {'symbol': simbolo, 'interval': intervalo, 'startTime': marca_a_ms(inicio)}
+    if fin is not None:
+        parametros['endTime'] = marca_a_ms(fin)
+    hasta = parametros.get('endTime', int(time.time() * 1000))
+    intervalo_ms = intervalo_a_ms(intervalo)
+
+    paginas = []
+    while True:
+        # `limit` con las velas que faltan hasta `hasta`: la última página no pide de más
+        restantes = (hasta - parametros['startTime']) // intervalo_ms + 1 if intervalo_ms else VELAS_POR_PAGINA
+        parametros['limit'] = max(1, min(VELAS_POR_PAGINA, restantes))
+        registrar_espera(limitador.adquirir(motor_descarga.PESO_KLINES))
+        pagina = pedir_pagina(parametros)
+        if len(pagina):
+            paginas.append(pagina)
+        if len(pagina) < parametros['limit']:
+            break
+        parametros['startTime'] = int(pagina['Close Time'][-1]) + 1
+        if parametros['startTime'] > hasta:
+            break
+    return np.concatenate(paginas) if paginas else np.empty(0, dtype=DTYPE_KLINES)
@@ -0,0 +1,159 @@
+# descarga_historica.py
+#
+# Descarga de historias largas (meses de velas de 1m, días de velas de 1s) en ventanas de
+# 1000 velas: las ventanas se piden en paralelo (cada página reserva su peso en el limitador),
+# cada una se guarda en disco en cuanto llega y una descarga interrumpida continúa por las que
+# faltan. El almacén copia las ventanas a su fichero una a una y solo entonces se borran.
+
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+from almacen_klines import TramosDescargados
+from cliente_binance import descargar_klines
+from metricas import activar_medicion, medicion_actual
+from motor_descarga import MAX_PAGINAS_DESCARGA_DIRECTA, VELAS_POR_PETICION
+from parser_klines import intervalo_a_ms, marca_a_ms
+
+# --- CONFIGURACIÓN DE LA DESCARGA POR VENTANAS ---
+DIRECTORIO_VENTANAS = os.path.join('datos_klines', '_ventanas')
+MAX_VENTANAS_SIMULTANEAS = 8  # Ventanas en vuelo a la vez (entre todos los símbolos)
+
+# Límites de días para los intervalos pequeños (el resto admite los 1000 días generales)
+MAX_DIAS_POR_INTERVALO = {
+    '1s': 30,
+    '1m': 365,
+}
+# Los escaneos de varios símbolos tienen en memoria las velas de todo el universo a la vez
+# (el panel del modo por lotes), así que mantienen los límites de antes de las ventanas
+MAX_DIAS_ESCANEO = {
+    '1s': 7,
+    '1m': 7,
+    '3m': 30,
+    '5m': 30,
+}
+
+_ejecutor = None
+_lock = threading.Lock()
+
+
+def _ejecutor_ventanas():
+    """Pool propio para las ventanas: las descargas por símbolo ya ocupan el del motor."""
+    global _ejecutor
+    with _lock:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(max_workers=MAX_VENTANAS_SIMULTANEAS, thread_name_prefix='ventana')
+        return _ejecutor
+
+
+def indices_ventanas(inicio_ms, fin_ms, intervalo_ms, velas=VELAS_POR_PETICION):
+    """
+    Índices de las ventanas de `velas` velas que cubren [inicio_ms, fin_ms]. Están alineadas a
+    la época, así que dos descargas que empiezan en instantes distintos comparten ventanas.
+    """
+    ancho = velas * intervalo_ms
+    return range(inicio_ms // ancho, fin_ms // ancho + 1)
+
+
+class DescargaHistorica:
+    """
+    Descarga las velas de un (símbolo, intervalo) de duración fija por ventanas.
+
+    Cada ventana cerrada se escribe como `{directorio}/{intervalo}/{simbolo}/{indice}.npy` (de
+    forma atómica); su existencia es el punto de control. La ventana que contiene el instante
+    actual no se guarda porque todavía no está completa. Las ventanas se borran al confirmar
+    los tramos, cuando el almacén ya las ha guardado.
+    """
+
+    def __init__(self, simbolo, intervalo, directorio=DIRECTORIO_VENTANAS):
+        self.simbolo = simbolo
+        self.intervalo = intervalo
+        self.intervalo_ms = intervalo_a_ms(intervalo)
+        if not self.intervalo_ms:
+            raise ValueError(f"El intervalo {intervalo} no tiene duración fija")
+        self.ancho = VELAS_POR_PETICION * self.intervalo_ms
+        self.directorio = os.path.join(directorio, intervalo, simbolo)
+
+    def _ruta(self, indice):
+        return os.path.join(self.directorio, f"{indice}.npy")
+
+    def _descargar_ventana(self, indice, ahora_ms, medicion):
+        """Devuelve la ruta de la ventana en disco o, si aún está abierta, sus velas."""
+        ruta = self._ruta(indice)
+        if os.path.exists(ruta):
+            return ruta  # Descargada en una ejecución anterior
+
+        with activar_medicion(medicion):
+            desde = indice * self.ancho
+            hasta = desde + self.ancho - 1
+            datos = descargar_klines(self.simbolo, self.intervalo, desde, hasta)
+
+        if hasta >= ahora_ms:
+            return datos
+        temporal = ruta + '.tmp.npy'
+        np.save(temporal, datos)
+        os.replace(temporal, ruta)
+        return ruta
+
+    def borrar_ventanas(self):
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def descargar(self, inicio, fin=None):
+        """
+        Velas desde `inicio` hasta `fin` (ms o fechas como en python-binance) como
+        TramosDescargados: un tramo por ventana, leído con mmap solo al recorrerlos. Si falla
+        alguna ventana se lanza el error y las ya guardadas se reutilizan en el siguiente intento.
+        """
+        ahora_ms = int(time.time() * 1000)
+        inicio_ms = marca_a_ms(inicio)
+        fin_ms = marca_a_ms(fin) if fin is not None else ahora_ms
+        os.makedirs(self.directorio, exist_ok=True)
+
+        medicion = medicion_actual()
+        ejecutor = _ejecutor_ventanas()
+        futuros = [ejecutor.submit(self._descargar_ventana, indice, ahora_ms, medicion)
+                   for indice in indices_ventanas(inicio_ms, fin_ms, self.intervalo_ms)]
+        wait(futuros)  # Si una ventana falla, las demás terminan y quedan guardadas antes de salir
+        partes = [futuro.result() for futuro in futuros]
+
+        def tramos():
+            # Una ventana en memoria a la vez: las de disco se abren con mmap al llegar a ellas
+            for parte in partes:
+                datos = np.load(parte, mmap_mode='r') if isinstance(parte, str) else parte
+                desde, hasta = np.searchsorted(datos['Open Time'], [inicio_ms, fin_ms + 1])
+                if hasta > desde:
+                    yield datos[desde:hasta]
+
+        return TramosDescargados(tramos, al_confirmar=self.borrar_ventanas)
+
+
+def descargar_historia(simbolo, intervalo, inicio, fin=None):
+    """
+    Punto de entrada para el almacén: los rangos de hasta MAX_PAGINAS_DESCARGA_DIRECTA páginas se
+    piden con descargar_klines (array) y los más largos por ventanas con DescargaHistorica
+    (TramosDescargados, que el almacén guarda sin juntarlos en memoria).
+    """
+    intervalo_ms = intervalo_a_ms(intervalo)
+    if intervalo_ms:
+        inicio_ms = marca_a_ms(inicio)
+        fin_ms = marca_a_ms(fin) if fin is not None else int(time.time() * 1000)
+        if len(indices_ventanas(inicio_ms, fin_ms, intervalo_ms)) > MAX_PAGINAS_DESCARGA_DIRECTA:
+            return DescargaHistorica(simbolo, intervalo).descargar(inicio_ms, fin_ms)
+    return descargar_klines(simbolo, intervalo, inicio, fin)
+
+
+def validar_dias_intervalo(intervalo, dias, escaneo=False):
+    """
+    Devuelve el mensaje de error si `dias` supera el máximo del intervalo, o None. Con
+    `escaneo=True` se aplican los límites de los escaneos de varios símbolos.
+    """
+    maximo = (MAX_DIAS_ESCANEO if escaneo else MAX_DIAS_POR_INTERVALO).get(intervalo)
+    if maximo is not None and dias is not None and dias > maximo:
+        if escaneo:
+            return f"Para escanear varios símbolos con el intervalo {intervalo}, el máximo es {maximo} días."
+        return f"Para el intervalo {intervalo}, el máximo es {maximo} días."
+    return None
@@ -0,0 +1,246 @@
+# escaner_tiempo_real.py
+
+import json
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+from estado_indicadores import EstadoIndicadores
+from motor_descarga import descargar_en_paralelo
+from panel_indicadores import SMA_LENTA
+from parser_klines import intervalo_a_ms
+
+# Binance admite hasta 1024 streams por conexión; repartimos en grupos más pequeños
+STREAMS_POR_CONEXION = 200
+MAX_SENALES_GUARDADAS = 500
+
+
+class FuenteBinanceWebsocket:
+    """Fuente en vivo: streams combinados de klines mediante ThreadedWebsocketManager."""
+
+    def __init__(self, api_key=None, api_secret=None):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self._manager = None
+
+    def iniciar(self, simbolos, intervalo, callback):
+        from binance import ThreadedWebsocketManager  # Solo se importa si se activa el tiempo real
+        self._manager = ThreadedWebsocketManager(api_key=self.api_key, api_secret=self.api_secret)
+        self._manager.start()
+        streams = [f"{s.lower()}@kline_{intervalo}" for s in simbolos]
+        for i in range(0, len(streams), STREAMS_POR_CONEXION):
+            self._manager.start_multiplex_socket(callback=callback, streams=streams[i:i + STREAMS_POR_CONEXION])
+
+    def detener(self):
+        if self._manager is not None:
+            self._manager.stop()
+            self._manager = None
+
+
+class FuenteReproduccion:
+    """
+    Fuente local para pruebas: reproduce mensajes de kline grabados.
+
+    `mensajes` puede ser una lista de dicts o la ruta de un fichero JSON Lines con un mensaje por
+    línea (con o sin el envoltorio {'stream', 'data'} de los streams combinados).
+    `pausa` añade una espera entre mensajes para simular el ritmo real.
+    """
+
+    def __init__(self, mensajes, pausa=0.0):
+        self.mensajes = mensajes
+        self.pausa = pausa
+        self._detenido = threading.Event()
+        self._hilo = None
+
+    def _leer_mensajes(self):
+        if isinstance(self.mensajes, str):
+            with open(self.mensajes) as f:
+                for linea in f:
+                    if linea.strip():
+                        yield json.loads(linea)
+        else:
+            yield from self.mensajes
+
+    def _reproducir(self, callback):
+        for mensaje in self._leer_mensajes():
+            if self._detenido.is_set():
+                break
+            callback(mensaje)
+            if self.pausa:
+                time.sleep(self.pausa)
+
+    def iniciar(self, simbolos, intervalo, callback, en_segundo_plano=False):
+        if not en_segundo_plano:
+            self._reproducir(callback)
+            return
+        self._hilo = threading.Thread(target=self._reproducir, args=(callback,), daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detenido.set()
+
+
+class EscanerTiempoReal:
+    """
+    Escáner continuo: calienta el estado de cada símbolo con la historia REST y después lo
+    actualiza con cada vela cerrada que llega por websocket (o por una fuente reproducida),
+    evaluando la señal de compra en ese momento. Si entre la última vela procesada y la que llega
+    falta alguna (el stream empezó después del calentamiento, una reconexión...), el estado del
+    símbolo se vuelve a crear desde REST en segundo plano en lugar de continuar sobre el hueco.
+
+    `funcion_descarga` es obtener_datos_historicos_binance del script que lo usa y
+    `funciones_senal` un dict {estrategia: función} con funciones como verificar_senal_de_compra;
+    todas se evalúan con cada vela cerrada. `al_detectar_senal(detalles)` se llama con cada nueva
+    señal (con la estrategia en detalles['estrategia']).
+    """
+
+    def __init__(self, simbolos, intervalo, dias, funcion_descarga, funciones_senal,
+                 fuente=None, al_detectar_senal=None):
+        self.simbolos = list(simbolos)
+        self.intervalo = intervalo
+        self.dias = dias
+        self.funcion_descarga = funcion_descarga
+        self.funciones_senal = dict(funciones_senal)
+        self.fuente = fuente if fuente is not None else FuenteBinanceWebsocket()
+        self.al_detectar_senal = al_detectar_senal
+
+        self.estados = {}
+        self.senales = deque(maxlen=MAX_SENALES_GUARDADAS)
+        self.secuencia = 0
+        self.activo = False
+        self._lock = threading.Lock()
+        self._intervalo_ms = intervalo_a_ms(intervalo)
+        self._resembrando = set()     # Símbolos con hueco cuyo estado se está rehaciendo
+        self._por_resembrar = []
+        self._hilo_resembrado = None
+
+    def _estado_desde_historia(self, df, ahora_ms):
+        """Estado de un símbolo con sus velas cerradas, o None si no hay historia suficiente."""
+        if df is None or df.empty:
+            return None
+        if 'Close Time' in df and df['Close Time'].iloc[-1] > ahora_ms:
+            df = df.iloc[:-1]  # La última vela aún no ha cerrado
+        if len(df) < SMA_LENTA:
+            return None
+        ultimo_open_time = int(pd.Timestamp(df['Open Time'].iloc[-1]).value // 10**6)
+        return EstadoIndicadores.desde_historia(df['Close'].to_numpy(dtype=float),
+                                                df['Volume'].to_numpy(dtype=float),
+                                                ultimo_open_time)
+
+    def calentar(self):
+        """Carga la historia de todos los símbolos y prepara su estado (solo velas cerradas)."""
+        ahora_ms = int(time.time() * 1000)
+        for simbolo, df in descargar_en_paralelo(self.simbolos, self.funcion_descarga, self.intervalo, self.dias):
+            estado = self._estado_desde_historia(df, ahora_ms)
+            if estado is not None:
+                self.estados[simbolo] = estado
+
+    def _siguiente_open_time(self, open_time):
+        """'Open Time' de la vela que sigue a `open_time` (1M no tiene duración fija)."""
+        if self._intervalo_ms:
+            return open_time + self._intervalo_ms
+        return int((pd.Timestamp(open_time, unit='ms') + pd.DateOffset(months=1)).value // 10**6)
+
+    def _programar_resembrado(self, simbolo):
+        """Marca `simbolo` para rehacer su estado desde REST (se llama con el lock tomado)."""
+        self._resembrando.add(simbolo)
+        self._por_resembrar.append(simbolo)
+        if self._hilo_resembrado is None:
+            self._hilo_resembrado = threading.Thread(target=self._resembrar, daemon=True)
+            self._hilo_resembrado.start()
+
+    def _resembrar(self):
+        """Rehace desde REST el estado de los símbolos con huecos, agrupando los que llegan juntos."""
+        while True:
+            with self._lock:
+                simbolos = self._por_resembrar
+                self._por_resembrar = []
+                if not simbolos or not self.activo:
+                    self._resembrando.clear()
+                    self._hilo_resembrado = None
+                    return
+            ahora_ms = int(time.time() * 1000)
+            for simbolo, df in descargar_en_paralelo(simbolos, self.funcion_descarga, self.intervalo, self.dias):
+                estado = self._estado_desde_historia(df, ahora_ms)
+                with self._lock:
+                    if estado is not None:
+                        self.estados[simbolo] = estado
+            with self._lock:
+                self._resembrando.difference_update(simbolos)
+
+    def procesar_mensaje(self, mensaje):
+        """Procesa un mensaje de kline; solo las velas cerradas actualizan el estado."""
+        datos = mensaje.get('data', mensaje)
+        if datos.get('e') != 'kline':
+            if datos.get('e') == 'error':
+                print(f"Error en el stream de tiempo real: {datos.get('m')}")
+            return
+        vela = datos['k']
+        if not vela.get('x'):
+            return
+
+        simbolo = datos['s']
+        open_time = int(vela['t'])
+        with self._lock:
+            estado = self.estados.get(simbolo)
+            if estado is None or simbolo in self._resembrando:
+                return
+            if (estado.ultimo_open_time is not None
+                    and open_time > self._siguiente_open_time(estado.ultimo_open_time)):
+                # Faltan velas: el estado incremental no puede continuar sobre el hueco
+                self._programar_resembrado(simbolo)
+                return
+            if not estado.actualizar(open_time, float(vela['c']), float(vela['v'])):
+                return
+            fila = estado.ultima_vela()
+        if fila is None:
+            return
+
+        df = pd.DataFrame([fila])
+        for estrategia, funcion_senal in self.funciones_senal.items():
+            hay_senal, detalles = funcion_senal(df)
+            if hay_senal:
+                detalles['estrategia'] = estrategia
+                self._publicar(simbolo, open_time, detalles)
+
+    def _publicar(self, simbolo, open_time, detalles):
+        with self._lock:
+            self.secuencia += 1
+            detalles['simbolo'] = simbolo
+            detalles['open_time'] = open_time
+            detalles['id'] = self.secuencia
+            self.senales.append(detalles)
+        if self.al_detectar_senal is not None:
+            self.al_detectar_senal(detalles)
+
+    def senales_desde(self, ultimo_id=0):
+        """Señales publicadas con id mayor que `ultimo_id`."""
+        with self._lock:
+            return [s for s in self.senales if s['id'] > ultimo_id]
+
+    def iniciar(self):
+        """Calienta y arranca la fuente en este hilo."""
+        self.activo = True
+        self._ejecutar()
+
+    def iniciar_en_segundo_plano(self):
+        """
+        Como iniciar, pero en un hilo propio. `activo` se marca antes de crear el hilo para que un
+        detener() que llegue antes de que arranque no se pierda.
+        """
+        self.activo = True
+        hilo = threading.Thread(target=self._ejecutar, daemon=True)
+        hilo.start()
+        return hilo
+
+    def _ejecutar(self):
+        self.calentar()
+        if not self.activo:  # Detenido durante el calentamiento
+            return
+        self.fuente.iniciar(list(self.estados), self.intervalo, self.procesar_mensaje)
+
+    def detener(self):
+        self.activo = False
+        self.fuente.detener()
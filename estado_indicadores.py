@@ -0,0 +1,255 @@
+# estado_indicadores.py
+
+import threading
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from panel_indicadores import RSI_PERIODO, SMA_LENTA, SMA_RAPIDA, VOLUMEN_SMA
+
+# Estado de Wilder del RSI por (símbolo, intervalo), guardado en la última vela CERRADA
+# para poder sembrar el cálculo en el siguiente escaneo.
+estados_rsi = {}
+_lock_estados = threading.Lock()
+
+
+def medias_wilder(close, length=RSI_PERIODO):
+    """Medias de Wilder (ganancia, pérdida) en la última vela de `close`, recorriendo toda la serie."""
+    delta = pd.Series(close).diff()
+    gain = (delta.where(delta > 0, 0)).fillna(0)
+    loss = (-delta.where(delta < 0, 0)).fillna(0)
+    avg_gain = gain.ewm(com=length - 1, adjust=False).mean().iloc[-1]
+    avg_loss = loss.ewm(com=length - 1, adjust=False).mean().iloc[-1]
+    return avg_gain, avg_loss
+
+
+def paso_wilder(avg_gain, avg_loss, close_anterior, close_actual, length=RSI_PERIODO):
+    """Avanza las medias de Wilder una vela."""
+    delta = close_actual - close_anterior
+    alpha = 1.0 / length
+    avg_gain = (1 - alpha) * avg_gain + alpha * (delta if delta > 0 else 0.0)
+    avg_loss = (1 - alpha) * avg_loss + alpha * (-delta if delta < 0 else 0.0)
+    return avg_gain, avg_loss
+
+
+def _rsi_ultima_vela(close, open_time, clave, length):
+    """
+    RSI de la última vela. Si hay un estado guardado para `clave` se parte de él y solo se
+    procesan las velas nuevas; si no, se recorre la serie una vez y se guarda el estado.
+    """
+    penultima = len(close) - 2
+    estado = estados_rsi.get(clave) if clave is not None else None
+
+    desde = None
+    if estado is not None:
+        pos = int(np.searchsorted(open_time, estado['open_time']))
+        if pos <= penultima and open_time[pos] == estado['open_time'] and close[pos] == estado['close']:
+            desde = pos
+
+    if desde is None:
+        # En frío se recorre la serie hasta la penúltima vela (la última puede no estar cerrada)
+        avg_gain, avg_loss = medias_wilder(close[:-1], length)
+    else:
+        avg_gain, avg_loss = estado['avg_gain'], estado['avg_loss']
+        for i in range(desde + 1, penultima + 1):
+            avg_gain, avg_loss = paso_wilder(avg_gain, avg_loss, close[i - 1], close[i], length)
+
+    if clave is not None:
+        with _lock_estados:
+            estados_rsi[clave] = {
+                'open_time': open_time[penultima],
+                'close': close[penultima],
+                'avg_gain': avg_gain,
+                'avg_loss': avg_loss,
+            }
+
+    # La última vela puede no estar cerrada: se evalúa sin guardarla en el estado
+    avg_gain, avg_loss = paso_wilder(avg_gain, avg_loss, close[-2], close[-1], length)
+    if avg_loss == 0:
+        return 100.0
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+
+def calcular_indicadores_ultima_vela(df, clave=None):
+    """
+    Calcula SMA_50, SMA_200, RSI_14 y VOLUME_SMA_20 solo para la última vela.
+
+    Devuelve un DataFrame de una fila con las mismas columnas que usa verificar_senal_de_compra,
+    o un DataFrame vacío si no hay historia suficiente. `clave` (p. ej. (simbolo, intervalo))
+    permite reutilizar el estado del RSI entre escaneos.
+    """
+    if df is None or len(df) < SMA_LENTA:
+        return pd.DataFrame()
+
+    close = df['Close'].to_numpy(dtype=float)
+    volume = df['Volume'].to_numpy(dtype=float)
+    if np.isnan(close[-SMA_LENTA:]).any() or np.isnan(volume[-VOLUMEN_SMA:]).any():
+        # Velas incompletas dentro de la ventana: no se puede evaluar la última vela
+        return pd.DataFrame()
+
+    if 'Open Time' in df:
+        open_time = df['Open Time'].to_numpy()
+    else:
+        # Sin 'Open Time' no se puede reconocer la misma vela entre llamadas
+        open_time = np.arange(len(df))
+        clave = None
+    ultima_vela = {
+        'Open Time': open_time[-1],
+        'Close': close[-1],
+        'Volume': volume[-1],
+        'SMA_50': close[-SMA_RAPIDA:].mean(),
+        'SMA_200': close[-SMA_LENTA:].mean(),
+        'RSI_14': _rsi_ultima_vela(close, open_time, clave, RSI_PERIODO),
+        'VOLUME_SMA_20': volume[-VOLUMEN_SMA:].mean(),
+    }
+    return pd.DataFrame([ultima_vela])
+
+
+# --- INDICADORES INCREMENTALES ---
+# Cada actualización con una vela nueva cuesta O(1). Se usan __slots__ y buffers array('d')
+# para que miles de estados (símbolo × intervalo) quepan en memoria.
+
+class SMAIncremental:
+    """SMA sobre un buffer circular con suma acumulada."""
+
+    __slots__ = ('length', 'buffer', 'posicion', 'cuenta', 'suma', '_desde_recalculo')
+
+    def __init__(self, length):
+        self.length = length
+        self.buffer = array('d', bytes(8 * length))
+        self.posicion = 0
+        self.cuenta = 0
+        self.suma = 0.0
+        self._desde_recalculo = 0
+
+    def actualizar(self, valor):
+        saliente = self.buffer[self.posicion]
+        self.buffer[self.posicion] = valor
+        self.posicion = (self.posicion + 1) % self.length
+        if self.cuenta < self.length:
+            self.cuenta += 1
+            self.suma += valor
+        else:
+            self.suma += valor - saliente
+        # Recalcular la suma cada `length` velas evita que se acumule error de redondeo (O(1) amortizado)
+        self._desde_recalculo += 1
+        if self._desde_recalculo >= self.length:
+            self.suma = sum(self.buffer)  # Las posiciones aún no usadas valen 0
+            self._desde_recalculo = 0
+
+    def cargar(self, valores):
+        """Inicializa la ventana con las últimas velas de una serie histórica."""
+        for valor in valores[-self.length:]:
+            self.actualizar(float(valor))
+
+    @property
+    def valor(self):
+        if self.cuenta < self.length:
+            return None
+        return self.suma / self.length
+
+
+class RSIWilderIncremental:
+    """RSI de Wilder con medias móviles exponenciales (mismo cálculo que rsi_panel y que ewm de pandas)."""
+
+    __slots__ = ('length', 'avg_gain', 'avg_loss', 'close_anterior', 'cuenta')
+
+    def __init__(self, length=RSI_PERIODO):
+        self.length = length
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.close_anterior = None
+        self.cuenta = 0
+
+    def actualizar(self, close):
+        if self.close_anterior is not None:
+            # La primera vela no tiene delta: sus medias quedan en 0, igual que con ewm(adjust=False)
+            self.avg_gain, self.avg_loss = paso_wilder(self.avg_gain, self.avg_loss,
+                                                       self.close_anterior, close, self.length)
+        self.close_anterior = close
+        self.cuenta += 1
+
+    def cargar(self, closes):
+        """Inicializa el estado recorriendo una serie histórica una sola vez."""
+        if len(closes) == 0:
+            return
+        self.avg_gain, self.avg_loss = medias_wilder(closes, self.length)
+        self.close_anterior = float(closes[-1])
+        self.cuenta += len(closes)
+
+    @staticmethod
+    def _rsi(avg_gain, avg_loss):
+        if avg_loss == 0:
+            return 100.0
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+    def vista_previa(self, close):
+        """RSI que tendría la serie si se añadiera `close`, sin modificar el estado."""
+        if self.close_anterior is None or self.cuenta + 1 < self.length:
+            return None
+        return self._rsi(*paso_wilder(self.avg_gain, self.avg_loss, self.close_anterior, close, self.length))
+
+    @property
+    def valor(self):
+        if self.cuenta < self.length:  # min_periods
+            return None
+        return self._rsi(self.avg_gain, self.avg_loss)
+
+
+class EstadoIndicadores:
+    """
+    Estado completo de la ESTRATEGIA FLEXIBLE para un símbolo e intervalo:
+    SMA_50, SMA_200, RSI_14 y VOLUME_SMA_20 sobre velas cerradas.
+    """
+
+    __slots__ = ('sma_50', 'sma_200', 'rsi_14', 'volume_sma_20', 'close', 'volume', 'ultimo_open_time')
+
+    def __init__(self):
+        self.sma_50 = SMAIncremental(SMA_RAPIDA)
+        self.sma_200 = SMAIncremental(SMA_LENTA)
+        self.rsi_14 = RSIWilderIncremental(RSI_PERIODO)
+        self.volume_sma_20 = SMAIncremental(VOLUMEN_SMA)
+        self.close = None
+        self.volume = None
+        self.ultimo_open_time = None
+
+    @classmethod
+    def desde_historia(cls, close, volume, ultimo_open_time):
+        """Crea el estado a partir de la historia de velas cerradas (arrays de Close y Volume)."""
+        estado = cls()
+        estado.sma_50.cargar(close)
+        estado.sma_200.cargar(close)
+        estado.rsi_14.cargar(close)
+        estado.volume_sma_20.cargar(volume)
+        if len(close):
+            estado.close = float(close[-1])
+            estado.volume = float(volume[-1])
+        estado.ultimo_open_time = ultimo_open_time
+        return estado
+
+    def actualizar(self, open_time, close, volume):
+        """Añade una vela cerrada. Devuelve False si la vela ya estaba procesada."""
+        if self.ultimo_open_time is not None and open_time <= self.ultimo_open_time:
+            return False
+        self.sma_50.actualizar(close)
+        self.sma_200.actualizar(close)
+        self.rsi_14.actualizar(close)
+        self.volume_sma_20.actualizar(volume)
+        self.close = close
+        self.volume = volume
+        self.ultimo_open_time = open_time
+        return True
+
+    def ultima_vela(self):
+        """Fila con los indicadores de la última vela cerrada, o None si falta historia."""
+        fila = {
+            'Close': self.close,
+            'Volume': self.volume,
+            'SMA_50': self.sma_50.valor,
+            'SMA_200': self.sma_200.valor,
+            'RSI_14': self.rsi_14.valor,
+            'VOLUME_SMA_20': self.volume_sma_20.valor,
+        }
+        return None if any(v is None for v in fila.values()) else fila
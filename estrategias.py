@@ -0,0 +1,305 @@
+# estrategias.py
+#
+# Registro de estrategias declaradas como datos: indicadores (función, columna, ventana),
+# condiciones y puntaje como expresiones sobre esos nombres. Cada estrategia se compila una vez
+# en un evaluador vectorizado que trabaja con la última vela de todo el universo a la vez, y los
+# indicadores que comparten varias estrategias se calculan una sola vez por panel.
+
+import ast
+
+import numpy as np
+
+from panel_indicadores import (MARGEN_CONVERGENCIA_RSI, RSI_PERIODO, SMA_LENTA, SMA_RAPIDA, VOLUMEN_SMA,
+                               construir_panel, rsi_panel, sma_panel)
+
+ESTRATEGIA_POR_DEFECTO = 'flexible'
+
+# Columnas de las velas que pueden usar indicadores y expresiones
+COLUMNAS_VELAS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+# Funciones de indicador por nombre: (valores símbolos × tiempo, ventana, historico) -> matriz
+FUNCIONES_INDICADOR = {
+    'sma': lambda valores, ventana, historico: sma_panel(valores, ventana),
+    'rsi': rsi_panel,
+}
+
+# Indicadores que calcula estado_indicadores para la última vela (RSI incremental) y el escáner
+# en tiempo real; las estrategias que solo usan estos se evalúan sin construir un panel
+INDICADORES_ULTIMA_VELA = {
+    'SMA_50': ('sma', 'Close', SMA_RAPIDA),
+    'SMA_200': ('sma', 'Close', SMA_LENTA),
+    'RSI_14': ('rsi', 'Close', RSI_PERIODO),
+    'VOLUME_SMA_20': ('sma', 'Volume', VOLUMEN_SMA),
+}
+
+# Columnas de velas que trae la fila de la última vela (calcular_indicadores_ultima_vela y el
+# estado incremental del tiempo real)
+COLUMNAS_ULTIMA_VELA = ('Close', 'Volume')
+
+DETALLES_VOLUMEN = {'precio_cierre': 'Close', 'rsi': 'RSI_14', 'vol_ratio': 'Volume / VOLUME_SMA_20'}
+
+ESTRATEGIAS = {
+    'flexible': {
+        'nombre': 'Estrategia flexible',
+        'descripcion': 'Tendencia alcista (SMA50 > SMA200), RSI entre 45 y 80 y volumen sobre su media.',
+        'indicadores': dict(INDICADORES_ULTIMA_VELA),
+        'condiciones': [
+            'SMA_50 > SMA_200',
+            '45 < RSI_14 < 80',
+            'Volume > VOLUME_SMA_20',
+            'VOLUME_SMA_20 > 0',
+        ],
+        'puntaje': 'RSI_14 * (Volume / VOLUME_SMA_20)',
+        'detalles': DETALLES_VOLUMEN,
+    },
+    'rebote_sobreventa': {
+        'nombre': 'Rebote en sobreventa',
+        'descripcion': 'Precio sobre la SMA200 con RSI por debajo de 35 y volumen sobre su media.',
+        'indicadores': {
+            'SMA_200': ('sma', 'Close', SMA_LENTA),
+            'RSI_14': ('rsi', 'Close', RSI_PERIODO),
+            'VOLUME_SMA_20': ('sma', 'Volume', VOLUMEN_SMA),
+        },
+        'condiciones': [
+            'Close > SMA_200',
+            'RSI_14 < 35',
+            'Volume > VOLUME_SMA_20',
+            'VOLUME_SMA_20 > 0',
+        ],
+        'puntaje': '(35 - RSI_14) * (Volume / VOLUME_SMA_20)',
+        'detalles': DETALLES_VOLUMEN,
+    },
+    'momentum': {
+        'nombre': 'Momentum',
+        'descripcion': 'Medias alineadas (SMA20 > SMA50 > SMA200) con RSI entre 55 y 70.',
+        'indicadores': {
+            'SMA_20': ('sma', 'Close', 20),
+            'SMA_50': ('sma', 'Close', SMA_RAPIDA),
+            'SMA_200': ('sma', 'Close', SMA_LENTA),
+            'RSI_14': ('rsi', 'Close', RSI_PERIODO),
+            'VOLUME_SMA_20': ('sma', 'Volume', VOLUMEN_SMA),
+        },
+        'condiciones': [
+            'SMA_20 > SMA_50 > SMA_200',
+            '55 < RSI_14 < 70',
+            'VOLUME_SMA_20 > 0',
+        ],
+        # Separación (%) entre la media rápida y la lenta, ponderada por el volumen
+        'puntaje': '100 * (SMA_20 / SMA_200 - 1) * (Volume / VOLUME_SMA_20)',
+        'detalles': DETALLES_VOLUMEN,
+    },
+}
+
+# Operadores admitidos en las expresiones y su versión vectorizada
+OPERADORES_BINARIOS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+}
+OPERADORES_COMPARACION = {
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+}
+
+
+def _compilar(nodo, nombres, usados):
+    """Convierte un nodo de ast en una función (valores -> array). Solo admite aritmética y comparaciones."""
+    if isinstance(nodo, ast.Expression):
+        return _compilar(nodo.body, nombres, usados)
+    if isinstance(nodo, ast.Constant) and isinstance(nodo.value, (int, float)) and not isinstance(nodo.value, bool):
+        constante = float(nodo.value)
+        return lambda valores: constante
+    if isinstance(nodo, ast.Name):
+        if nodo.id not in nombres:
+            raise ValueError(f"Nombre desconocido en la expresión: {nodo.id}")
+        nombre = nodo.id
+        usados.add(nombre)
+        return lambda valores: valores[nombre]
+    if isinstance(nodo, ast.UnaryOp) and isinstance(nodo.op, ast.USub):
+        operando = _compilar(nodo.operand, nombres, usados)
+        return lambda valores: np.negative(operando(valores))
+    if isinstance(nodo, ast.BinOp) and type(nodo.op) in OPERADORES_BINARIOS:
+        funcion = OPERADORES_BINARIOS[type(nodo.op)]
+        izquierda = _compilar(nodo.left, nombres, usados)
+        derecha = _compilar(nodo.right, nombres, usados)
+        return lambda valores: funcion(izquierda(valores), derecha(valores))
+    if isinstance(nodo, ast.Compare) and all(type(op) in OPERADORES_COMPARACION for op in nodo.ops):
+        # Las comparaciones encadenadas (45 < RSI_14 < 80) son la conjunción de cada par
+        operandos = [_compilar(n, nombres, usados) for n in [nodo.left] + nodo.comparators]
+        pares = [(OPERADORES_COMPARACION[type(op)], operandos[i], operandos[i + 1])
+                 for i, op in enumerate(nodo.ops)]
+        return lambda valores: np.logical_and.reduce(
+            [funcion(izquierda(valores), derecha(valores)) for funcion, izquierda, derecha in pares])
+    raise ValueError(f"Expresión no admitida: {ast.dump(nodo)}")
+
+
+def compilar_expresion(texto, nombres, usados=None):
+    """Compila `texto` (p. ej. 'RSI_14 * (Volume / VOLUME_SMA_20)') en una función vectorizada."""
+    return _compilar(ast.parse(texto, mode='eval'), nombres, usados if usados is not None else set())
+
+
+class Estrategia:
+    """
+    Estrategia compilada. `evaluar(valores)` recibe {nombre: array} con la última vela de cada
+    símbolo (indicadores y columnas de velas) y devuelve (máscara de señal, puntaje, detalles)
+    en una sola pasada vectorizada.
+    """
+
+    def __init__(self, id_estrategia, definicion):
+        self.id = id_estrategia
+        self.nombre = definicion['nombre']
+        self.descripcion = definicion.get('descripcion', '')
+        self.indicadores = {nombre: tuple(spec) for nombre, spec in definicion['indicadores'].items()}
+        for nombre, (funcion, columna, ventana) in self.indicadores.items():
+            if funcion not in FUNCIONES_INDICADOR or columna not in COLUMNAS_VELAS or int(ventana) < 1:
+                raise ValueError(f"Indicador no válido en {id_estrategia}: {nombre}")
+
+        nombres = set(self.indicadores) | set(COLUMNAS_VELAS)
+        usados = set(self.indicadores)
+        self._condiciones = [compilar_expresion(c, nombres, usados) for c in definicion['condiciones']]
+        self._puntaje = compilar_expresion(definicion['puntaje'], nombres, usados)
+        self._detalles = {campo: compilar_expresion(expresion, nombres, usados)
+                          for campo, expresion in definicion.get('detalles', {}).items()}
+        # Equivalente al dropna() del camino por símbolo: todo lo que usa la estrategia debe existir
+        self.nombres_usados = tuple(sorted(usados))
+        # Columnas de velas que leen directamente las expresiones (no a través de un indicador)
+        self.columnas_expresiones = tuple(c for c in COLUMNAS_VELAS if c in usados)
+        self.columnas = tuple(c for c in COLUMNAS_VELAS if c in usados or
+                              any(spec[1] == c for spec in self.indicadores.values()))
+
+    @property
+    def velas_necesarias(self):
+        """Velas mínimas para evaluar la última vela: la ventana más larga más el margen del RSI."""
+        ventana = max(int(spec[2]) for spec in self.indicadores.values())
+        periodos_rsi = [int(spec[2]) for spec in self.indicadores.values() if spec[0] == 'rsi']
+        return ventana + MARGEN_CONVERGENCIA_RSI * max(periodos_rsi, default=0)
+
+    def usa_solo(self, indicadores, columnas=COLUMNAS_ULTIMA_VELA):
+        """
+        True si todos los indicadores de la estrategia están en `indicadores` con la misma
+        definición y sus expresiones solo leen las columnas de velas de `columnas`.
+        """
+        return (all(indicadores.get(nombre) == spec for nombre, spec in self.indicadores.items())
+                and all(columna in columnas for columna in self.columnas_expresiones))
+
+    def evaluar(self, valores):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            senal = ~np.logical_or.reduce([np.isnan(valores[nombre]) for nombre in self.nombres_usados])
+            for condicion in self._condiciones:
+                senal &= condicion(valores)
+            puntaje = self._puntaje(valores)
+            detalles = {campo: expresion(valores) for campo, expresion in self._detalles.items()}
+        return senal, puntaje, detalles
+
+    def senales(self, valores, simbolos):
+        """Detalles (mismo formato que verificar_senal_de_compra, con 'simbolo' y 'estrategia') de los símbolos con señal."""
+        senal, puntaje, detalles = self.evaluar(valores)
+        resultados = []
+        for i in np.flatnonzero(senal):
+            resultado = {campo: np.broadcast_to(valor, senal.shape)[i] for campo, valor in detalles.items()}
+            resultado['score'] = np.broadcast_to(puntaje, senal.shape)[i]
+            resultado['simbolo'] = simbolos[i]
+            resultado['estrategia'] = self.id
+            resultados.append(resultado)
+        return resultados
+
+    def verificar(self, df):
+        """
+        Evalúa la última fila de un DataFrame que ya tiene las columnas de los indicadores (p. ej.
+        la salida de calcular_indicadores_ultima_vela). Devuelve (hay_senal, detalles).
+        """
+        if df is None or len(df) < 1 or any(nombre not in df for nombre in self.nombres_usados):
+            return False, None
+        valores = {nombre: df[nombre].to_numpy(dtype=float)[-1:] for nombre in self.nombres_usados}
+        senal, puntaje, detalles = self.evaluar(valores)
+        if not senal[0]:
+            return False, None
+        resultado = {campo: np.broadcast_to(valor, senal.shape)[0] for campo, valor in detalles.items()}
+        resultado['score'] = np.broadcast_to(puntaje, senal.shape)[0]
+        return True, resultado
+
+    def descripcion_publica(self):
+        return {'id': self.id, 'nombre': self.nombre, 'descripcion': self.descripcion}
+
+
+# Las estrategias se compilan al importar el módulo: una definición incorrecta falla al arrancar
+estrategias_global = {id_estrategia: Estrategia(id_estrategia, definicion)
+                      for id_estrategia, definicion in ESTRATEGIAS.items()}
+
+
+def obtener_estrategias(ids=None):
+    """Estrategias compiladas por id (por defecto la estrategia flexible). Lanza KeyError si alguna no existe."""
+    ids = list(dict.fromkeys(ids or [ESTRATEGIA_POR_DEFECTO]))
+    for id_estrategia in ids:
+        if id_estrategia not in estrategias_global:
+            raise KeyError(id_estrategia)
+    return [estrategias_global[id_estrategia] for id_estrategia in ids]
+
+
+def velas_necesarias(estrategias):
+    """Velas de calentamiento que piden las `estrategias` (las de la que más necesita)."""
+    return max(estrategia.velas_necesarias for estrategia in estrategias)
+
+
+def columnas_necesarias(estrategias):
+    """Columnas de velas que hay que llevar al panel para las `estrategias`."""
+    usadas = {columna for estrategia in estrategias for columna in estrategia.columnas}
+    return tuple(c for c in COLUMNAS_VELAS if c in usadas)
+
+
+def calcular_indicadores(panel, estrategias, historico=False):
+    """
+    Añade al panel, con la definición (función, columna, ventana) como clave, los indicadores de
+    todas las `estrategias`. Los que ya están en el panel (compartidos) no se recalculan.
+    """
+    for estrategia in estrategias:
+        for spec in estrategia.indicadores.values():
+            if spec in panel:
+                continue
+            funcion, columna, ventana = spec
+            panel[spec] = FUNCIONES_INDICADOR[funcion](panel[columna], int(ventana), historico)
+    return panel
+
+
+def evaluar_panel(panel, estrategias):
+    """Señales de la última vela de cada símbolo para cada estrategia (el panel ya tiene sus indicadores)."""
+    if not panel['simbolos'] or panel['Close'].shape[1] == 0:
+        return []
+    resultados = []
+    for estrategia in estrategias:
+        valores = {columna: panel[columna][:, -1] for columna in estrategia.columnas}
+        valores.update({nombre: panel[spec][:, -1] for nombre, spec in estrategia.indicadores.items()})
+        resultados.extend(estrategia.senales(valores, panel['simbolos']))
+    return resultados
+
+
+def evaluar_estrategias(datos_por_simbolo, estrategias):
+    """Panel, indicadores compartidos y señales de todas las `estrategias` en una sola pasada."""
+    panel = construir_panel(datos_por_simbolo, columnas_necesarias(estrategias))
+    calcular_indicadores(panel, estrategias)
+    return evaluar_panel(panel, estrategias)
+
+
+def evaluar_simbolo(simbolo, df, estrategias, fila=None):
+    """
+    Señales de un símbolo. Las estrategias que solo usan INDICADORES_ULTIMA_VELA y las columnas
+    COLUMNAS_ULTIMA_VELA se evalúan sobre `fila` (salida de calcular_indicadores_ultima_vela, con
+    el RSI incremental); el resto, con un panel de un solo símbolo.
+    """
+    resultados = []
+    resto = []
+    for estrategia in estrategias:
+        if fila is None or not estrategia.usa_solo(INDICADORES_ULTIMA_VELA):
+            resto.append(estrategia)
+            continue
+        hay_senal, detalles = estrategia.verificar(fila)
+        if hay_senal:
+            detalles['simbolo'] = simbolo
+            detalles['estrategia'] = estrategia.id
+            resultados.append(detalles)
+    if resto:
+        resultados.extend(evaluar_estrategias({simbolo: df}, resto))
+    return resultados
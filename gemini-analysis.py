@@ -1,11 +1,10 @@
 # gemini_analysis.py
 
-import os
 import pandas as pd
-import glob
-import json
-import google.generativeai as genai
 import config
+from datetime import datetime
+from analisis_ia import analizar_simbolos_en_lotes, configurar_gemini, obtener_cache
+from almacen_resultados import obtener_almacen_resultados
 
 # --- ADVERTENCIA DE USO ---
 # ESTE SCRIPT UTILIZA IA GENERATIVA. LA INFORMACIÓN PUEDE SER IMPRECISA O ESTAR DESACTUALIZADA.
@@ -13,7 +12,7 @@ import config
 
 # --- CONFIGURACIÓN DE LA API DE GEMINI ---
 try:
-    genai.configure(api_key=config.gemini_api_key)
+    configurar_gemini(config.gemini_api_key)  # El SDK se carga al enviar el primer análisis
 except AttributeError:
     print("FATAL: No se encontró 'gemini_api_key' en config.py.")
     exit()
@@ -22,13 +21,6 @@ if "TU_API_KEY_DE_GEMINI" in config.gemini_api_key:
     print("FATAL: Por favor, configura tu 'gemini_api_key' en el archivo config.py.")
     exit()
 
-def find_latest_csv():
-    """Encuentra el archivo .csv de análisis técnico más reciente."""
-    list_of_files = glob.glob('analisis_binance_*.csv')
-    if not list_of_files:
-        return None
-    return max(list_of_files, key=os.path.getctime)
-
 def build_analysis_prompt(project_name):
     """
     Crea un prompt optimizado y estructurado para la IA.
@@ -59,55 +51,36 @@ def build_analysis_prompt(project_name):
     No incluyas disclaimers, introducciones ni texto adicional. Solo el objeto JSON.
     """
 
-def analyze_with_gemini(symbol):
-    """
-    Llama a la API de Gemini para obtener el análisis y parsea la respuesta JSON.
-    """
-    project_name = symbol.replace('USDT', '')
-    print(f"   - Enviando {project_name} a Gemini para análisis...")
-    
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        prompt = build_analysis_prompt(project_name)
-        response = model.generate_content(prompt)
-        
-        # Limpiar la respuesta para asegurar que sea un JSON válido
-        cleaned_response = response.text.strip().replace('```json', '').replace('```', '')
-        
-        # Parsear el string JSON a un diccionario de Python
-        analysis = json.loads(cleaned_response)
-        analysis['symbol'] = symbol # Añadir el símbolo al resultado
-        return analysis
-
-    except Exception as e:
-        print(f"   - ERROR al analizar {project_name}: {e}")
-        return {
-            "symbol": symbol,
-            "risk_level": "Error de Análisis",
-            "summary": f"No se pudo completar el análisis debido a un error: {str(e)}",
-            "long_term_outlook": "N/A", "medium_term_outlook": "N/A", "short_term_outlook": "N/A"
-        }
-
 if __name__ == "__main__":
-    csv_file = find_latest_csv()
-    if not csv_file:
-        print("❌ Error: No se encontró 'analisis_binance_*.csv'. Ejecuta 'main.py' primero.")
+    almacen = obtener_almacen_resultados()
+    ejecucion = almacen.ultima_ejecucion()
+    if not ejecucion:
+        print(f"❌ Error: No hay resultados en '{almacen.ruta}'. Ejecuta 'main.py' primero.")
         exit()
 
-    print(f"Cargando candidatos técnicos desde: {csv_file}\n")
-    df = pd.read_csv(csv_file)
+    print(f"Cargando candidatos técnicos de la ejecución {ejecucion['id']} "
+          f"({ejecucion['intervalo']}, {ejecucion['categoria']})\n")
+    # Un símbolo puede tener señal en varias estrategias: se analiza una vez (con su mejor puntaje)
+    df = pd.DataFrame(almacen.resultados(ejecucion['id']))
+    if not df.empty:
+        df = df.drop_duplicates('simbolo', ignore_index=True)
     top_candidates = df.head(20)
 
-    final_results = []
-    
     print("--- Iniciando Análisis Fundamental con IA (Gemini) ---")
     for index, row in top_candidates.iterrows():
-        symbol = row['simbolo']
-        print(f"\nAnalizando Candidato [{index+1}/{len(top_candidates)}]: {symbol} (Puntaje Técnico: {row['score']:.2f})")
-        
-        # La llamada real a la IA
-        ai_analysis = analyze_with_gemini(symbol)
-        final_results.append(ai_analysis)
+        print(f"Candidato [{index+1}/{len(top_candidates)}]: {row['simbolo']} (Puntaje Técnico: {row['score']:.2f})")
+
+    def mostrar_progreso(analysis):
+        estado = "ERROR" if analysis['risk_level'] == "Error de Análisis" else "OK"
+        print(f"   - {analysis['symbol']}: análisis recibido ({estado})")
+
+    # Varios candidatos por llamada y lotes en paralelo; los resultados conservan el orden de los candidatos
+    final_results = analizar_simbolos_en_lotes(list(top_candidates['simbolo']), build_analysis_prompt,
+                                               al_terminar=mostrar_progreso)
+
+    estadisticas_cache = obtener_cache().estadisticas()
+    print(f"\nCache de análisis: {estadisticas_cache['hits']} aciertos, {estadisticas_cache['misses']} fallos "
+          f"({estadisticas_cache['entries']} entradas guardadas)")
 
     # --- PRESENTACIÓN DEL INFORME FINAL ---
     print("\n\n" + "="*80)
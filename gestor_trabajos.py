@@ -0,0 +1,157 @@
+# gestor_trabajos.py
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from motor_descarga import MAX_PETICIONES_SIMULTANEAS, CacheDescargas, descargar_en_paralelo
+
+# --- CONFIGURACIÓN DEL GESTOR DE TRABAJOS ---
+MAX_TRABAJOS_SIMULTANEOS = 3   # Escaneos ejecutándose a la vez; el resto espera en cola
+MAX_TRABAJOS_PENDIENTES = 10   # En ejecución + en cola
+MAX_TRABAJOS_GUARDADOS = 50    # Historial de trabajos terminados que se conserva
+
+
+class Trabajo:
+    """Un escaneo con su propio id, configuración, estado, resultados y cancelación."""
+
+    def __init__(self, config):
+        self.id = uuid.uuid4().hex[:12]
+        self.creado = time.time()
+        self.config = dict(config)
+        self.candidatos = []  # Candidatos en orden de aparición (para el stream SSE)
+        self._cancelado = threading.Event()
+        self._lock = threading.Lock()
+        self._estado = {
+            'job_id': self.id,
+            'is_running': True,
+            'queued': True,
+            'cancelled': False,
+            'progress': 0,
+            'total_symbols': 0,
+            'current_symbol': '',
+            'results': [],
+            'error': None,
+            'metrics': None,  # metricas.MedicionEscaneo.resumen() del escaneo
+            'config': self.config,
+            'created': self.creado,
+            'finished': None,
+        }
+
+    def actualizar(self, **cambios):
+        """Actualiza el estado de forma atómica respecto a los lectores."""
+        with self._lock:
+            self._estado.update(cambios)
+
+    def anadir_candidatos(self, candidatos):
+        with self._lock:
+            self.candidatos.extend(candidatos)
+
+    def finalizar(self, **cambios):
+        cambios.update(is_running=False, queued=False, finished=time.time())
+        self.actualizar(**cambios)
+
+    def estado(self):
+        """Copia del estado actual (lo que se serializa en la API)."""
+        with self._lock:
+            return dict(self._estado)
+
+    def __getitem__(self, clave):
+        with self._lock:
+            return self._estado[clave]
+
+    def resumen(self):
+        """Estado sin la lista de resultados, para listados."""
+        estado = self.estado()
+        estado['results_count'] = len(estado.pop('results'))
+        return estado
+
+    def cancelar(self):
+        self._cancelado.set()
+        self.actualizar(cancelled=True)
+
+    def continuar(self):
+        return not self._cancelado.is_set()
+
+
+class GestorTrabajos:
+    """
+    Ejecuta escaneos concurrentes y aislados. Los trabajos comparten un único pool de descargas
+    acotado y una cache de vuelo único, así que dos escaneos con símbolos en común descargan
+    cada símbolo una sola vez.
+
+    `funcion_trabajo(trabajo, gestor)` es la función que ejecuta un escaneo (run_technical_analysis).
+    """
+
+    def __init__(self, funcion_trabajo, max_trabajos=MAX_TRABAJOS_SIMULTANEOS,
+                 max_peticiones=MAX_PETICIONES_SIMULTANEAS, max_pendientes=MAX_TRABAJOS_PENDIENTES,
+                 max_guardados=MAX_TRABAJOS_GUARDADOS):
+        self.funcion_trabajo = funcion_trabajo
+        self.max_pendientes = max_pendientes
+        self.max_guardados = max_guardados
+        self.max_peticiones = max_peticiones
+        self._ejecutor_trabajos = ThreadPoolExecutor(max_workers=max_trabajos, thread_name_prefix='trabajo')
+        self.ejecutor_descargas = ThreadPoolExecutor(max_workers=max_peticiones, thread_name_prefix='descarga')
+        self.cache_descargas = CacheDescargas()
+        self._trabajos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _ejecutar(self, trabajo):
+        if not trabajo.continuar():
+            trabajo.finalizar()
+            return
+        trabajo.actualizar(queued=False)
+        try:
+            self.funcion_trabajo(trabajo, self)
+        except Exception as e:
+            trabajo.finalizar(error=str(e))
+        else:
+            if trabajo['is_running']:
+                trabajo.finalizar()
+
+    def _purgar(self):
+        terminados = [id_ for id_, t in self._trabajos.items() if not t['is_running']]
+        sobrantes = len(self._trabajos) - self.max_guardados
+        for id_ in terminados[:max(sobrantes, 0)]:
+            del self._trabajos[id_]
+
+    def crear(self, config):
+        """Crea y encola un trabajo. Devuelve None si ya hay demasiados trabajos pendientes."""
+        with self._lock:
+            pendientes = sum(1 for t in self._trabajos.values() if t['is_running'])
+            if pendientes >= self.max_pendientes:
+                return None
+            trabajo = Trabajo(config)
+            self._trabajos[trabajo.id] = trabajo
+            self._purgar()
+        self._ejecutor_trabajos.submit(self._ejecutar, trabajo)
+        return trabajo
+
+    def obtener(self, id_trabajo):
+        with self._lock:
+            return self._trabajos.get(id_trabajo)
+
+    def ultimo(self):
+        with self._lock:
+            return next(reversed(self._trabajos.values()), None)
+
+    def listar(self):
+        with self._lock:
+            trabajos = list(self._trabajos.values())
+        return [t.resumen() for t in reversed(trabajos)]
+
+    def cancelar(self, id_trabajo):
+        trabajo = self.obtener(id_trabajo)
+        if trabajo is None:
+            return None
+        trabajo.cancelar()
+        return trabajo
+
+    def descargar(self, trabajo, simbolos, funcion_descarga, intervalo, dias, medicion=None):
+        """descargar_en_paralelo sobre el pool y la cache compartidos, cancelable por trabajo."""
+        return descargar_en_paralelo(simbolos, funcion_descarga, intervalo, dias,
+                                     max_peticiones=self.max_peticiones, continuar=trabajo.continuar,
+                                     executor=self.ejecutor_descargas, cache=self.cache_descargas,
+                                     medicion=medicion)
@@ -0,0 +1,170 @@
+# instantanea_mercado.py
+
+import threading
+import time
+
+from cliente_binance import obtener_cliente
+
+# --- CONFIGURACIÓN DE LA INSTANTÁNEA DE MERCADO ---
+TTL_EXCHANGE_INFO = 60 * 60  # El listado de símbolos cambia muy poco (y el payload es pesado)
+TTL_TICKERS = 60             # El volumen y el cambio de 24h se refrescan a menudo
+ACTIVOS_EXCLUIDOS = ['USDC', 'TUSD', 'BUSD']
+
+
+def es_simbolo_spot_valido(s, quote_asset):
+    """Mismo filtro que usaban los escaneos: spot en TRADING, sin tokens apalancados ni stablecoins."""
+    return (s['isSpotTradingAllowed'] and s['status'] == 'TRADING' and
+            s['quoteAsset'] == quote_asset and 'UP' not in s['symbol'] and
+            'DOWN' not in s['symbol'] and s['baseAsset'] not in ACTIVOS_EXCLUIDOS)
+
+
+class ListaSimbolos(list):
+    """
+    Lista de info de símbolos (la misma que devolvía obtener_info_simbolos_detallada) con índices
+    precalculados: `por_volumen` está ordenada por quoteVolume_24h de mayor a menor.
+    """
+
+    def __init__(self, simbolos_info):
+        super().__init__(simbolos_info)
+        self.por_volumen = sorted(self, key=lambda x: x['quoteVolume_24h'], reverse=True)
+
+
+class RecursoRefrescable:
+    """
+    Valor que se recarga cada `ttl` segundos con vuelo único: solo un hilo descarga a la vez.
+    Si ya hay un valor, al caducar se sigue sirviendo mientras se refresca en segundo plano;
+    solo la primera carga bloquea a quien la pide.
+    """
+
+    def __init__(self, cargar, ttl):
+        self.cargar = cargar
+        self.ttl = ttl
+        self.valor = None
+        self.version = 0
+        self._instante = 0.0
+        self._error = None
+        self._refrescando = False
+        self._listo = threading.Event()
+        self._lock = threading.Lock()
+
+    def _refrescar(self):
+        try:
+            valor = self.cargar()
+        except Exception as e:
+            print(f"Error al refrescar la instantánea de mercado: {e}")
+            with self._lock:
+                self._error = e
+        else:
+            with self._lock:
+                self.valor = valor
+                self.version += 1
+                self._instante = time.monotonic()
+                self._error = None
+        finally:
+            with self._lock:
+                self._refrescando = False
+                self._listo.set()
+
+    def obtener(self):
+        with self._lock:
+            vigente = self.valor is not None and time.monotonic() - self._instante < self.ttl
+            if vigente:
+                return self.valor
+            lanzar = not self._refrescando
+            if lanzar:
+                self._refrescando = True
+                self._listo = threading.Event()
+            listo = self._listo
+            valor = self.valor
+
+        if valor is not None:
+            if lanzar:
+                threading.Thread(target=self._refrescar, daemon=True).start()
+            return valor  # Valor caducado mientras llega el nuevo
+
+        if lanzar:
+            self._refrescar()
+        else:
+            listo.wait()
+        with self._lock:
+            if self.valor is None:
+                raise self._error or RuntimeError("No se pudo cargar la instantánea de mercado")
+            return self.valor
+
+
+class InstantaneaMercado:
+    """
+    Metadatos de símbolos (exchange info) y estadísticas de 24h en memoria, cada uno con su
+    propio intervalo de refresco. Sustituye a las llamadas a get_exchange_info() y get_ticker()
+    que hacía cada escaneo y cada petición a /api/get-symbols-info.
+    """
+
+    def __init__(self, ttl_exchange_info=TTL_EXCHANGE_INFO, ttl_tickers=TTL_TICKERS):
+        self.exchange_info = RecursoRefrescable(self._cargar_exchange_info, ttl_exchange_info)
+        self.tickers = RecursoRefrescable(self._cargar_tickers, ttl_tickers)
+        self._vistas = {}  # quote_asset -> ((versión exchange info, versión tickers), ListaSimbolos)
+        self._lock = threading.Lock()
+
+    def _cargar_exchange_info(self):
+        # Solo se guarda lo que se usa; el payload original es de varios MB
+        return [{
+            'symbol': s['symbol'],
+            'baseAsset': s['baseAsset'],
+            'quoteAsset': s['quoteAsset'],
+            'status': s['status'],
+            'isSpotTradingAllowed': s['isSpotTradingAllowed'],
+            'onboardDate': s.get('onboardDate', None),
+            'permissions': s.get('permissions', [])
+        } for s in obtener_cliente().get_exchange_info()['symbols']]
+
+    def _cargar_tickers(self):
+        return {t['symbol']: {
+            'volume_24h': float(t.get('volume', 0)),
+            'quoteVolume_24h': float(t.get('quoteVolume', 0)),
+            'count_24h': int(t.get('count', 0)),
+            'priceChange_24h': float(t.get('priceChange', 0)),
+            'priceChangePercent_24h': float(t.get('priceChangePercent', 0))
+        } for t in obtener_cliente().get_ticker()}
+
+    def simbolos(self, quote_asset='USDT'):
+        """Símbolos spot válidos; solo necesita el exchange info."""
+        return [s['symbol'] for s in self.exchange_info.obtener() if es_simbolo_spot_valido(s, quote_asset)]
+
+    def info_detallada(self, quote_asset='USDT'):
+        """ListaSimbolos con metadatos y volumen de 24h, recalculada solo cuando cambia algún recurso."""
+        # Las versiones se leen antes que los datos: si cambian entre medias, la vista se rehace después
+        versiones = (self.exchange_info.version, self.tickers.version)
+        simbolos = self.exchange_info.obtener()
+        tickers = self.tickers.obtener()
+        with self._lock:
+            vista = self._vistas.get(quote_asset)
+            if vista is not None and vista[0] == versiones:
+                return vista[1]
+
+        simbolos_info = []
+        for s in simbolos:
+            if not es_simbolo_spot_valido(s, quote_asset):
+                continue
+            symbol_info = {
+                'symbol': s['symbol'],
+                'baseAsset': s['baseAsset'],
+                'quoteAsset': s['quoteAsset'],
+                'onboardDate': s['onboardDate'],  # Fecha de listado
+                'permissions': s['permissions'],
+                'volume_24h': 0,
+                'quoteVolume_24h': 0,
+                'count_24h': 0,
+                'priceChange_24h': 0,
+                'priceChangePercent_24h': 0
+            }
+            symbol_info.update(tickers.get(s['symbol'], {}))
+            simbolos_info.append(symbol_info)
+
+        lista = ListaSimbolos(simbolos_info)
+        with self._lock:
+            self._vistas[quote_asset] = (versiones, lista)
+        return lista
+
+
+# Instantánea compartida por todo el proceso
+instantanea_global = InstantaneaMercado()
@@ -1,10 +1,17 @@
 # main.py
 
 import pandas as pd
-import numpy as np
-from binance.client import Client
 import config 
-from datetime import datetime
+from motor_descarga import descargar_en_paralelo
+from almacen_klines import almacen_global
+from almacen_resultados import RUTA_RESULTADOS, obtener_almacen_resultados
+from parser_klines import array_a_dataframe
+from cliente_binance import configurar_cliente
+from descarga_historica import descargar_historia, validar_dias_intervalo
+from instantanea_mercado import instantanea_global
+from estado_indicadores import calcular_indicadores_ultima_vela
+from multi_temporalidad import dias_necesarios
+from estrategias import ESTRATEGIA_POR_DEFECTO, estrategias_global, evaluar_simbolo, obtener_estrategias, velas_necesarias
 
 # --- ADVERTENCIA DE USO ---
 # Este script es para fines educativos y no constituye una recomendación financiera.
@@ -21,29 +28,33 @@ if "TU_API_KEY" in api_key or "TU_SECRET_KEY" in api_secret:
     print("FATAL: Por favor, configura tus claves de API en config.py antes de ejecutar.")
     exit()
 
+# Cliente de Binance compartido (pool de conexiones reutilizable entre hilos)
+configurar_cliente(api_key, api_secret)
+
 # --- CONFIGURACIÓN DE INTERVALOS DISPONIBLES ---
+# Mismos valores que Client.KLINE_INTERVAL_* (sin importar python-binance al arrancar)
 INTERVALOS_DISPONIBLES = {
-    '1s': Client.KLINE_INTERVAL_1SECOND,
-    '1m': Client.KLINE_INTERVAL_1MINUTE,
-    '3m': Client.KLINE_INTERVAL_3MINUTE,
-    '5m': Client.KLINE_INTERVAL_5MINUTE,
-    '15m': Client.KLINE_INTERVAL_15MINUTE,
-    '30m': Client.KLINE_INTERVAL_30MINUTE,
-    '1h': Client.KLINE_INTERVAL_1HOUR,
-    '2h': Client.KLINE_INTERVAL_2HOUR,
-    '4h': Client.KLINE_INTERVAL_4HOUR,
-    '6h': Client.KLINE_INTERVAL_6HOUR,
-    '8h': Client.KLINE_INTERVAL_8HOUR,
-    '12h': Client.KLINE_INTERVAL_12HOUR,
-    '1d': Client.KLINE_INTERVAL_1DAY,
-    '3d': Client.KLINE_INTERVAL_3DAY,
-    '1w': Client.KLINE_INTERVAL_1WEEK,
-    '1M': Client.KLINE_INTERVAL_1MONTH
+    '1s': '1s',
+    '1m': '1m',
+    '3m': '3m',
+    '5m': '5m',
+    '15m': '15m',
+    '30m': '30m',
+    '1h': '1h',
+    '2h': '2h',
+    '4h': '4h',
+    '6h': '6h',
+    '8h': '8h',
+    '12h': '12h',
+    '1d': '1d',
+    '3d': '3d',
+    '1w': '1w',
+    '1M': '1M'
 }
 
 def obtener_configuracion_usuario():
     """
-    Permite al usuario configurar el intervalo de tiempo y la cantidad de días para el análisis.
+    Permite al usuario configurar el intervalo de tiempo, la cantidad de días y las estrategias del análisis.
     """
     print("\n=== CONFIGURACIÓN DE ANÁLISIS ===")
     print("Intervalos disponibles:")
@@ -59,10 +70,14 @@ def obtener_configuracion_usuario():
         else:
             print("❌ Intervalo no válido. Por favor, seleccione uno de la lista.")
     
-    # Configurar días
+    # Configurar días (opcional: sin días se descargan solo las velas que necesitan los indicadores)
     while True:
         try:
-            dias = int(input("Ingrese la cantidad de días para el análisis (mínimo 30, máximo 1000): "))
+            respuesta = input("Ingrese la cantidad de días para el análisis (mínimo 30, máximo 1000, Enter = automático): ").strip()
+            if not respuesta:
+                dias = None
+                break
+            dias = int(respuesta)
             if 30 <= dias <= 1000:
                 break
             else:
@@ -70,27 +85,32 @@ def obtener_configuracion_usuario():
         except ValueError:
             print("❌ Por favor, ingrese un número válido.")
     
-    return intervalo, dias
+    # Configurar estrategias (varias se evalúan sobre la misma descarga)
+    print("\nEstrategias disponibles:")
+    for estrategia in estrategias_global.values():
+        print(f"  {estrategia.id}: {estrategia.descripcion}")
+    while True:
+        respuesta = input(f"Ingrese una o varias estrategias separadas por comas (Enter = {ESTRATEGIA_POR_DEFECTO}): ")
+        ids = [i.strip() for i in respuesta.split(',') if i.strip()]
+        try:
+            estrategias = obtener_estrategias(ids)
+            break
+        except KeyError as e:
+            print(f"❌ Estrategia no válida: {e.args[0]}")
+    
+    return intervalo, dias, estrategias
 
 def validar_configuracion(intervalo, dias):
     """
     Valida que la configuración sea apropiada para el análisis.
     """
-    # Para intervalos muy pequeños, limitar la cantidad de días para evitar demasiados datos
-    if intervalo in [Client.KLINE_INTERVAL_1SECOND, Client.KLINE_INTERVAL_1MINUTE]:
-        if dias > 7:
-            print("⚠️  ADVERTENCIA: Para intervalos de 1 segundo o 1 minuto, se recomienda máximo 7 días.")
-            confirmacion = input("¿Desea continuar con esta configuración? (s/n): ").lower()
-            if confirmacion != 's':
-                return False
-    
-    # Para intervalos pequeños, limitar días para evitar sobrecarga
-    elif intervalo in [Client.KLINE_INTERVAL_3MINUTE, Client.KLINE_INTERVAL_5MINUTE]:
-        if dias > 30:
-            print("⚠️  ADVERTENCIA: Para intervalos pequeños, se recomienda máximo 30 días.")
-            confirmacion = input("¿Desea continuar con esta configuración? (s/n): ").lower()
-            if confirmacion != 's':
-                return False
+    # El escaneo tiene todo el universo en memoria: se limitan los intervalos pequeños
+    mensaje_error = validar_dias_intervalo(intervalo, dias, escaneo=True)
+    if mensaje_error:
+        print(f"⚠️  ADVERTENCIA: {mensaje_error}")
+        confirmacion = input("¿Desea continuar con esta configuración? (s/n): ").lower()
+        if confirmacion != 's':
+            return False
     
     return True
 
@@ -98,14 +118,9 @@ def validar_configuracion(intervalo, dias):
 def obtener_simbolos_spot(quote_asset='USDT'):
     """Obtiene una lista de todos los símbolos del mercado SPOT que están actualmente en TRADING."""
     print(f"Obteniendo todos los símbolos que operan contra {quote_asset}...")
-    client = Client(api_key, api_secret)
-    simbolos_filtrados = []
     try:
-        exchange_info = client.get_exchange_info()
-        for s in exchange_info['symbols']:
-            # Añadimos un filtro para excluir los pares de stablecoins como 'USDCUSDT'
-            if s['isSpotTradingAllowed'] and s['status'] == 'TRADING' and s['quoteAsset'] == quote_asset and 'UP' not in s['symbol'] and 'DOWN' not in s['symbol'] and s['baseAsset'] not in ['USDC', 'TUSD', 'BUSD']:
-                simbolos_filtrados.append(s['symbol'])
+        # Misma instantánea de exchange info (y mismo filtro) que la webapp
+        simbolos_filtrados = instantanea_global.simbolos(quote_asset)
         print(f"Se encontraron {len(simbolos_filtrados)} símbolos para analizar.")
         return simbolos_filtrados
     except Exception as e:
@@ -113,142 +128,92 @@ def obtener_simbolos_spot(quote_asset='USDT'):
         return []
 
 def obtener_datos_historicos_binance(simbolo, intervalo, dias):
-    """Obtiene los datos históricos desde la API de Binance."""
-    client = Client(api_key, api_secret)
-    fecha_inicio = f"{dias} days ago UTC"
+    """Obtiene los datos históricos leyendo a través del almacén local de velas."""
     try:
-        klines = client.get_historical_klines(simbolo, intervalo, fecha_inicio)
+        # Solo se descarga de Binance la parte que falta en el almacén (por ventanas si es larga)
+        datos = almacen_global.obtener(simbolo, intervalo, dias,
+                                       lambda inicio: descargar_historia(simbolo, intervalo, inicio))
     except Exception as e:
         print(f"Error obteniendo datos para {simbolo}: {e}")
         return pd.DataFrame()
 
-    columnas = ['Open Time', 'Open', 'High', 'Low', 'Close', 'Volume', 'Close Time', 'Quote Asset Volume', 'Number of Trades', 'Taker Buy Base Asset Volume', 'Taker Buy Quote Asset Volume', 'Ignore']
-    df = pd.DataFrame(klines, columns=columnas)
-    if df.empty: return df
-    
-    cols_num = ['Open', 'High', 'Low', 'Close', 'Volume']
-    for col in cols_num:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    df['Open Time'] = pd.to_datetime(df['Open Time'], unit='ms')
-    return df
-
-# --- CALCULADORAS DE INDICADORES ---
-def calcular_sma(data, length):
-    return data.rolling(window=length).mean()
-
-def calcular_rsi(data, length=14):
-    delta = data.diff()
-    gain = (delta.where(delta > 0, 0)).fillna(0)
-    loss = (-delta.where(delta < 0, 0)).fillna(0)
-    avg_gain = gain.ewm(com=length - 1, adjust=False, min_periods=length).mean()
-    avg_loss = loss.ewm(com=length - 1, adjust=False, min_periods=length).mean()
-    if avg_loss.iloc[-1] == 0: return 100.0 # Evitar división por cero si no hay pérdidas
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
-
-def calcular_indicadores(df):
-    """Añade las columnas de indicadores al DataFrame."""
-    if df is None or df.empty: return pd.DataFrame()
-    df['SMA_50'] = calcular_sma(df['Close'], 50)
-    df['SMA_200'] = calcular_sma(df['Close'], 200)
-    df['RSI_14'] = calcular_rsi(df['Close'], 14)
-    df['VOLUME_SMA_20'] = calcular_sma(df['Volume'], 20)
-    df.dropna(inplace=True)
-    df.reset_index(drop=True, inplace=True)
-    return df
+    return array_a_dataframe(datos)
 
+# --- SEÑAL DE COMPRA ---
 def verificar_senal_de_compra(df):
     """
-    Verifica si los datos cumplen con la ESTRATEGIA FLEXIBLE de tendencia alcista.
+    Verifica si los datos cumplen con la ESTRATEGIA FLEXIBLE de tendencia alcista
+    (condiciones y puntaje definidos en estrategias.py).
     """
-    if df is None or len(df) < 1:
-        return False, None
-
-    ultima_vela = df.iloc[-1]
-
-    # --- CONDICIONES FLEXIBILIZADAS ---
-    # 1. TENDENCIA: El precio está en un "estado dorado" (SMA50 por encima de SMA200).
-    cond_tendencia_alcista = ultima_vela['SMA_50'] > ultima_vela['SMA_200']
-    
-    # 2. MOMENTUM: El RSI está en un rango saludable (ni sobrevendido ni excesivamente sobrecomprado).
-    cond_rsi = 45 < ultima_vela['RSI_14'] < 80
-    
-    # 3. VOLUMEN: El volumen actual confirma el interés del mercado.
-    cond_volumen = ultima_vela['Volume'] > ultima_vela['VOLUME_SMA_20'] and ultima_vela['VOLUME_SMA_20'] > 0
-
-    if cond_tendencia_alcista and cond_rsi and cond_volumen:
-        vol_ratio = ultima_vela['Volume'] / ultima_vela['VOLUME_SMA_20']
-        score = ultima_vela['RSI_14'] * vol_ratio
-        
-        detalles = {
-            "precio_cierre": ultima_vela['Close'],
-            "rsi": ultima_vela['RSI_14'],
-            "vol_ratio": vol_ratio,
-            "score": score
-        }
-        return True, detalles
-    
-    return False, None
+    return obtener_estrategias()[0].verificar(df)
 
 # --- BLOQUE PRINCIPAL DE EJECUCIÓN ---
 if __name__ == "__main__":
     
     # Obtener configuración del usuario
-    intervalo, dias = obtener_configuracion_usuario()
+    intervalo, dias, estrategias = obtener_configuracion_usuario()
     
     # Validar configuración
     if not validar_configuracion(intervalo, dias):
         print("Configuración cancelada por el usuario.")
         exit()
     
+    if dias is None:
+        dias = dias_necesarios([intervalo], velas_necesarias(estrategias))
+        descripcion_dias = f"automático ({dias:.2f} días)"
+    else:
+        descripcion_dias = f"{dias} días"
+
     print(f"\n✅ Configuración confirmada:")
     print(f"   - Intervalo: {intervalo}")
-    print(f"   - Días de análisis: {dias}")
+    print(f"   - Días de análisis: {descripcion_dias}")
+    print(f"   - Estrategias: {', '.join(e.id for e in estrategias)}")
     
     symbols_a_analizar = obtener_simbolos_spot(quote_asset='USDT')
     if not symbols_a_analizar:
         print("No se pudo obtener la lista de símbolos. Terminando el script.")
         exit()
     
-    print(f"\nIniciando análisis con ESTRATEGIA FLEXIBLE. Esto puede tardar varios minutos...")
+    print(f"\nIniciando análisis con {', '.join(e.nombre for e in estrategias)}. Esto puede tardar varios minutos...")
     
     resultados_positivos = []
     total_symbols = len(symbols_a_analizar)
 
-    for i, symbol in enumerate(symbols_a_analizar):
-        print(f"Progreso: [{i+1}/{total_symbols}] Analizando: {symbol}", end='\r')
+    # Descarga concurrente: cada símbolo se analiza en cuanto llegan sus datos
+    descargas = descargar_en_paralelo(symbols_a_analizar, obtener_datos_historicos_binance, intervalo, dias)
+
+    for i, (symbol, df_historico) in enumerate(descargas, start=1):
+        print(f"Progreso: [{i}/{total_symbols}] Analizando: {symbol}", end='\r')
         
-        df_historico = obtener_datos_historicos_binance(symbol, intervalo, dias)
         if df_historico.empty: continue
 
-        df_con_indicadores = calcular_indicadores(df_historico.copy())
+        df_con_indicadores = calcular_indicadores_ultima_vela(df_historico, clave=(symbol, intervalo))
         
-        hay_senal, detalles = verificar_senal_de_compra(df_con_indicadores)
+        # Todas las estrategias sobre la misma descarga
+        candidatos = evaluar_simbolo(symbol, df_historico, estrategias, fila=df_con_indicadores)
         
-        if hay_senal:
-            detalles['simbolo'] = symbol
+        for detalles in candidatos:
             resultados_positivos.append(detalles)
-            print(f"\n(+) Candidato encontrado: {symbol}. Recolectando para el informe final.")
+            print(f"\n(+) Candidato encontrado: {symbol} ({detalles['estrategia']}). Recolectando para el informe final.")
 
     print("\n\nAnálisis completado. Generando informe final...")
     
     if not resultados_positivos:
         print("\n--- INFORME FINAL ---")
-        print("No se encontraron instrumentos que cumplan con los criterios de la estrategia flexible hoy.")
+        print("No se encontraron instrumentos que cumplan con los criterios de las estrategias elegidas hoy.")
         print("El mercado puede estar en una fase de baja volatilidad o tendencia bajista. Inténtalo más tarde.")
     else:
         resultados_ordenados = sorted(resultados_positivos, key=lambda x: x['score'], reverse=True)
         df_resultados = pd.DataFrame(resultados_ordenados)
-        df_resultados = df_resultados[['simbolo', 'score', 'precio_cierre', 'rsi', 'vol_ratio']]
+        df_resultados = df_resultados[['simbolo', 'estrategia', 'score', 'precio_cierre', 'rsi', 'vol_ratio']]
 
-        print("\n--- MEJORES INSTRUMENTOS ENCONTRADOS (Estrategia Flexible) ---")
-        print(f"Configuración: {intervalo} - {dias} días")
+        print(f"\n--- MEJORES INSTRUMENTOS ENCONTRADOS ({', '.join(e.nombre for e in estrategias)}) ---")
+        print(f"Configuración: {intervalo} - {descripcion_dias}")
         print(df_resultados.to_string(index=False))
         
         try:
-            nombre_archivo = f"analisis_binance_{intervalo}_{dias}dias_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.csv"
-            df_resultados.to_csv(nombre_archivo, index=False, float_format='%.2f')
-            print(f"\n✅ Resultados exportados exitosamente a: {nombre_archivo}")
+            ejecucion_id = obtener_almacen_resultados().guardar_ejecucion(
+                df_resultados.to_dict('records'), intervalo, 'todos', dias)
+            print(f"\n✅ Resultados guardados (ejecución {ejecucion_id}) en {RUTA_RESULTADOS}")
         except Exception as e:
-            print(f"\n❌ Ocurrió un error al exportar a CSV: {e}")
\ No newline at end of file
+            print(f"\n❌ Ocurrió un error al guardar los resultados: {e}")
\ No newline at end of file
@@ -0,0 +1,250 @@
+# metricas.py
+
+import bisect
+import heapq
+import threading
+import time
+from contextlib import contextmanager
+
+# --- CONFIGURACIÓN DE LAS MÉTRICAS ---
+LIMITES_DESCARGA = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)          # Segundos por símbolo
+LIMITES_ETAPA = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)        # Segundos por etapa y escaneo
+LIMITES_SIMBOLOS_POR_SEGUNDO = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+SIMBOLOS_MAS_LENTOS = 10  # Cuántos símbolos lentos se incluyen en el resumen final de un escaneo
+
+
+def _formatear(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    """Contador monótono (tipo counter de Prometheus)."""
+
+    def __init__(self, nombre, ayuda):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self._valor = 0
+        self._lock = threading.Lock()
+
+    def incrementar(self, valor=1):
+        with self._lock:
+            self._valor += valor
+
+    def exponer(self):
+        with self._lock:
+            valor = self._valor
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter",
+                f"{self.nombre} {_formatear(valor)}"]
+
+
+class Histograma:
+    """Histograma acumulativo (tipo histogram de Prometheus), opcionalmente con una etiqueta."""
+
+    def __init__(self, nombre, ayuda, limites, etiqueta=None):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.limites = tuple(limites)
+        self.etiqueta = etiqueta
+        self._series = {}  # valor de la etiqueta -> [cuentas por cubo, suma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, valor_etiqueta=None):
+        posicion = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(valor_etiqueta)
+            if serie is None:
+                serie = self._series[valor_etiqueta] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            serie[0][posicion] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = {clave: (list(cuentas), suma, total) for clave, (cuentas, suma, total) in self._series.items()}
+        for valor_etiqueta, (cuentas, suma, total) in sorted(series.items(), key=lambda x: str(x[0])):
+            etiqueta = f'{self.etiqueta}="{valor_etiqueta}",' if self.etiqueta else ''
+            acumulado = 0
+            for limite, cuenta in zip(self.limites + (float('inf'),), cuentas):
+                acumulado += cuenta
+                lineas.append(f'{self.nombre}_bucket{{{etiqueta}le="{_formatear(limite)}"}} {acumulado}')
+            sufijo = f'{{{etiqueta.rstrip(",")}}}' if etiqueta else ''
+            lineas.append(f"{self.nombre}_sum{sufijo} {_formatear(suma)}")
+            lineas.append(f"{self.nombre}_count{sufijo} {total}")
+        return lineas
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._metricas = []
+
+    def registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def exponer(self):
+        """Formato de texto de Prometheus (versión 0.0.4)."""
+        lineas = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.exponer())
+        return "\n".join(lineas) + "\n"
+
+
+# Métricas del proceso (las expone /metrics)
+metricas_global = RegistroMetricas()
+duracion_descarga = metricas_global.registrar(Histograma(
+    'escaner_descarga_simbolo_segundos', 'Latencia de descarga de velas por símbolo.', LIMITES_DESCARGA))
+duracion_etapa = metricas_global.registrar(Histograma(
+    'escaner_etapa_segundos', 'Duración de cada etapa por escaneo.', LIMITES_ETAPA, etiqueta='etapa'))
+simbolos_por_segundo = metricas_global.registrar(Histograma(
+    'escaner_simbolos_por_segundo', 'Símbolos procesados por segundo en cada escaneo.', LIMITES_SIMBOLOS_POR_SEGUNDO))
+escaneos_totales = metricas_global.registrar(Contador(
+    'escaner_escaneos_total', 'Escaneos terminados.'))
+bytes_descargados = metricas_global.registrar(Contador(
+    'escaner_bytes_descargados_total', 'Bytes recibidos de la API de Binance.'))
+velas_procesadas = metricas_global.registrar(Contador(
+    'escaner_velas_descargadas_total', 'Velas devueltas por las descargas (almacén + Binance).'))
+reintentos_http = metricas_global.registrar(Contador(
+    'escaner_reintentos_total', 'Reintentos HTTP (429 y errores transitorios).'))
+espera_limite = metricas_global.registrar(Contador(
+    'escaner_espera_limite_segundos_total', 'Tiempo esperando al limitador de peso de Binance.'))
+
+
+# Medición del escaneo que se está ejecutando en cada hilo (los hilos de descarga la activan)
+_contexto = threading.local()
+
+
+class MedicionEscaneo:
+    """
+    Tiempos y volúmenes de un escaneo. Las etapas anidadas no se cuentan dos veces: el tiempo
+    de una etapa interna se descuenta de la que la contiene. Las etapas que corren en los hilos
+    de descarga ('dataframe') suman el tiempo de todos los hilos.
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas = {}
+        self.bytes = 0
+        self.filas = 0
+        self.reintentos = 0
+        self.espera_limite = 0.0
+        self.simbolos = 0    # Símbolos procesados (incluidos los que salen de la cache de descargas)
+        self.descargas = {}  # símbolo -> segundos de las descargas reales
+        self._lock = threading.Lock()
+        self._pila = threading.local()
+
+    def sumar_etapa(self, nombre, segundos):
+        with self._lock:
+            self.etapas[nombre] = self.etapas.get(nombre, 0.0) + segundos
+
+    @contextmanager
+    def etapa(self, nombre):
+        pila = self._pila.__dict__.setdefault('etapas', [])
+        pila.append(0.0)  # Tiempo de las etapas hijas
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracion = time.perf_counter() - inicio
+            hijas = pila.pop()
+            if pila:
+                pila[-1] += duracion
+            self.sumar_etapa(nombre, duracion - hijas)
+
+    def sumar(self, **valores):
+        with self._lock:
+            for clave, valor in valores.items():
+                setattr(self, clave, getattr(self, clave) + valor)
+
+    def registrar_descarga(self, simbolo, segundos):
+        with self._lock:
+            self.descargas[simbolo] = segundos
+
+    def resumen(self, detalle=False):
+        """Diccionario para el estado del trabajo (`detalle` añade los símbolos más lentos)."""
+        with self._lock:
+            transcurrido = time.perf_counter() - self.inicio
+            resumen = {
+                'elapsed_seconds': transcurrido,
+                'stages_seconds': dict(self.etapas),
+                'symbols_processed': self.simbolos,
+                'symbols_fetched': len(self.descargas),
+                'symbols_per_second': self.simbolos / transcurrido if transcurrido else 0.0,
+                'bytes_fetched': self.bytes,
+                'rows_processed': self.filas,
+                'retries': self.reintentos,
+                'rate_limit_wait_seconds': self.espera_limite,
+            }
+            if detalle:
+                lentos = heapq.nlargest(SIMBOLOS_MAS_LENTOS, self.descargas.items(), key=lambda x: x[1])
+                resumen['slowest_symbols'] = [[simbolo, segundos] for simbolo, segundos in lentos]
+        return resumen
+
+    def finalizar(self):
+        """Vuelca las etapas y el rendimiento del escaneo en las métricas del proceso."""
+        resumen = self.resumen(detalle=True)
+        for nombre, segundos in resumen['stages_seconds'].items():
+            duracion_etapa.observar(segundos, nombre)
+        if resumen['symbols_processed']:
+            simbolos_por_segundo.observar(resumen['symbols_per_second'])
+        escaneos_totales.incrementar()
+        return resumen
+
+
+def medicion_actual():
+    return getattr(_contexto, 'medicion', None)
+
+
+@contextmanager
+def activar_medicion(medicion):
+    """Asocia `medicion` al hilo actual mientras dure el bloque."""
+    anterior = medicion_actual()
+    _contexto.medicion = medicion
+    try:
+        yield
+    finally:
+        _contexto.medicion = anterior
+
+
+@contextmanager
+def cronometrar(nombre):
+    """Etapa de la medición activa en este hilo (no hace nada si no hay ninguna)."""
+    medicion = medicion_actual()
+    if medicion is None:
+        yield
+        return
+    with medicion.etapa(nombre):
+        yield
+
+
+def registrar_descarga(simbolo, segundos, filas):
+    duracion_descarga.observar(segundos)
+    velas_procesadas.incrementar(filas)
+    medicion = medicion_actual()
+    if medicion is not None:
+        medicion.registrar_descarga(simbolo, segundos)
+
+
+def registrar_espera(segundos):
+    if not segundos:
+        return
+    espera_limite.incrementar(segundos)
+    medicion = medicion_actual()
+    if medicion is not None:
+        medicion.sumar(espera_limite=segundos)
+
+
+def registrar_respuesta(respuesta, *args, **kwargs):
+    """Hook de requests para las sesiones de Binance: bytes recibidos y reintentos de urllib3."""
+    num_bytes = len(respuesta.content or b'')
+    reintentos = getattr(respuesta.raw, 'retries', None)
+    num_reintentos = len(reintentos.history) if reintentos is not None else 0
+    bytes_descargados.incrementar(num_bytes)
+    if num_reintentos:
+        reintentos_http.incrementar(num_reintentos)
+    medicion = medicion_actual()
+    if medicion is not None:
+        medicion.sumar(bytes=num_bytes, reintentos=num_reintentos)
+    return respuesta
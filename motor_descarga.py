@@ -0,0 +1,177 @@
+# motor_descarga.py
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+from metricas import activar_medicion, registrar_descarga
+from parser_klines import intervalo_a_ms
+
+# --- CONFIGURACIÓN DEL MOTOR DE DESCARGA ---
+# Binance limita el peso de las peticiones por IP (REQUEST_WEIGHT, ventana de 1 minuto).
+PESO_MAXIMO_POR_MINUTO = 6000
+# Dejamos margen para otras llamadas del proceso (exchange info, tickers, etc.).
+FRACCION_PESO_UTILIZABLE = 0.8
+MAX_PETICIONES_SIMULTANEAS = 8
+
+PESO_KLINES = 2            # Peso de cada llamada a /api/v3/klines (lo reserva cada página en cliente_binance)
+VELAS_POR_PETICION = 1000  # Máximo de velas que devuelve cada llamada
+# Hasta aquí se descarga de una vez; los rangos más largos van por ventanas (descarga_historica)
+MAX_PAGINAS_DESCARGA_DIRECTA = 5
+TTL_CACHE_DESCARGAS = 120  # Segundos que se reutiliza una descarga entre escaneos
+
+MS_POR_DIA = 24 * 60 * 60 * 1000
+
+
+class LimitadorPeso:
+    """
+    Limitador de ventana deslizante para el peso de petición de Binance.
+    Es seguro usarlo desde varios hilos: cada hilo reserva su peso antes de llamar a la API
+    y espera si la ventana del último minuto ya está llena.
+    """
+
+    def __init__(self, peso_por_minuto, ventana_segundos=60.0):
+        self.peso_por_minuto = peso_por_minuto
+        self.ventana_segundos = ventana_segundos
+        self._consumos = deque()  # (instante, peso)
+        self._peso_en_ventana = 0
+        self._lock = threading.Lock()
+
+    def adquirir(self, peso):
+        """
+        Bloquea hasta que haya peso disponible en la ventana actual y lo reserva.
+        Devuelve los segundos que ha tenido que esperar.
+        """
+        inicio = time.monotonic()
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                while self._consumos and ahora - self._consumos[0][0] >= self.ventana_segundos:
+                    _, peso_antiguo = self._consumos.popleft()
+                    self._peso_en_ventana -= peso_antiguo
+
+                # Una petición más pesada que todo el presupuesto pasa sola cuando la ventana está vacía
+                if self._peso_en_ventana + peso <= self.peso_por_minuto or not self._consumos:
+                    self._consumos.append((ahora, peso))
+                    self._peso_en_ventana += peso
+                    return ahora - inicio
+
+                espera = self.ventana_segundos - (ahora - self._consumos[0][0])
+            time.sleep(max(espera, 0.01))
+
+
+# Limitador compartido por todos los escaneos del proceso
+limitador_global = LimitadorPeso(int(PESO_MAXIMO_POR_MINUTO * FRACCION_PESO_UTILIZABLE))
+
+
+class CacheDescargas:
+    """
+    Cache en memoria de descargas por (símbolo, intervalo, días), de vuelo único: si dos escaneos
+    piden el mismo símbolo a la vez, solo uno descarga y el otro espera ese mismo resultado.
+    Los resultados se reutilizan durante `ttl` segundos. Los DataFrames se comparten, así que
+    quien los use no debe modificarlos.
+    """
+
+    def __init__(self, ttl=TTL_CACHE_DESCARGAS):
+        self.ttl = ttl
+        self._entradas = {}  # clave -> (futuro, instante_fin)
+        self._lock = threading.Lock()
+
+    def _purgar(self, ahora):
+        caducadas = [clave for clave, (futuro, fin) in self._entradas.items()
+                     if futuro.done() and ahora - fin >= self.ttl]
+        for clave in caducadas:
+            del self._entradas[clave]
+
+    def obtener(self, clave, funcion):
+        """Devuelve el resultado de `funcion()` para `clave`, ejecutándola solo si no hay uno vigente."""
+        with self._lock:
+            ahora = time.monotonic()
+            self._purgar(ahora)
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                futuro = entrada[0]
+                propietario = False
+            else:
+                futuro = Future()
+                self._entradas[clave] = (futuro, float('inf'))
+                propietario = True
+
+        if not propietario:
+            return futuro.result()
+
+        try:
+            resultado = funcion()
+        except BaseException as e:
+            with self._lock:
+                self._entradas.pop(clave, None)  # Los errores no se guardan
+            futuro.set_exception(e)
+            raise
+        with self._lock:
+            if resultado is None or getattr(resultado, 'empty', False):
+                self._entradas.pop(clave, None)  # Las descargas vacías (errores de red) tampoco
+            else:
+                self._entradas[clave] = (futuro, time.monotonic())
+        futuro.set_result(resultado)
+        return resultado
+
+
+def dias_para_velas(intervalo, velas):
+    """
+    Días (con decimales) que cubren las últimas `velas` velas de `intervalo`, incluida la que
+    está abierta. 1M, sin duración fija, cuenta como 31 días.
+    """
+    return velas * (intervalo_a_ms(intervalo) or 31 * MS_POR_DIA) / MS_POR_DIA
+
+
+def descargar_en_paralelo(simbolos, funcion_descarga, intervalo, dias,
+                          max_peticiones=MAX_PETICIONES_SIMULTANEAS, continuar=None,
+                          executor=None, cache=None, medicion=None):
+    """
+    Descarga los datos históricos de varios símbolos manteniendo como máximo
+    `max_peticiones` descargas en curso.
+
+    Es un generador: devuelve (simbolo, df) en cuanto termina cada descarga, de modo que
+    el cálculo de indicadores puede empezar sin esperar al resto del universo.
+    `continuar` es una función opcional; si devuelve False se cancelan las descargas pendientes.
+    Si se pasa `executor` se usa ese pool (compartido entre escaneos) en lugar de crear uno propio,
+    y con `cache` (CacheDescargas) los escaneos que comparten símbolos reutilizan la misma descarga.
+    Con `medicion` (metricas.MedicionEscaneo) se registran latencias, velas, bytes y esperas del escaneo.
+    El peso de Binance no se reserva aquí sino en cada página (cliente_binance.descargar_klines).
+    """
+    def descargar(simbolo):
+        with activar_medicion(medicion):
+            inicio = time.perf_counter()
+            df = funcion_descarga(simbolo, intervalo, dias)
+            registrar_descarga(simbolo, time.perf_counter() - inicio, len(df) if df is not None else 0)
+            return df
+
+    def tarea(simbolo):
+        if continuar is not None and not continuar():
+            return None
+        if cache is None:
+            return descargar(simbolo)
+        # Solo las descargas reales consumen peso; los aciertos de cache no
+        return cache.obtener((simbolo, intervalo, dias), lambda: descargar(simbolo))
+
+    executor_propio = executor is None
+    if executor_propio:
+        executor = ThreadPoolExecutor(max_workers=max_peticiones, thread_name_prefix='descarga')
+    futuros = {}
+    try:
+        futuros = {executor.submit(tarea, simbolo): simbolo for simbolo in simbolos}
+        for futuro in as_completed(futuros):
+            if continuar is not None and not continuar():
+                break
+            df = futuro.result()
+            if df is None:
+                continue
+            yield futuros[futuro], df
+    finally:
+        if executor_propio:
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            # En un pool compartido solo se cancelan las tareas propias que no han empezado
+            for futuro in futuros:
+                futuro.cancel()
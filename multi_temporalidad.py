@@ -0,0 +1,121 @@
+# multi_temporalidad.py
+
+import numpy as np
+import pandas as pd
+
+from parser_klines import intervalo_a_ms
+from motor_descarga import dias_para_velas
+from estrategias import (calcular_indicadores, columnas_necesarias, evaluar_panel, obtener_estrategias,
+                         velas_necesarias)
+from panel_indicadores import construir_panel
+
+MIN_TEMPORALIDADES = 2  # Temporalidades con señal a la vez para considerar que hay confluencia
+
+MS_POR_DIA = 24 * 60 * 60 * 1000
+# Las velas semanales de Binance empiezan el lunes; el 1/1/1970 fue jueves
+DESPLAZAMIENTO_SEMANAL = 4 * MS_POR_DIA
+
+
+def duracion_intervalo(intervalo):
+    """Duración en ms; 1M (sin duración fija) cuenta como 31 días para ordenar."""
+    return intervalo_a_ms(intervalo) or 31 * MS_POR_DIA
+
+
+def ordenar_intervalos(intervalos):
+    """Intervalos sin repetir, del más fino al más grueso."""
+    return sorted(dict.fromkeys(intervalos), key=duracion_intervalo)
+
+
+def dias_necesarios(intervalos, velas=None):
+    """
+    Días mínimos de historia para evaluar la señal en todos los `intervalos`: las `velas` que piden
+    los indicadores (por defecto los de la estrategia flexible) en el más grueso, más una si se
+    remuestrea (el primer grupo puede quedar a medias).
+    """
+    intervalos = ordenar_intervalos(intervalos)
+    velas = velas or velas_necesarias(obtener_estrategias())
+    return dias_para_velas(intervalos[-1], velas + (1 if len(intervalos) > 1 else 0))
+
+
+def _inicio_de_grupo(open_time_ms, intervalo):
+    """Open Time (ms) de la vela de `intervalo` a la que pertenece cada vela base."""
+    if intervalo == '1M':
+        meses = open_time_ms.astype('datetime64[ms]').astype('datetime64[M]')
+        return meses.astype('datetime64[ms]').astype(np.int64)
+    duracion = intervalo_a_ms(intervalo)
+    desplazamiento = DESPLAZAMIENTO_SEMANAL if intervalo == '1w' else 0
+    return (open_time_ms - desplazamiento) // duracion * duracion + desplazamiento
+
+
+def remuestrear_klines(df, intervalo_base, intervalo_destino):
+    """
+    Agrega velas de `intervalo_base` en velas de `intervalo_destino` (Open primero, High máximo,
+    Low mínimo, Close último, Volume suma). Se descarta el primer grupo si la historia empieza a
+    mitad de vela; el último se conserva aunque no haya cerrado, igual que la última kline de Binance.
+    """
+    if df.empty or intervalo_destino == intervalo_base:
+        return df
+
+    open_time = df['Open Time'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+    grupo = _inicio_de_grupo(open_time, intervalo_destino)
+    cortes = np.flatnonzero(np.diff(grupo)) + 1
+    inicios = np.concatenate(([0], cortes))
+    if grupo[0] != open_time[0]:
+        inicios = inicios[1:]  # Primer grupo incompleto
+    if len(inicios) == 0:
+        return df.iloc[0:0]
+    finales = np.concatenate((inicios[1:], [len(df)])) - 1
+
+    remuestreado = pd.DataFrame({
+        'Open Time': pd.to_datetime(grupo[inicios], unit='ms'),
+        'Open': df['Open'].to_numpy(dtype=float)[inicios],
+        'High': np.maximum.reduceat(df['High'].to_numpy(dtype=float), inicios),
+        'Low': np.minimum.reduceat(df['Low'].to_numpy(dtype=float), inicios),
+        'Close': df['Close'].to_numpy(dtype=float)[finales],
+        'Volume': np.add.reduceat(df['Volume'].to_numpy(dtype=float), inicios),
+    })
+    if 'Close Time' in df:
+        remuestreado['Close Time'] = df['Close Time'].to_numpy()[finales]
+    return remuestreado
+
+
+def evaluar_temporalidades(datos_por_simbolo, intervalo_base, intervalos, min_temporalidades=MIN_TEMPORALIDADES,
+                           estrategias=None):
+    """
+    Evalúa la señal de cada estrategia (por defecto la flexible) en cada intervalo a partir de una
+    única descarga en `intervalo_base`; los indicadores de cada intervalo se calculan una vez.
+
+    Devuelve (confluencias, senales_por_intervalo): `confluencias` tiene un resultado por símbolo
+    y estrategia con señal en al menos `min_temporalidades` intervalos; su puntaje es la suma de
+    los puntajes y el precio, RSI y ratio de volumen son los del intervalo más fino con señal.
+    """
+    estrategias = estrategias or obtener_estrategias()
+    columnas = columnas_necesarias(estrategias)
+    senales_por_intervalo = {}
+    for intervalo in ordenar_intervalos(intervalos):
+        datos = {simbolo: remuestrear_klines(df, intervalo_base, intervalo)
+                 for simbolo, df in datos_por_simbolo.items()}
+        panel = calcular_indicadores(construir_panel(datos, columnas), estrategias)
+        senales_por_intervalo[intervalo] = evaluar_panel(panel, estrategias)
+
+    por_simbolo = {}
+    for intervalo, senales in senales_por_intervalo.items():
+        for detalles in senales:
+            por_simbolo.setdefault((detalles['estrategia'], detalles['simbolo']), []).append((intervalo, detalles))
+
+    confluencias = []
+    for (estrategia, simbolo), senales in por_simbolo.items():
+        if len(senales) < min_temporalidades:
+            continue
+        _, mas_fina = senales[0]
+        confluencias.append({
+            'simbolo': simbolo,
+            'estrategia': estrategia,
+            'score': sum(detalles['score'] for _, detalles in senales),
+            'precio_cierre': mas_fina.get('precio_cierre'),
+            'rsi': mas_fina.get('rsi'),
+            'vol_ratio': mas_fina.get('vol_ratio'),
+            'temporalidades': ','.join(intervalo for intervalo, _ in senales),
+            'num_temporalidades': len(senales),
+        })
+    return confluencias, senales_por_intervalo
@@ -0,0 +1,167 @@
+# optimizador.py
+#
+# Barrido de parámetros de la estrategia (SMA rápida, SMA lenta, banda de RSI y ventana de
+# volumen) sobre las velas del almacén local, repartido entre varios procesos.
+#
+# Uso: python optimizador.py [intervalo] [procesos] [desde]
+#      (con `desde`, la historia que falte en el almacén se descarga como en backtest.py)
+
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest import (COLUMNAS_BACKTEST, COMISION, STOP_LOSS, TAKE_PROFIT, VELAS_MANTENIMIENTO,
+                      cargar_panel_almacen, cargar_panel_historia, resumir_operaciones, simular_operaciones)
+from panel_indicadores import RSI_PERIODO, mascara_senal, rsi_panel, sma_panel
+
+# --- CONFIGURACIÓN DEL BARRIDO ---
+REJILLA_POR_DEFECTO = {
+    'sma_rapida': [20, 50, 100],
+    'sma_lenta': [100, 150, 200],
+    'rsi': [(40, 80), (45, 80), (50, 75), (55, 70)],
+    'volumen': [10, 20, 30],
+}
+METRICA_ORDEN = 'retorno_cartera'
+COMBINACIONES_POR_TAREA = 4  # Se envían varias combinaciones por tarea para amortizar el IPC
+
+# Datos del proceso trabajador: {nombre: array}, más el panel y la configuración del backtest
+_series = {}
+_panel = None
+_config_backtest = {}
+_memorias = []
+
+
+def combinaciones_rejilla(rejilla):
+    """Combinaciones (rapida, lenta, rsi_min, rsi_max, ventana_volumen) válidas de la rejilla."""
+    return [(rapida, lenta, rsi_min, rsi_max, volumen)
+            for rapida, lenta, (rsi_min, rsi_max), volumen in itertools.product(
+                rejilla['sma_rapida'], rejilla['sma_lenta'], rejilla['rsi'], rejilla['volumen'])
+            if rapida < lenta]
+
+
+def calcular_series_compartidas(panel, combinaciones):
+    """
+    Calcula una sola vez cada serie que usan las combinaciones: una SMA por longitud distinta,
+    una SMA de volumen por ventana distinta y el RSI (la banda no cambia la serie).
+    """
+    series = {columna: panel[columna] for columna in COLUMNAS_BACKTEST}
+    for longitud in sorted({c[0] for c in combinaciones} | {c[1] for c in combinaciones}):
+        series[f'SMA_{longitud}'] = sma_panel(panel['Close'], longitud)
+    for ventana in sorted({c[4] for c in combinaciones}):
+        series[f'VOLUME_SMA_{ventana}'] = sma_panel(panel['Volume'], ventana)
+    series['RSI'] = rsi_panel(panel['Close'], RSI_PERIODO, historico=True)
+    return series
+
+
+def _publicar_series(series):
+    """Copia cada serie a un bloque de memoria compartida; devuelve (bloques, descriptores)."""
+    bloques = []
+    descriptores = {}
+    for nombre, valores in series.items():
+        bloque = shared_memory.SharedMemory(create=True, size=max(valores.nbytes, 1))
+        np.ndarray(valores.shape, dtype=valores.dtype, buffer=bloque.buf)[...] = valores
+        bloques.append(bloque)
+        descriptores[nombre] = (bloque.name, valores.shape, valores.dtype.str)
+    return bloques, descriptores
+
+
+def _inicializar_trabajador(descriptores, simbolos, config_backtest):
+    """Conecta el proceso trabajador a los bloques compartidos sin copiar los datos."""
+    for nombre, (nombre_bloque, forma, dtype) in descriptores.items():
+        bloque = shared_memory.SharedMemory(name=nombre_bloque)
+        _memorias.append(bloque)  # Mantiene el bloque mapeado mientras viva el trabajador
+        _series[nombre] = np.ndarray(forma, dtype=np.dtype(dtype), buffer=bloque.buf)
+    _preparar(simbolos, config_backtest)
+
+
+def _preparar(simbolos, config_backtest):
+    global _panel, _config_backtest
+    _panel = {columna: _series[columna] for columna in COLUMNAS_BACKTEST}
+    _panel['simbolos'] = simbolos
+    _config_backtest = config_backtest
+
+
+def _evaluar(combinaciones):
+    """Backtest de un grupo de combinaciones con las series ya calculadas."""
+    filas = []
+    for rapida, lenta, rsi_min, rsi_max, volumen in combinaciones:
+        senales = mascara_senal(_series['Close'], _series['Volume'], _series[f'SMA_{rapida}'],
+                                _series[f'SMA_{lenta}'], _series['RSI'], _series[f'VOLUME_SMA_{volumen}'],
+                                rsi_min, rsi_max)
+        operaciones = simular_operaciones(_panel, senales, **_config_backtest)
+        _, agregado = resumir_operaciones(_panel, operaciones)
+        filas.append({'sma_rapida': rapida, 'sma_lenta': lenta, 'rsi_min': rsi_min, 'rsi_max': rsi_max,
+                      'volumen_sma': volumen, **agregado})
+    return filas
+
+
+def barrer_parametros(panel, rejilla=None, procesos=None, velas_mantenimiento=VELAS_MANTENIMIENTO,
+                      stop_loss=STOP_LOSS, take_profit=TAKE_PROFIT, comision=COMISION, metrica=METRICA_ORDEN):
+    """
+    Evalúa todas las combinaciones de la rejilla y devuelve un DataFrame ordenado por `metrica`.
+    `panel` debe estar alineado por fechas (cargar_panel_almacen) para que la cartera compare
+    los símbolos en la misma vela.
+
+    Las series se calculan una vez en el proceso principal y los trabajadores las leen de
+    memoria compartida, así que los datos no se serializan en cada tarea.
+    """
+    rejilla = rejilla if rejilla is not None else REJILLA_POR_DEFECTO
+    procesos = procesos or os.cpu_count() or 1
+    combinaciones = combinaciones_rejilla(rejilla)
+    config_backtest = {'velas_mantenimiento': velas_mantenimiento, 'stop_loss': stop_loss,
+                       'take_profit': take_profit, 'comision': comision}
+    series = calcular_series_compartidas(panel, combinaciones)
+    grupos = [combinaciones[i:i + COMBINACIONES_POR_TAREA]
+              for i in range(0, len(combinaciones), COMBINACIONES_POR_TAREA)]
+
+    filas = []
+    if procesos == 1 or len(grupos) <= 1:
+        # En un solo proceso no hace falta memoria compartida
+        _series.clear()
+        _series.update(series)
+        _preparar(panel['simbolos'], config_backtest)
+        for grupo in grupos:
+            filas.extend(_evaluar(grupo))
+    else:
+        bloques, descriptores = _publicar_series(series)
+        try:
+            with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_trabajador,
+                                     initargs=(descriptores, panel['simbolos'], config_backtest)) as executor:
+                for resultado in executor.map(_evaluar, grupos):
+                    filas.extend(resultado)
+        finally:
+            for bloque in bloques:
+                bloque.close()
+                bloque.unlink()
+
+    ranking = pd.DataFrame(filas)
+    if ranking.empty:
+        return ranking
+    return ranking.sort_values(metrica, ascending=False).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    intervalo = sys.argv[1] if len(sys.argv) > 1 else '1d'
+    procesos = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2] else None
+    desde = sys.argv[3] if len(sys.argv) > 3 else None
+
+    panel = cargar_panel_almacen(intervalo) if desde is None else cargar_panel_historia(intervalo, desde)
+    if not panel['simbolos']:
+        print(f"❌ No hay velas de {intervalo} en el almacén. Ejecuta antes un escaneo con ese intervalo.")
+        sys.exit(1)
+
+    combinaciones = combinaciones_rejilla(REJILLA_POR_DEFECTO)
+    print(f"Barrido de {len(combinaciones)} combinaciones sobre {len(panel['simbolos'])} símbolos "
+          f"× {panel['Close'].shape[1]} velas de {intervalo}...")
+    ranking = barrer_parametros(panel, procesos=procesos)
+
+    print(ranking.head(20).to_string(index=False, float_format='%.4f'))
+    nombre_archivo = f"optimizacion_{intervalo}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.csv"
+    ranking.to_csv(nombre_archivo, index=False, float_format='%.4f')
+    print(f"\nRanking completo guardado en {nombre_archivo}")
@@ -0,0 +1,143 @@
+# panel_indicadores.py
+
+import numpy as np
+
+# Ventanas de la estrategia flexible
+SMA_RAPIDA = 50
+SMA_LENTA = 200
+RSI_PERIODO = 14
+VOLUMEN_SMA = 20
+# Periodos de RSI que se descargan además de la ventana más larga: el RSI de Wilder arranca en
+# la primera vela y su valor inicial pesa (1 - 1/14)^n, despreciable tras unas decenas de velas
+MARGEN_CONVERGENCIA_RSI = 5
+
+
+def _open_time_ms(df):
+    """'Open Time' en ms, venga como datetime (DataFrame) o como entero (array del almacén)."""
+    open_time = np.asarray(df['Open Time'])
+    if np.issubdtype(open_time.dtype, np.datetime64):
+        return open_time.astype('datetime64[ms]').astype(np.int64)
+    return open_time.astype(np.int64)
+
+
+def construir_panel(datos_por_simbolo, columnas=('Close', 'Volume'), por_tiempo=False):
+    """
+    Alinea las `columnas` de todos los símbolos en matrices (símbolos × tiempo).
+
+    `datos_por_simbolo` es un dict {simbolo: DataFrame o array estructurado de almacen_klines}.
+    Por defecto las series se alinean por la derecha (la última columna es la última vela de
+    cada símbolo) y se rellenan con NaN por la izquierda, así cada fila reproduce exactamente la
+    serie que procesaría el camino por símbolo; es lo que necesita el escaneo de la última vela.
+
+    Con `por_tiempo=True` cada columna es un 'Open Time' de la unión de todos los símbolos
+    (guardada en panel['Open Time']) y las velas que le faltan a un símbolo (antes de su
+    listado, huecos o después de su baja) quedan a NaN. Es lo que necesita el backtest, que
+    compara símbolos en la misma fecha.
+    """
+    simbolos = [s for s, df in datos_por_simbolo.items() if df is not None and len(df)]
+
+    panel = {'simbolos': simbolos}
+    if por_tiempo:
+        tiempos = {s: _open_time_ms(datos_por_simbolo[s]) for s in simbolos}
+        open_time = (np.unique(np.concatenate(list(tiempos.values()))) if simbolos
+                     else np.empty(0, dtype=np.int64))
+        panel['Open Time'] = open_time
+        largo = len(open_time)
+    else:
+        largo = max((len(datos_por_simbolo[s]) for s in simbolos), default=0)
+
+    for columna in columnas:
+        panel[columna] = np.full((len(simbolos), largo), np.nan)
+    for i, simbolo in enumerate(simbolos):
+        df = datos_por_simbolo[simbolo]
+        posiciones = (np.searchsorted(open_time, tiempos[simbolo]) if por_tiempo
+                      else slice(largo - len(df), None))
+        for columna in columnas:
+            panel[columna][i, posiciones] = np.asarray(df[columna], dtype=float)
+
+    return panel
+
+
+def sma_panel(valores, length):
+    """SMA por filas con sumas acumuladas; NaN si la ventana no está completa (igual que rolling().mean())."""
+    filas, columnas = valores.shape
+    resultado = np.full((filas, columnas), np.nan)
+    if columnas < length:
+        return resultado
+
+    validos = ~np.isnan(valores)
+    suma = np.zeros((filas, columnas + 1))
+    cuenta = np.zeros((filas, columnas + 1), dtype=np.int64)
+    np.cumsum(np.where(validos, valores, 0.0), axis=1, out=suma[:, 1:])
+    np.cumsum(validos, axis=1, out=cuenta[:, 1:])
+
+    suma_ventana = suma[:, length:] - suma[:, :-length]
+    cuenta_ventana = cuenta[:, length:] - cuenta[:, :-length]
+    resultado[:, length - 1:] = np.where(cuenta_ventana == length, suma_ventana / length, np.nan)
+    return resultado
+
+
+def rsi_panel(close, length=14, historico=False):
+    """
+    RSI de Wilder por filas. La recursión de la media exponencial avanza columna a columna,
+    pero cada paso opera sobre todos los símbolos a la vez.
+
+    Por defecto replica el RSI de referencia con pandas (ewm), que solo mira la última vela. Con `historico=True` el RSI
+    vale 100 en cada vela sin pérdidas medias, que es lo que necesita el backtest.
+    """
+    filas, columnas = close.shape
+    resultado = np.full((filas, columnas), np.nan)
+    if columnas == 0:
+        return resultado
+
+    delta = np.diff(close, axis=1, prepend=np.nan)
+    ganancia = np.where(delta > 0, delta, 0.0)
+    perdida = np.where(delta < 0, -delta, 0.0)
+
+    # El relleno por la izquierda tiene ganancia/pérdida 0, así que arrancar la recursión en la
+    # columna 0 con media 0 equivale a arrancarla en la primera vela de cada símbolo.
+    alpha = 1.0 / length
+    media_ganancia = np.empty((filas, columnas))
+    media_perdida = np.empty((filas, columnas))
+    media_ganancia[:, 0] = ganancia[:, 0]
+    media_perdida[:, 0] = perdida[:, 0]
+    for t in range(1, columnas):
+        media_ganancia[:, t] = (1 - alpha) * media_ganancia[:, t - 1] + alpha * ganancia[:, t]
+        media_perdida[:, t] = (1 - alpha) * media_perdida[:, t - 1] + alpha * perdida[:, t]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = media_ganancia / media_perdida
+        resultado = 100 - (100 / (1 + rs))
+
+    # min_periods: las primeras `length - 1` velas de cada símbolo no tienen RSI
+    inicio = np.argmax(~np.isnan(close), axis=1)
+    inicio[np.isnan(close).all(axis=1)] = columnas
+    columnas_idx = np.arange(columnas)
+    validas = columnas_idx[None, :] >= (inicio + length - 1)[:, None]
+    resultado[~validas] = np.nan
+
+    if historico:
+        resultado[validas & (media_perdida == 0)] = 100.0
+        return resultado
+
+    # Igual que la referencia: si la última media de pérdidas es 0 el RSI es 100
+    sin_perdidas = media_perdida[:, -1] == 0
+    resultado[sin_perdidas] = 100.0
+    return resultado
+
+
+def mascara_senal(close, volume, sma_50, sma_200, rsi, volume_sma, rsi_min=45, rsi_max=80):
+    """
+    ESTRATEGIA FLEXIBLE como máscara booleana sobre toda la historia (matrices símbolos ×
+    tiempo), con la banda de RSI como parámetro para el barrido del optimizador.
+    """
+    # Equivalente al dropna() del camino por símbolo: la vela debe tener todos los valores
+    completos = ~(np.isnan(close) | np.isnan(volume) | np.isnan(sma_50) | np.isnan(sma_200)
+                  | np.isnan(rsi) | np.isnan(volume_sma))
+
+    with np.errstate(invalid='ignore'):
+        cond_tendencia_alcista = sma_50 > sma_200
+        cond_rsi = (rsi_min < rsi) & (rsi < rsi_max)
+        cond_volumen = (volume > volume_sma) & (volume_sma > 0)
+    return completos & cond_tendencia_alcista & cond_rsi & cond_volumen
+
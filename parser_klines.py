@@ -0,0 +1,78 @@
+# parser_klines.py
+
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson  # Opcional: decodifica el JSON de las klines bastante más rápido que json
+    _decodificar_json = orjson.loads
+except ImportError:
+    _decodificar_json = json.loads
+
+# Solo guardamos las columnas que usa el análisis, en formato columnar de tipos fijos
+# (las klines de Binance traen 12 campos: se descartan volumen en quote, trades, taker e 'Ignore')
+DTYPE_KLINES = np.dtype([
+    ('Open Time', 'i8'),
+    ('Open', 'f8'),
+    ('High', 'f8'),
+    ('Low', 'f8'),
+    ('Close', 'f8'),
+    ('Volume', 'f8'),
+    ('Close Time', 'i8'),
+])
+
+# Milisegundos por unidad de intervalo de Binance ('1M' no tiene duración fija)
+MS_POR_UNIDAD = {'s': 1000, 'm': 60 * 1000, 'h': 60 * 60 * 1000, 'd': 24 * 60 * 60 * 1000,
+                 'w': 7 * 24 * 60 * 60 * 1000}
+
+
+def intervalo_a_ms(intervalo):
+    """
+    Duración de un intervalo en ms, o None si no es fija (1M). Equivale a
+    binance.helpers.interval_to_milliseconds sin importar python-binance, que tarda en cargar.
+    """
+    try:
+        return int(intervalo[:-1]) * MS_POR_UNIDAD[intervalo[-1]]
+    except (ValueError, KeyError):
+        return None
+
+
+def marca_a_ms(valor):
+    """Timestamp en ms de un entero o de una fecha en texto como en python-binance ('30 days ago UTC')."""
+    if valor is None or isinstance(valor, (int, np.integer)):
+        return None if valor is None else int(valor)
+    # Solo las fechas en texto necesitan python-binance (y dateparser)
+    from binance.helpers import convert_ts_str
+    return convert_ts_str(valor)
+
+
+def klines_a_array(klines):
+    """
+    Convierte la lista de listas de python-binance en un array estructurado.
+
+    Cada columna se rellena con np.fromiter directamente desde las klines, sin pasar por un
+    array de objetos ni por un DataFrame de strings. Si ya es un array, se devuelve tal cual.
+    """
+    if isinstance(klines, np.ndarray):
+        return klines
+    num_velas = len(klines)
+    datos = np.empty(num_velas, dtype=DTYPE_KLINES)
+    for i, nombre in enumerate(DTYPE_KLINES.names):
+        datos[nombre] = np.fromiter((k[i] for k in klines), dtype=DTYPE_KLINES[nombre], count=num_velas)
+    return datos
+
+
+def klines_json_a_array(contenido):
+    """Convierte el cuerpo (bytes) de una respuesta de /api/v3/klines en un array estructurado."""
+    return klines_a_array(_decodificar_json(contenido))
+
+
+def array_a_dataframe(datos):
+    """Construye el DataFrame que espera el resto del análisis a partir del array estructurado."""
+    df = pd.DataFrame(datos)
+    if df.empty:
+        return df
+    df['Open Time'] = pd.to_datetime(df['Open Time'], unit='ms')
+    return df
@@ -0,0 +1,106 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from almacen_klines import AlmacenKlines
+from parser_klines import DTYPE_KLINES
+
+HORA_MS = 60 * 60 * 1000
+DIA_MS = 24 * HORA_MS
+
+
+def velas_horarias(desde, hasta, precio=1.0):
+    """Array del almacén con una vela por hora en [desde, hasta] (alineadas a la hora)."""
+    apertura = np.arange(desde // HORA_MS * HORA_MS, hasta + 1, HORA_MS, dtype=np.int64)
+    datos = np.zeros(len(apertura), dtype=DTYPE_KLINES)
+    datos['Open Time'] = apertura
+    datos['Close Time'] = apertura + HORA_MS - 1
+    for columna in ('Open', 'High', 'Low', 'Close'):
+        datos[columna] = precio
+    datos['Volume'] = 1.0
+    return datos
+
+
+class DescargaFalsa:
+    """Función de descarga que sirve velas de una serie fija y anota los inicios pedidos."""
+
+    def __init__(self, datos):
+        self.datos = datos
+        self.inicios = []
+
+    def __call__(self, inicio):
+        self.inicios.append(inicio)
+        return self.datos[self.datos['Open Time'] >= inicio]
+
+
+def test_solo_se_descarga_la_cola_y_se_reemplaza_la_ultima_vela(tmp_path):
+    almacen = AlmacenKlines(str(tmp_path))
+    ahora = int(time.time() * 1000)
+    descarga = DescargaFalsa(velas_horarias(ahora - 10 * DIA_MS, ahora - 3 * HORA_MS))
+    primera = np.array(almacen.obtener('AAAUSDT', '1h', 5, descarga))
+    ultima = int(primera['Open Time'][-1])
+
+    # Después llegan dos velas nuevas y la última guardada cambia (se guardó sin cerrar)
+    serie = velas_horarias(ahora - 10 * DIA_MS, ahora)
+    serie['Close'][serie['Open Time'] >= ultima] = 2.0
+    descarga.datos = serie
+    datos = almacen.obtener('AAAUSDT', '1h', 5, descarga)
+
+    assert descarga.inicios[1] == ultima
+    assert np.all(np.diff(datos['Open Time']) == HORA_MS)
+    assert datos['Open Time'][-1] == serie['Open Time'][-1]
+    assert datos['Close'][datos['Open Time'] == ultima] == 2.0
+    assert np.all(datos['Close'][datos['Open Time'] < ultima] == 1.0)
+
+
+def test_metadatos_se_conservan_entre_instancias(tmp_path):
+    datos = velas_horarias(0, 99 * HORA_MS)
+    AlmacenKlines(str(tmp_path)).guardar('AAAUSDT', '1h', datos, inicio_cubierto=-5 * HORA_MS)
+
+    almacen = AlmacenKlines(str(tmp_path))
+    guardados, inicio_cubierto = almacen.leer('AAAUSDT', '1h')
+
+    np.testing.assert_array_equal(np.asarray(guardados), datos)
+    assert inicio_cubierto == -5 * HORA_MS
+    with open(os.path.join(str(tmp_path), '1h', 'AAAUSDT.json')) as f:
+        assert json.load(f) == {'inicio_cubierto': -5 * HORA_MS, 'ultimo_open_time': 99 * HORA_MS}
+    assert almacen.simbolos_guardados('1h') == ['AAAUSDT']
+    assert almacen.leer('BBBUSDT', '1h') == (None, None)
+
+
+def test_metadatos_corruptos_obligan_a_descargar_de_nuevo(tmp_path):
+    almacen = AlmacenKlines(str(tmp_path))
+    almacen.guardar('AAAUSDT', '1h', velas_horarias(0, 9 * HORA_MS), inicio_cubierto=0)
+    with open(os.path.join(str(tmp_path), '1h', 'AAAUSDT.json'), 'w') as f:
+        f.write('{roto')
+
+    assert almacen.leer('AAAUSDT', '1h') == (None, None)
+
+
+def test_tope_de_velas_descarta_las_mas_antiguas(tmp_path):
+    almacen = AlmacenKlines(str(tmp_path), max_velas=50)
+    datos = velas_horarias(0, 119 * HORA_MS)
+
+    almacen.guardar('AAAUSDT', '1h', datos, inicio_cubierto=0)
+    guardados, inicio_cubierto = almacen.leer('AAAUSDT', '1h')
+
+    np.testing.assert_array_equal(np.asarray(guardados), datos[-50:])
+    # La historia cubierta empieza en la vela más antigua que se conserva
+    assert inicio_cubierto == datos['Open Time'][-50]
+
+
+def test_tope_de_velas_al_obtener_y_nueva_descarga_si_se_pide_mas_historia(tmp_path):
+    almacen = AlmacenKlines(str(tmp_path), max_velas=24)
+    ahora = int(time.time() * 1000)
+    descarga = DescargaFalsa(velas_horarias(ahora - 3 * DIA_MS, ahora))
+
+    datos = almacen.obtener('AAAUSDT', '1h', 2, descarga)
+    assert len(datos) == 24
+    assert datos['Open Time'][-1] == descarga.datos['Open Time'][-1]
+
+    # El almacén solo cubre un día: pedir dos vuelve a descargar el rango completo
+    almacen.obtener('AAAUSDT', '1h', 2, descarga)
+    assert len(descarga.inicios) == 2
+    assert descarga.inicios[1] < int(datos['Open Time'][0])
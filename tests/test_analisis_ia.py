@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+
+import pytest
+
+import analisis_ia
+from analisis_ia import (LimitadorTokens, analizar_simbolos, analizar_simbolos_en_lotes, establecer_cache,
+                         establecer_modelo, generar_con_reintentos, parsear_respuesta_lote)
+from cache_analisis import CacheAnalisis
+
+
+def prompt(project_name):
+    return f"Analiza {project_name}"
+
+
+def analisis(symbol):
+    return {'symbol': symbol, 'risk_level': 'Medio', 'summary': f"Resumen de {symbol}",
+            'long_term_outlook': 'L', 'medium_term_outlook': 'M', 'short_term_outlook': 'C'}
+
+
+class Respuesta:
+    def __init__(self, text):
+        self.text = text
+
+
+class ErrorCuota(Exception):
+    code = 429
+
+
+class ModeloFalso:
+    """
+    Responde a los lotes con los símbolos de `omitir` quitados y a los prompts individuales con
+    un objeto. `fallos_429` llamadas iniciales lanzan un 429; `retardos` fija la espera por símbolo.
+    """
+
+    model_name = 'modelo-falso'
+
+    def __init__(self, omitir=(), fallos_429=0, retardos=None, error_lote=None):
+        self.omitir = set(omitir)
+        self.fallos_429 = fallos_429
+        self.retardos = retardos or {}
+        self.error_lote = error_lote
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, texto):
+        with self._lock:
+            self.prompts.append(texto)
+            if self.fallos_429:
+                self.fallos_429 -= 1
+                raise ErrorCuota('429 Resource has been exhausted')
+        if texto.startswith('Analiza '):
+            symbol = texto[len('Analiza '):] + 'USDT'
+            if symbol in self.retardos:
+                time.sleep(self.retardos[symbol])
+            return Respuesta(json.dumps(analisis(symbol)))
+        if self.error_lote is not None:
+            raise self.error_lote
+        simbolos = [linea.split('"')[1] for linea in texto.splitlines() if linea.strip().startswith('- "')]
+        return Respuesta(json.dumps([analisis(s) for s in simbolos if s not in self.omitir]))
+
+
+@pytest.fixture(autouse=True)
+def modelo_y_cache_locales():
+    """Cache en memoria y sin modelo real; se restauran al terminar cada prueba."""
+    establecer_cache(CacheAnalisis(':memory:'))
+    yield
+    establecer_modelo(None)
+    establecer_cache(None)
+
+
+def limitador_rapido():
+    return LimitadorTokens(1000.0, 1000)
+
+
+def test_una_consulta_contada_por_simbolo():
+    cache = CacheAnalisis(':memory:')
+    modelo = ModeloFalso(omitir={'BBBUSDT'})
+    simbolos = ['AAAUSDT', 'BBBUSDT', 'CCCUSDT']
+
+    # Primera pasada: tres fallos (BBB se analiza después de forma individual sin volver a contar)
+    analizar_simbolos_en_lotes(simbolos, prompt, tamano_lote=3, modelo=modelo, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    # Segunda pasada: tres aciertos, dos con la versión del lote y BBB con la individual
+    analizar_simbolos_en_lotes(simbolos, prompt, tamano_lote=3, modelo=modelo, cache=cache)
+    assert (cache.hits, cache.misses) == (3, 3)
+    assert len(modelo.prompts) == 2
+
+
+def test_resultados_en_el_orden_de_entrada():
+    # Los primeros símbolos tardan más: terminan los últimos, pero salen en su posición
+    simbolos = ['AAAUSDT', 'BBBUSDT', 'CCCUSDT', 'DDDUSDT']
+    establecer_modelo(ModeloFalso(retardos={'AAAUSDT': 0.15, 'BBBUSDT': 0.1, 'CCCUSDT': 0.05}))
+    terminados = []
+
+    resultados = analizar_simbolos(simbolos, prompt, max_simultaneos=4, limitador=limitador_rapido(),
+                                   al_terminar=lambda r: terminados.append(r['symbol']))
+
+    assert [r['symbol'] for r in resultados] == simbolos
+    assert terminados[0] == 'DDDUSDT'
+
+
+def test_lotes_conservan_el_orden_con_simbolos_repetidos():
+    establecer_modelo(ModeloFalso())
+    simbolos = ['CCCUSDT', 'AAAUSDT', 'CCCUSDT', 'BBBUSDT']
+
+    resultados = analizar_simbolos_en_lotes(simbolos, prompt, tamano_lote=2, limitador=limitador_rapido())
+
+    assert [r['symbol'] for r in resultados] == simbolos
+
+
+def test_429_se_reintenta_con_backoff_y_jitter(monkeypatch):
+    esperas = []
+    monkeypatch.setattr(analisis_ia.time, 'sleep', esperas.append)
+    modelo = ModeloFalso(fallos_429=2)
+
+    respuesta = generar_con_reintentos(modelo, 'Analiza AAA', limitador_rapido(), reintentos=3, backoff=1.0)
+
+    assert json.loads(respuesta.text)['symbol'] == 'AAAUSDT'
+    assert len(modelo.prompts) == 3
+    # Backoff exponencial (1s, 2s) multiplicado por un jitter en [0.5, 1.5)
+    assert len(esperas) == 2
+    assert 0.5 <= esperas[0] < 1.5 and 1.0 <= esperas[1] < 3.0
+
+
+def test_429_agotado_devuelve_error_por_simbolo(monkeypatch):
+    monkeypatch.setattr(analisis_ia.time, 'sleep', lambda segundos: None)
+    establecer_modelo(ModeloFalso(fallos_429=100))
+
+    resultados = analizar_simbolos_en_lotes(['AAAUSDT', 'BBBUSDT'], prompt, tamano_lote=2,
+                                            limitador=limitador_rapido())
+
+    assert [r['symbol'] for r in resultados] == ['AAAUSDT', 'BBBUSDT']
+    assert all(r['risk_level'] == 'Error de Análisis' for r in resultados)
+
+
+def test_otros_errores_no_se_reintentan():
+    modelo = ModeloFalso(error_lote=ValueError('prompt inválido'))
+
+    with pytest.raises(ValueError):
+        generar_con_reintentos(modelo, analisis_ia.build_batch_analysis_prompt(['AAAUSDT']), limitador_rapido())
+    assert len(modelo.prompts) == 1
+
+
+def test_limitador_tokens_limita_el_ritmo():
+    limitador = LimitadorTokens(tasa=50.0, capacidad=2)
+    inicio = time.monotonic()
+    hilos = [threading.Thread(target=limitador.adquirir) for _ in range(12)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join(5)
+
+    # Dos fichas de ráfaga y las otras diez a 50 por segundo
+    transcurrido = time.monotonic() - inicio
+    assert 0.18 <= transcurrido < 1.0
+
+
+def test_respuesta_de_lote_parcial():
+    completos = json.dumps([analisis('AAAUSDT'), {**analisis('BBB'), 'symbol': 'BBB'}])
+    # Array cortado a mitad del tercer objeto y envuelto en ```json
+    texto = '```json\n' + completos[:-1] + ', {"symbol": "CCCUSDT", "risk_level": "Alto", "summ'
+
+    resultados = parsear_respuesta_lote(texto, ['AAAUSDT', 'BBBUSDT', 'CCCUSDT'])
+
+    assert list(resultados) == ['AAAUSDT', 'BBBUSDT']
+    assert resultados['BBBUSDT']['symbol'] == 'BBBUSDT'
+
+
+def test_simbolos_que_faltan_en_el_lote_se_analizan_uno_a_uno():
+    modelo = ModeloFalso(omitir={'BBBUSDT'})
+    establecer_modelo(modelo)
+
+    resultados = analizar_simbolos_en_lotes(['AAAUSDT', 'BBBUSDT', 'CCCUSDT'], prompt, tamano_lote=3,
+                                            limitador=limitador_rapido())
+
+    assert [r['symbol'] for r in resultados] == ['AAAUSDT', 'BBBUSDT', 'CCCUSDT']
+    assert all(r['risk_level'] == 'Medio' for r in resultados)
+    assert modelo.prompts[1:] == ['Analiza BBB']
@@ -0,0 +1,144 @@
+import gzip
+import json
+import sys
+import time
+import types
+
+import pytest
+
+# app.py lee las claves de config.py al importarse; en las pruebas basta con unas de mentira
+try:
+    import config  # noqa: F401
+except ImportError:
+    config = types.ModuleType('config')
+    config.binance_api_key = config.binance_api_secret = config.gemini_api_key = 'prueba'
+    sys.modules['config'] = config
+
+import app as webapp
+import cliente_binance
+from almacen_klines import AlmacenKlines
+from almacen_resultados import AlmacenResultados, establecer_almacen_resultados
+from benchmarks.cliente_falso import ClienteBinanceFalso
+from gestor_trabajos import GestorTrabajos
+from instantanea_mercado import InstantaneaMercado
+
+
+@pytest.fixture
+def cliente_http(tmp_path, monkeypatch):
+    """Test client de Flask con el cliente de Binance falso y almacenes y gestor propios de la prueba."""
+    monkeypatch.chdir(tmp_path)
+    cliente = ClienteBinanceFalso(num_simbolos=30, latencia=0, probabilidad_429=0)
+    cliente.preparar('1d')
+    cliente_binance.establecer_cliente(cliente)
+    establecer_almacen_resultados(AlmacenResultados(str(tmp_path / 'resultados.db')))
+    monkeypatch.setattr(webapp, 'almacen_global', AlmacenKlines(str(tmp_path / 'klines')))
+    monkeypatch.setattr(webapp, 'instantanea_global', InstantaneaMercado())
+    monkeypatch.setattr(webapp, 'gestor_trabajos', GestorTrabajos(webapp.run_technical_analysis))
+    yield webapp.app.test_client()
+    cliente_binance.establecer_cliente(None)
+    establecer_almacen_resultados(None)
+
+
+def esperar_trabajo(job_id, timeout=30):
+    trabajo = webapp.gestor_trabajos.obtener(job_id)
+    limite = time.monotonic() + timeout
+    while trabajo['is_running']:
+        assert time.monotonic() < limite, "El trabajo no terminó a tiempo"
+        time.sleep(0.02)
+    return trabajo
+
+
+def lanzar_escaneo(cliente_http):
+    respuesta = cliente_http.post('/api/start-analysis', json={'intervalo': '1d', 'categoria': 'todos'})
+    assert respuesta.status_code == 200, respuesta.get_json()
+    return respuesta.get_json()['job_id']
+
+
+def test_gzip_lleva_su_propio_etag():
+    datos = {'results': [{'simbolo': f"SIM{i:04d}USDT", 'score': i} for i in range(100)]}
+
+    with webapp.app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        comprimida = webapp._respuesta_json(datos)
+    with webapp.app.test_request_context():
+        identidad = webapp._respuesta_json(datos)
+
+    etag_gzip, _ = comprimida.get_etag()
+    etag_identidad, _ = identidad.get_etag()
+    assert etag_gzip == etag_identidad + '-gzip'
+    assert comprimida.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(comprimida.get_data())) == json.loads(identidad.get_data())
+    assert 'Accept-Encoding' in comprimida.vary and 'Accept-Encoding' in identidad.vary
+
+    # Cada ETag solo valida su propia representación
+    with webapp.app.test_request_context(headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'"{etag_gzip}"'}):
+        assert webapp._respuesta_json(datos).status_code == 304
+    with webapp.app.test_request_context(headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'"{etag_identidad}"'}):
+        assert webapp._respuesta_json(datos).status_code == 200
+
+
+def test_estado_del_trabajo_pagina_los_resultados(cliente_http):
+    job_id = lanzar_escaneo(cliente_http)
+    trabajo = esperar_trabajo(job_id)
+    assert trabajo['error'] is None
+    total = len(trabajo['results'])
+    assert total > 1
+
+    respuesta = cliente_http.get(f'/api/jobs/{job_id}?limit=1&sort=score&order=desc')
+    estado = respuesta.get_json()
+    assert respuesta.status_code == 200
+    assert estado['results_total'] == total
+    assert len(estado['results']) == 1
+    assert estado['results'][0]['simbolo'] == trabajo['results'][0]['simbolo']
+
+    assert cliente_http.get(f'/api/jobs/{job_id}?limit=0').status_code == 400
+    assert cliente_http.get('/api/jobs/no-existe').status_code == 404
+
+
+def eventos_sse(texto):
+    """Lista de (evento, datos) de un stream SSE (los comentarios keep-alive se ignoran)."""
+    eventos = []
+    for bloque in texto.split('\n\n'):
+        lineas = dict(linea.split(': ', 1) for linea in bloque.splitlines() if not linea.startswith(':'))
+        if lineas:
+            eventos.append((lineas['event'], json.loads(lineas['data'])))
+    return eventos
+
+
+def test_stream_sse_de_un_escaneo(cliente_http, monkeypatch):
+    monkeypatch.setattr(webapp, 'INTERVALO_STREAM', 0.01)
+    job_id = lanzar_escaneo(cliente_http)
+
+    respuesta = cliente_http.get(f'/api/analysis-stream?job_id={job_id}')
+    assert respuesta.mimetype == 'text/event-stream'
+    eventos = eventos_sse(respuesta.get_data(as_text=True))
+
+    tipos = [evento for evento, _ in eventos]
+    assert tipos[0] == 'progress'
+    assert tipos[-1] == 'done' and tipos.count('done') == 1
+    progresos = [datos['progress'] for evento, datos in eventos if evento == 'progress']
+    assert progresos == sorted(progresos) and progresos[-1] == 100
+
+    # Cada candidato se envía una vez y 'done' trae el número de resultados del trabajo
+    trabajo = webapp.gestor_trabajos.obtener(job_id)
+    candidatos = [datos['simbolo'] for evento, datos in eventos if evento == 'candidate']
+    fin = eventos[-1][1]
+    assert fin['job_id'] == job_id and fin['error'] is None and not fin['cancelled']
+    assert fin['results_count'] == len(trabajo['results']) == len(candidatos) > 0
+    assert sorted(candidatos) == sorted(r['simbolo'] for r in trabajo['results'])
+
+
+def test_polling_como_alternativa_al_stream(cliente_http):
+    job_id = lanzar_escaneo(cliente_http)
+
+    limite = time.monotonic() + 30
+    while True:
+        estado = cliente_http.get(f'/api/analysis-status?job_id={job_id}').get_json()
+        if not estado['is_running']:
+            break
+        assert time.monotonic() < limite, "El trabajo no terminó a tiempo"
+        time.sleep(0.02)
+
+    trabajo = webapp.gestor_trabajos.obtener(job_id)
+    assert estado['progress'] == 100 and estado['error'] is None
+    assert estado['results_total'] == len(trabajo['results']) > 0
+    assert cliente_http.get('/api/analysis-status?job_id=no-existe').status_code == 404
@@ -0,0 +1,147 @@
+import time
+
+import numpy as np
+import pytest
+
+import cliente_binance
+from almacen_klines import AlmacenKlines
+from backtest import (COLUMNAS_BACKTEST, cargar_panel_almacen, cargar_panel_historia, ejecutar_backtest,
+                      senales_historicas, simular_operaciones)
+from benchmarks.cliente_falso import ClienteBinanceFalso
+from estrategias import obtener_estrategias
+from panel_indicadores import construir_panel, mascara_senal, rsi_panel, sma_panel
+from parser_klines import DTYPE_KLINES
+
+DIA_MS = 24 * 60 * 60 * 1000
+
+
+def velas(primer_dia, cierres):
+    """Array del almacén con una vela diaria por cierre; apertura = máximo = mínimo = cierre."""
+    datos = np.zeros(len(cierres), dtype=DTYPE_KLINES)
+    datos['Open Time'] = (primer_dia + np.arange(len(cierres))) * DIA_MS
+    datos['Close Time'] = datos['Open Time'] + DIA_MS - 1
+    for columna in ('Open', 'High', 'Low', 'Close'):
+        datos[columna] = cierres
+    datos['Volume'] = 1.0
+    return datos
+
+
+def test_panel_por_tiempo_alinea_fechas_de_listado_distintas():
+    datos = {'AAA': velas(0, np.arange(10) + 100.0), 'BBB': velas(5, np.arange(5) + 200.0)}
+
+    panel = construir_panel(datos, ('Close',), por_tiempo=True)
+
+    np.testing.assert_array_equal(panel['Open Time'], np.arange(10) * DIA_MS)
+    np.testing.assert_array_equal(panel['Close'][0], np.arange(10) + 100.0)
+    assert np.isnan(panel['Close'][1, :5]).all()
+    np.testing.assert_array_equal(panel['Close'][1, 5:], np.arange(5) + 200.0)
+
+
+def test_panel_por_tiempo_deja_huecos_y_bajas_a_nan():
+    con_hueco = velas(0, np.full(6, 10.0))
+    con_hueco = con_hueco[con_hueco['Open Time'] != 2 * DIA_MS]
+    datos = {'AAA': velas(0, np.full(8, 1.0)), 'BBB': con_hueco}
+
+    panel = construir_panel(datos, ('Close',), por_tiempo=True)
+
+    assert panel['Close'].shape == (2, 8)
+    np.testing.assert_array_equal(np.isnan(panel['Close'][1]),
+                                  [False, False, True, False, False, False, True, True])
+
+
+def test_cartera_promedia_solo_los_simbolos_activos(tmp_path):
+    almacen = AlmacenKlines(str(tmp_path))
+    cierres_b = np.array([100.0, 100.0, 121.0, 121.0, 121.0])
+    for simbolo, datos in (('AAA', velas(0, np.full(10, 50.0))),   # Listado desde el día 0, sin operaciones
+                           ('BBB', velas(5, cierres_b)),           # Listado el día 5
+                           ('CCC', velas(8, np.full(2, 7.0)))):    # Listado el día 8
+        almacen.guardar(simbolo, '1d', datos, datos['Open Time'][0])
+
+    panel = cargar_panel_almacen('1d', almacen=almacen)
+    senales = np.zeros(panel['Close'].shape, dtype=bool)
+    senales[panel['simbolos'].index('BBB'), 5] = True
+
+    operaciones, por_simbolo, agregado = ejecutar_backtest(panel, senales, velas_mantenimiento=2, comision=0.0)
+
+    # Entrada a la apertura del día 6 (100) y salida al cierre del día 7 (121)
+    assert operaciones['vela_entrada'].tolist() == [6]
+    assert operaciones['vela_salida'].tolist() == [7]
+    assert operaciones['retorno'].iloc[0] == pytest.approx(0.21)
+    # El día 7 solo están listados AAA y BBB: la cartera gana la mitad del 21%, no un tercio
+    assert agregado['retorno_cartera'] == pytest.approx(0.105)
+    assert agregado['max_drawdown_cartera'] == pytest.approx(0.0)
+
+
+def test_posicion_de_un_simbolo_retirado_se_cierra_en_su_ultima_vela():
+    datos = {'AAA': velas(0, np.full(10, 50.0)), 'BBB': velas(0, np.array([10.0, 10.0, 12.0, 15.0]))}
+    panel = construir_panel(datos, ('Open', 'High', 'Low', 'Close', 'Volume'), por_tiempo=True)
+    senales = np.zeros(panel['Close'].shape, dtype=bool)
+    senales[1, 0] = True
+
+    operaciones, _, agregado = ejecutar_backtest(panel, senales, velas_mantenimiento=5, comision=0.0)
+
+    assert operaciones['vela_salida'].tolist() == [3]
+    assert operaciones['motivo'].tolist() == ['abierta']
+    assert operaciones['retorno'].iloc[0] == pytest.approx(0.5)
+    assert agregado['retorno_cartera'] == pytest.approx(0.25)
+
+
+def panel_aleatorio(num_simbolos=40, num_velas=400, semilla=3):
+    rng = np.random.default_rng(semilla)
+    datos = {}
+    for i in range(num_simbolos):
+        n = int(rng.integers(num_velas // 2, num_velas + 1))
+        cierres = 100 * np.exp(np.cumsum(rng.normal(0.001, 0.03, n)))
+        datos[f"SIM{i}"] = velas(num_velas - n, cierres)
+        datos[f"SIM{i}"]['Volume'] = rng.lognormal(10, 0.5, n)
+    return construir_panel(datos, COLUMNAS_BACKTEST, por_tiempo=True)
+
+
+def test_senales_de_la_estrategia_flexible_igual_que_la_mascara():
+    panel = panel_aleatorio()
+    close, volume = panel['Close'], panel['Volume']
+    esperado = mascara_senal(close, volume, sma_panel(close, 50), sma_panel(close, 200),
+                             rsi_panel(close, 14, historico=True), sma_panel(volume, 20))
+
+    senales = senales_historicas(panel)
+
+    assert esperado.any()
+    np.testing.assert_array_equal(senales, esperado)
+
+
+def test_backtest_con_otra_estrategia_del_registro():
+    panel = panel_aleatorio()
+    rebote = obtener_estrategias(['rebote_sobreventa'])[0]
+    close, volume = panel['Close'], panel['Volume']
+    rsi, sma_200, volumen_sma = rsi_panel(close, 14, historico=True), sma_panel(close, 200), sma_panel(volume, 20)
+    with np.errstate(invalid='ignore'):
+        esperado = (close > sma_200) & (rsi < 35) & (volume > volumen_sma) & (volumen_sma > 0)
+
+    senales = senales_historicas(panel, rebote)
+    operaciones, _, agregado = ejecutar_backtest(panel, estrategia=rebote, comision=0.0)
+
+    np.testing.assert_array_equal(senales, esperado)
+    assert agregado['operaciones'] == len(simular_operaciones(panel, esperado, comision=0.0)['retorno']) > 0
+
+
+def test_historia_desde_una_fecha_se_descarga_y_queda_en_el_almacen(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cliente = ClienteBinanceFalso(num_simbolos=3, latencia=0, probabilidad_429=0)
+    cliente_binance.establecer_cliente(cliente)
+    almacen = AlmacenKlines(str(tmp_path / 'klines'))
+    simbolos = cliente.simbolos
+    inicio = int(time.time() * 1000) - 900 * DIA_MS
+    try:
+        panel = cargar_panel_historia('1d', inicio, simbolos, almacen=almacen)
+        peticiones = cliente.peticiones
+        # La segunda vez el almacén ya cubre el rango: solo se pide la cola
+        de_nuevo = cargar_panel_historia('1d', inicio, almacen=almacen)
+    finally:
+        cliente_binance.establecer_cliente(None)
+
+    assert panel['simbolos'] == simbolos
+    assert panel['Close'].shape[1] >= 899
+    assert panel['Open Time'][0] >= inicio
+    assert cliente.peticiones - peticiones == len(simbolos)
+    assert de_nuevo['simbolos'] == simbolos
+    np.testing.assert_array_equal(de_nuevo['Open Time'][:-1], panel['Open Time'][:-1])
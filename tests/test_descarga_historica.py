@@ -0,0 +1,105 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+import cliente_binance
+import motor_descarga
+from almacen_klines import AlmacenKlines
+from benchmarks.cliente_falso import ClienteBinanceFalso
+from descarga_historica import DIRECTORIO_VENTANAS, descargar_historia, indices_ventanas
+from parser_klines import klines_a_array
+
+HORA_MS = 60 * 60 * 1000
+SIMBOLO = 'SIM0000USDT'
+
+
+class ClienteQueFalla(ClienteBinanceFalso):
+    """Cliente falso que falla al pedir la ventana de índice `fallar_en`."""
+
+    def __init__(self, fallar_en=None, **kwargs):
+        super().__init__(num_simbolos=1, latencia=0, **kwargs)
+        self.fallar_en = fallar_en
+        self.preparar('1h')
+
+    def get_klines(self, symbol, interval, startTime=None, **kwargs):
+        if self.fallar_en is not None and startTime // (1000 * HORA_MS) == self.fallar_en:
+            raise ConnectionError('corte simulado')
+        return super().get_klines(symbol, interval, startTime=startTime, **kwargs)
+
+
+@pytest.fixture
+def entorno(tmp_path, monkeypatch):
+    """Directorio de trabajo temporal (ventanas y almacén) y un limitador que cuenta el peso."""
+    monkeypatch.chdir(tmp_path)
+    limitador = motor_descarga.LimitadorPeso(10 ** 9)
+    monkeypatch.setattr(motor_descarga, 'limitador_global', limitador)
+    yield limitador
+    cliente_binance.establecer_cliente(None)
+
+
+def ventanas_en_disco():
+    directorio = os.path.join(DIRECTORIO_VENTANAS, '1h', SIMBOLO)
+    return sorted(os.listdir(directorio)) if os.path.isdir(directorio) else []
+
+
+def test_descarga_por_ventanas_se_guarda_en_el_almacen_y_borra_los_puntos_de_control(entorno):
+    cliente = ClienteQueFalla()
+    cliente_binance.establecer_cliente(cliente)
+    almacen = AlmacenKlines('almacen')
+    dias = 300
+    num_ventanas = len(indices_ventanas(int(time.time() * 1000) - dias * 24 * HORA_MS, int(time.time() * 1000), HORA_MS))
+
+    datos = almacen.obtener(SIMBOLO, '1h', dias, lambda inicio: descargar_historia(SIMBOLO, '1h', inicio))
+
+    esperado = klines_a_array(cliente._serie(SIMBOLO, '1h')[0])
+    esperado = esperado[esperado['Open Time'] >= datos['Open Time'][0]]
+    np.testing.assert_array_equal(np.asarray(datos), esperado)
+    assert len(datos) >= dias * 24 - 1
+    assert ventanas_en_disco() == []
+    # Una página por ventana y el peso de cada una se cobra una sola vez
+    assert cliente.peticiones == num_ventanas
+    assert entorno._peso_en_ventana == motor_descarga.PESO_KLINES * num_ventanas
+
+
+def test_descarga_interrumpida_continua_por_las_ventanas_que_faltan(entorno):
+    ahora = int(time.time() * 1000)
+    indices = indices_ventanas(ahora - 300 * 24 * HORA_MS, ahora, HORA_MS)
+    cliente = ClienteQueFalla(fallar_en=indices[3])
+    cliente_binance.establecer_cliente(cliente)
+    almacen = AlmacenKlines('almacen')
+
+    def descarga(inicio):
+        return descargar_historia(SIMBOLO, '1h', inicio)
+
+    with pytest.raises(ConnectionError):
+        almacen.obtener(SIMBOLO, '1h', 300, descarga)
+    # Las ventanas cerradas que llegaron siguen en disco; el almacén no se ha escrito
+    guardadas = ventanas_en_disco()
+    assert len(guardadas) == len(indices) - 2  # Ni la que falla ni la abierta
+    assert almacen.leer(SIMBOLO, '1h') == (None, None)
+
+    cliente.fallar_en = None
+    cliente.peticiones = 0
+    datos = almacen.obtener(SIMBOLO, '1h', 300, descarga)
+
+    # Solo se piden la ventana que falló y la abierta (que nunca se guarda)
+    assert cliente.peticiones == 2
+    assert np.all(np.diff(datos['Open Time']) == HORA_MS)
+    assert ventanas_en_disco() == []
+
+
+def test_los_puntos_de_control_sobreviven_a_un_fallo_al_escribir_el_almacen(entorno, monkeypatch):
+    cliente_binance.establecer_cliente(ClienteQueFalla())
+    almacen = AlmacenKlines('almacen')
+
+    def fallo(*args):
+        raise OSError('disco lleno')
+
+    monkeypatch.setattr(almacen, '_confirmar', fallo)
+    with pytest.raises(OSError):
+        almacen.obtener(SIMBOLO, '1h', 300, lambda inicio: descargar_historia(SIMBOLO, '1h', inicio))
+
+    assert ventanas_en_disco()
+    assert almacen.leer(SIMBOLO, '1h') == (None, None)
@@ -0,0 +1,87 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from escaner_tiempo_real import EscanerTiempoReal, FuenteReproduccion
+
+DIA_MS = 24 * 60 * 60 * 1000
+INICIO_MS = 1_600_000_000_000 // DIA_MS * DIA_MS
+
+
+def historia(n):
+    rng = np.random.default_rng(5)
+    open_time = INICIO_MS + np.arange(n) * DIA_MS
+    return pd.DataFrame({'Open Time': pd.to_datetime(open_time, unit='ms'),
+                         'Close': 100 * np.cumprod(1 + rng.normal(0.001, 0.02, n)),
+                         'Volume': rng.lognormal(10, 0.3, n),
+                         'Close Time': open_time + DIA_MS - 1})
+
+
+def kline(open_time, close, volume=1.0):
+    return {'e': 'kline', 's': 'AAAUSDT', 'k': {'t': open_time, 'c': str(close), 'v': str(volume), 'x': True}}
+
+
+class DescargaFalsa:
+    """Devuelve la historia hasta `velas` velas; cuenta las llamadas."""
+
+    def __init__(self, completa, velas):
+        self.completa = completa
+        self.velas = velas
+        self.llamadas = 0
+
+    def __call__(self, simbolo, intervalo, dias):
+        self.llamadas += 1
+        return self.completa.iloc[:self.velas]
+
+
+def test_hueco_en_el_stream_rehace_el_estado_desde_rest():
+    completa = historia(300)
+    descarga = DescargaFalsa(completa, 250)
+    escaner = EscanerTiempoReal(['AAAUSDT'], '1d', 300, descarga, {}, fuente=FuenteReproduccion([]))
+    escaner.iniciar()
+    assert escaner.estados['AAAUSDT'].ultimo_open_time == INICIO_MS + 249 * DIA_MS
+
+    # Llega la vela 255 sin las 250-254: no se aplica y se descarga de nuevo la historia
+    descarga.velas = 256
+    escaner.procesar_mensaje(kline(INICIO_MS + 255 * DIA_MS, completa['Close'].iloc[255]))
+    escaner._hilo_resembrado.join(5)
+
+    assert descarga.llamadas == 2
+    estado = escaner.estados['AAAUSDT']
+    assert estado.ultimo_open_time == INICIO_MS + 255 * DIA_MS
+    assert estado.sma_50.valor == completa['Close'].iloc[206:256].mean()
+
+
+def test_vela_consecutiva_actualiza_sin_descargar():
+    completa = historia(300)
+    descarga = DescargaFalsa(completa, 250)
+    escaner = EscanerTiempoReal(['AAAUSDT'], '1d', 300, descarga, {}, fuente=FuenteReproduccion([]))
+    escaner.iniciar()
+
+    escaner.procesar_mensaje(kline(INICIO_MS + 250 * DIA_MS, 123.0))
+
+    assert descarga.llamadas == 1
+    assert escaner.estados['AAAUSDT'].close == 123.0
+
+
+def test_detener_antes_de_que_arranque_el_hilo():
+    bloqueo = threading.Event()
+
+    def descarga(simbolo, intervalo, dias):
+        bloqueo.wait(5)
+        return historia(250)
+
+    arrancada = []
+    fuente = FuenteReproduccion([])
+    fuente.iniciar = lambda *args, **kwargs: arrancada.append(True)
+    escaner = EscanerTiempoReal(['AAAUSDT'], '1d', 300, descarga, {}, fuente=fuente)
+
+    hilo = escaner.iniciar_en_segundo_plano()
+    assert escaner.activo
+    escaner.detener()
+    bloqueo.set()
+    hilo.join(5)
+
+    assert not escaner.activo
+    assert not arrancada
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from estado_indicadores import calcular_indicadores_ultima_vela
+from estrategias import INDICADORES_ULTIMA_VELA, Estrategia, evaluar_simbolo, obtener_estrategias
+
+ESTRATEGIA_MAXIMOS = {
+    'nombre': 'Cierre en máximos',
+    'indicadores': dict(INDICADORES_ULTIMA_VELA),
+    'condiciones': ['Close >= High', 'SMA_50 > SMA_200'],
+    'puntaje': 'RSI_14',
+}
+
+
+def velas_alcistas(n=300):
+    rng = np.random.default_rng(3)
+    close = 100 * np.cumprod(1 + rng.normal(0.004, 0.01, n))
+    return pd.DataFrame({'Open Time': pd.to_datetime(np.arange(n) * 86400000, unit='ms'),
+                         'Open': close, 'High': close, 'Low': close, 'Close': close,
+                         'Volume': rng.lognormal(10, 0.3, n)})
+
+
+def test_usa_solo_comprueba_las_columnas_de_las_expresiones():
+    assert obtener_estrategias(['flexible'])[0].usa_solo(INDICADORES_ULTIMA_VELA)
+    assert not Estrategia('maximos', ESTRATEGIA_MAXIMOS).usa_solo(INDICADORES_ULTIMA_VELA)
+
+
+def test_evaluar_simbolo_usa_el_panel_si_la_fila_no_tiene_las_columnas():
+    df = velas_alcistas()
+    fila = calcular_indicadores_ultima_vela(df)
+    assert 'High' not in fila
+
+    resultados = evaluar_simbolo('AAAUSDT', df, [Estrategia('maximos', ESTRATEGIA_MAXIMOS)], fila=fila)
+
+    assert [r['estrategia'] for r in resultados] == ['maximos']
@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+import cliente_binance
+from benchmarks.cliente_falso import ClienteBinanceFalso
+from cliente_binance import descargar_klines
+from gestor_trabajos import MAX_TRABAJOS_PENDIENTES, MAX_TRABAJOS_SIMULTANEOS, GestorTrabajos
+
+DIA_MS = 24 * 60 * 60 * 1000
+
+
+def esperar(condicion, timeout=10):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        assert time.monotonic() < limite, "La condición no se cumplió a tiempo"
+        time.sleep(0.01)
+
+
+class TrabajoBloqueado:
+    """Función de trabajo que no termina hasta `liberar` (o hasta que se cancela el trabajo)."""
+
+    def __init__(self):
+        self.liberar = threading.Event()
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self.ejecutados = []
+        self._lock = threading.Lock()
+
+    def __call__(self, trabajo, gestor):
+        with self._lock:
+            self.ejecutados.append(trabajo.id)
+            self.en_curso += 1
+            self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        try:
+            while trabajo.continuar() and not self.liberar.wait(0.01):
+                pass
+        finally:
+            with self._lock:
+                self.en_curso -= 1
+
+
+def test_tres_trabajos_a_la_vez_y_diez_pendientes():
+    funcion = TrabajoBloqueado()
+    gestor = GestorTrabajos(funcion)
+
+    trabajos = [gestor.crear({'n': i}) for i in range(MAX_TRABAJOS_PENDIENTES)]
+    assert all(t is not None for t in trabajos)
+    # Con diez pendientes (en ejecución o en cola) no se aceptan más
+    assert gestor.crear({'n': 'extra'}) is None
+
+    esperar(lambda: funcion.en_curso == MAX_TRABAJOS_SIMULTANEOS)
+    time.sleep(0.05)
+    assert funcion.en_curso == MAX_TRABAJOS_SIMULTANEOS
+    assert sum(t['queued'] for t in trabajos) == MAX_TRABAJOS_PENDIENTES - MAX_TRABAJOS_SIMULTANEOS
+
+    funcion.liberar.set()
+    esperar(lambda: not any(t['is_running'] for t in trabajos))
+    assert funcion.max_en_curso == MAX_TRABAJOS_SIMULTANEOS
+    assert gestor.crear({'n': 'despues'}) is not None
+
+
+def test_cancelar_un_trabajo_en_ejecucion_y_otro_en_cola():
+    funcion = TrabajoBloqueado()
+    gestor = GestorTrabajos(funcion, max_trabajos=1)
+    en_ejecucion = gestor.crear({})
+    en_cola = gestor.crear({})
+    esperar(lambda: not en_ejecucion['queued'])
+
+    assert gestor.cancelar(en_cola.id) is en_cola
+    assert gestor.cancelar(en_ejecucion.id) is en_ejecucion
+    assert gestor.cancelar('no-existe') is None
+
+    esperar(lambda: not en_ejecucion['is_running'] and not en_cola['is_running'])
+    assert en_ejecucion['cancelled'] and en_cola['cancelled']
+    # El trabajo en cola se cancela antes de empezar: su función nunca se ejecuta
+    assert funcion.ejecutados == [en_ejecucion.id]
+
+
+@pytest.fixture
+def cliente_falso():
+    cliente = ClienteBinanceFalso(num_simbolos=12, latencia=0.02, probabilidad_429=0)
+    cliente.preparar('1d')
+    cliente_binance.establecer_cliente(cliente)
+    yield cliente
+    cliente_binance.establecer_cliente(None)
+
+
+def descargar_dias(simbolo, intervalo, dias):
+    return descargar_klines(simbolo, intervalo, int(time.time() * 1000 - dias * DIA_MS))
+
+
+def test_trabajos_simultaneos_comparten_cada_descarga(cliente_falso):
+    simbolos = cliente_falso.simbolos
+    salida = threading.Barrier(2)
+    descargados = {}
+
+    def escanear(trabajo, gestor):
+        salida.wait(5)  # Los dos escaneos piden los mismos símbolos a la vez
+        descargados[trabajo.id] = {s: len(datos) for s, datos in
+                                   gestor.descargar(trabajo, simbolos, descargar_dias, '1d', 300)}
+
+    gestor = GestorTrabajos(escanear, max_peticiones=4)
+    trabajos = [gestor.crear({}), gestor.crear({})]
+    esperar(lambda: not any(t['is_running'] for t in trabajos))
+
+    assert all(t['error'] is None for t in trabajos)
+    primero, segundo = (descargados[t.id] for t in trabajos)
+    assert sorted(primero) == sorted(simbolos) and primero == segundo
+    # Vuelo único: una sola página por símbolo entre los dos trabajos
+    assert cliente_falso.peticiones == len(simbolos)
+
+
+def test_cancelar_detiene_las_descargas_pendientes(cliente_falso):
+    recibidos = []
+    primera = threading.Event()
+
+    def escanear(trabajo, gestor):
+        for simbolo, _ in gestor.descargar(trabajo, cliente_falso.simbolos, descargar_dias, '1d', 300):
+            recibidos.append(simbolo)
+            primera.set()
+
+    gestor = GestorTrabajos(escanear, max_peticiones=1)
+    trabajo = gestor.crear({})
+    assert primera.wait(5)
+    gestor.cancelar(trabajo.id)
+    esperar(lambda: not trabajo['is_running'])
+
+    assert trabajo['cancelled']
+    assert len(recibidos) < len(cliente_falso.simbolos)
+    assert cliente_falso.peticiones < len(cliente_falso.simbolos)
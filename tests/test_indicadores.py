@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from estado_indicadores import (EstadoIndicadores, RSIWilderIncremental, SMAIncremental,
+                                calcular_indicadores_ultima_vela, estados_rsi)
+from estrategias import INDICADORES_ULTIMA_VELA, calcular_indicadores, evaluar_panel, obtener_estrategias
+from panel_indicadores import construir_panel, rsi_panel, sma_panel
+
+
+# --- IMPLEMENTACIÓN DE REFERENCIA (pandas, la del escáner original por símbolo) ---
+def calcular_sma(data, length):
+    return data.rolling(window=length).mean()
+
+
+def calcular_rsi(data, length=14):
+    delta = data.diff()
+    gain = (delta.where(delta > 0, 0)).fillna(0)
+    loss = (-delta.where(delta < 0, 0)).fillna(0)
+    avg_gain = gain.ewm(com=length - 1, adjust=False, min_periods=length).mean()
+    avg_loss = loss.ewm(com=length - 1, adjust=False, min_periods=length).mean()
+    if avg_loss.iloc[-1] == 0:
+        return 100.0
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+
+@pytest.fixture
+def datos():
+    """Paseos aleatorios fijos con longitudes distintas (algunos símbolos recién listados)."""
+    rng = np.random.default_rng(42)
+    datos = {}
+    for i, n in enumerate((260, 400, 15, 230, 333)):
+        close = 100 * np.exp(np.cumsum(rng.normal(0.001, 0.03, n)))
+        datos[f'SIM{i}USDT'] = pd.DataFrame({'Close': close, 'Volume': rng.lognormal(10, 0.5, n)})
+    # Una serie que solo sube: sin pérdidas el RSI vale 100
+    datos['SUBEUSDT'] = pd.DataFrame({'Close': np.arange(1.0, 301.0), 'Volume': np.ones(300)})
+    return datos
+
+
+def fila_panel(panel, clave, i, n):
+    """Serie del símbolo `i` sin el relleno por la izquierda."""
+    return panel[clave][i, panel[clave].shape[1] - n:]
+
+
+@pytest.mark.parametrize('length', [1, 14, 50, 200])
+def test_sma_panel_igual_que_rolling_mean(datos, length):
+    panel = construir_panel(datos)
+    sma = sma_panel(panel['Close'], length)
+    for i, (simbolo, df) in enumerate(datos.items()):
+        np.testing.assert_allclose(fila_panel({'SMA': sma}, 'SMA', i, len(df)),
+                                   calcular_sma(df['Close'], length).to_numpy(), rtol=1e-9, equal_nan=True)
+
+
+def test_rsi_panel_igual_que_la_referencia(datos):
+    panel = construir_panel(datos)
+    rsi = rsi_panel(panel['Close'], 14)
+    for i, (simbolo, df) in enumerate(datos.items()):
+        referencia = calcular_rsi(df['Close'], 14)
+        serie = fila_panel({'RSI': rsi}, 'RSI', i, len(df))
+        if isinstance(referencia, float):
+            assert serie[-1] == referencia
+        else:
+            np.testing.assert_allclose(serie, referencia.to_numpy(), rtol=1e-9, equal_nan=True)
+
+
+def test_indicadores_panel_en_la_ultima_vela(datos):
+    panel = calcular_indicadores(construir_panel(datos), obtener_estrategias())
+    for i, (simbolo, df) in enumerate(datos.items()):
+        rsi = calcular_rsi(df['Close'], 14)
+        esperado = {
+            'SMA_50': calcular_sma(df['Close'], 50).iloc[-1],
+            'SMA_200': calcular_sma(df['Close'], 200).iloc[-1],
+            'RSI_14': rsi if isinstance(rsi, float) else rsi.iloc[-1],
+            'VOLUME_SMA_20': calcular_sma(df['Volume'], 20).iloc[-1],
+        }
+        for clave, valor in esperado.items():
+            np.testing.assert_allclose(panel[INDICADORES_ULTIMA_VELA[clave]][i, -1], valor, rtol=1e-9, equal_nan=True)
+
+
+def test_evaluar_panel_igual_que_la_senal_por_simbolo(datos):
+    rng = np.random.default_rng(7)
+    for i in range(60):  # Más símbolos para que haya señales y símbolos sin señal
+        n = int(rng.integers(150, 400))
+        close = 100 * np.exp(np.cumsum(rng.normal(0.002, 0.03, n)))
+        datos[f'EXTRA{i}USDT'] = pd.DataFrame({'Close': close, 'Volume': rng.lognormal(10, 0.5, n)})
+
+    # Señal de la estrategia flexible con la referencia pandas (dropna + condiciones de la última vela)
+    esperado = {}
+    for simbolo, df in datos.items():
+        df = df.assign(SMA_50=calcular_sma(df['Close'], 50), SMA_200=calcular_sma(df['Close'], 200),
+                       RSI_14=calcular_rsi(df['Close'], 14), VOLUME_SMA_20=calcular_sma(df['Volume'], 20)).dropna()
+        if df.empty:
+            continue
+        v = df.iloc[-1]
+        if v['SMA_50'] > v['SMA_200'] and 45 < v['RSI_14'] < 80 and v['Volume'] > v['VOLUME_SMA_20'] > 0:
+            esperado[simbolo] = v['RSI_14'] * v['Volume'] / v['VOLUME_SMA_20']
+
+    estrategias = obtener_estrategias()
+    panel = calcular_indicadores(construir_panel(datos), estrategias)
+    obtenido = {r['simbolo']: r['score'] for r in evaluar_panel(panel, estrategias)}
+
+    assert 0 < len(esperado) < len(datos)
+    assert obtenido.keys() == esperado.keys()
+    for simbolo, score in esperado.items():
+        assert obtenido[simbolo] == pytest.approx(score, rel=1e-9)
+
+
+def test_rsi_incremental_igual_que_la_referencia(datos):
+    close = datos['SIM1USDT']['Close']
+    referencia = calcular_rsi(close, 14).to_numpy()
+
+    rsi = RSIWilderIncremental(14)
+    for k, valor in enumerate(close):
+        rsi.actualizar(float(valor))
+        if k >= 13:
+            assert rsi.valor == pytest.approx(referencia[k], rel=1e-9)
+        else:
+            assert rsi.valor is None
+
+    # Cargar la historia de una vez y seguir vela a vela da lo mismo
+    cargado = RSIWilderIncremental(14)
+    cargado.cargar(close.to_numpy()[:300])
+    for k in range(300, len(close)):
+        assert cargado.vista_previa(float(close.iloc[k])) == pytest.approx(referencia[k], rel=1e-9)
+        cargado.actualizar(float(close.iloc[k]))
+        assert cargado.valor == pytest.approx(referencia[k], rel=1e-9)
+
+
+def test_sma_incremental_igual_que_rolling_mean(datos):
+    volume = datos['SIM1USDT']['Volume']
+    referencia = calcular_sma(volume, 20).to_numpy()
+    sma = SMAIncremental(20)
+    for k, valor in enumerate(volume):
+        sma.actualizar(float(valor))
+        if k >= 19:
+            assert sma.valor == pytest.approx(referencia[k], rel=1e-9)
+
+
+def test_estado_desde_historia_y_ultima_vela(datos):
+    df = datos['SIM1USDT']
+    estado = EstadoIndicadores.desde_historia(df['Close'].to_numpy()[:-1], df['Volume'].to_numpy()[:-1], 0)
+    estado.actualizar(1, float(df['Close'].iloc[-1]), float(df['Volume'].iloc[-1]))
+    fila = estado.ultima_vela()
+
+    assert fila['SMA_50'] == pytest.approx(calcular_sma(df['Close'], 50).iloc[-1], rel=1e-9)
+    assert fila['SMA_200'] == pytest.approx(calcular_sma(df['Close'], 200).iloc[-1], rel=1e-9)
+    assert fila['RSI_14'] == pytest.approx(calcular_rsi(df['Close'], 14).iloc[-1], rel=1e-9)
+    assert fila['VOLUME_SMA_20'] == pytest.approx(calcular_sma(df['Volume'], 20).iloc[-1], rel=1e-9)
+
+
+def test_indicadores_ultima_vela_con_estado_del_rsi_reutilizado(datos):
+    df = datos['SIM1USDT'].assign(**{'Open Time': np.arange(400)})
+    clave = ('SIM1USDT', 'test')
+    estados_rsi.pop(clave, None)
+
+    for n in (350, 351, 360, 400):  # En frío y después reutilizando el estado guardado
+        fila = calcular_indicadores_ultima_vela(df.iloc[:n], clave=clave)
+        assert fila['RSI_14'].iloc[-1] == pytest.approx(calcular_rsi(df['Close'].iloc[:n], 14).iloc[-1], rel=1e-9)
+    estados_rsi.pop(clave, None)
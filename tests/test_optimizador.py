@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from almacen_klines import AlmacenKlines
+from backtest import COLUMNAS_BACKTEST, cargar_panel_almacen, simular_operaciones
+from optimizador import barrer_parametros, calcular_series_compartidas
+from panel_indicadores import construir_panel, mascara_senal
+from parser_klines import DTYPE_KLINES
+
+DIA_MS = 24 * 60 * 60 * 1000
+REJILLA = {'sma_rapida': [10, 20], 'sma_lenta': [40], 'rsi': [(40, 80), (50, 75)], 'volumen': [10]}
+
+
+def paseo_aleatorio(rng, primer_dia, n):
+    datos = np.zeros(n, dtype=DTYPE_KLINES)
+    datos['Open Time'] = (primer_dia + np.arange(n)) * DIA_MS
+    datos['Close Time'] = datos['Open Time'] + DIA_MS - 1
+    cierre = 100 * np.cumprod(1 + rng.normal(0.003, 0.03, n))
+    apertura = np.concatenate([[cierre[0]], cierre[:-1]])
+    datos['Open'] = apertura
+    datos['Close'] = cierre
+    datos['High'] = np.maximum(apertura, cierre) * 1.01
+    datos['Low'] = np.minimum(apertura, cierre) * 0.99
+    datos['Volume'] = rng.lognormal(10, 0.5, n)
+    return datos
+
+
+@pytest.fixture
+def universo(tmp_path):
+    """Símbolos con fechas de listado y de baja distintas."""
+    rng = np.random.default_rng(7)
+    datos = {'AAA': paseo_aleatorio(rng, 0, 300),     # Toda la historia
+             'BBB': paseo_aleatorio(rng, 120, 180),   # Listado más tarde
+             'CCC': paseo_aleatorio(rng, 0, 160)}     # Retirado antes del final
+    almacen = AlmacenKlines(str(tmp_path))
+    for simbolo, velas in datos.items():
+        almacen.guardar(simbolo, '1d', velas, velas['Open Time'][0])
+    return datos, cargar_panel_almacen('1d', almacen=almacen)
+
+
+def retorno_cartera_esperado(datos, combinacion, config):
+    """
+    Backtest de cada símbolo por separado (sin alinear nada) y cartera a partes iguales entre
+    los símbolos listados en cada fecha.
+    """
+    rapida, lenta, rsi_min, rsi_max, volumen = combinacion
+    retornos_por_fecha = {}
+    activos_por_fecha = {}
+    for simbolo, velas in datos.items():
+        panel = construir_panel({simbolo: velas}, COLUMNAS_BACKTEST)
+        series = calcular_series_compartidas(panel, [combinacion])
+        senales = mascara_senal(series['Close'], series['Volume'], series[f'SMA_{rapida}'], series[f'SMA_{lenta}'],
+                                series['RSI'], series[f'VOLUME_SMA_{volumen}'], rsi_min, rsi_max)
+        operaciones = simular_operaciones(panel, senales, **config)
+        for vela, retorno in zip(operaciones['vela_salida'], operaciones['retorno']):
+            fecha = int(velas['Open Time'][vela])
+            retornos_por_fecha[fecha] = retornos_por_fecha.get(fecha, 0.0) + retorno
+        for fecha in velas['Open Time'].tolist():
+            activos_por_fecha[fecha] = activos_por_fecha.get(fecha, 0) + 1
+
+    capital = 1.0
+    for fecha in sorted(activos_por_fecha):
+        capital *= 1 + retornos_por_fecha.get(fecha, 0.0) / activos_por_fecha[fecha]
+    return capital - 1
+
+
+@pytest.mark.parametrize('procesos', [1, 2])
+def test_ranking_con_fechas_de_listado_distintas(universo, procesos):
+    datos, panel = universo
+    config = {'velas_mantenimiento': 5, 'stop_loss': 0.05, 'take_profit': 0.1, 'comision': 0.001}
+
+    ranking = barrer_parametros(panel, REJILLA, procesos=procesos, **config)
+
+    assert len(ranking) == 4
+    assert ranking['operaciones'].sum() > 0
+    for fila in ranking.itertuples():
+        combinacion = (fila.sma_rapida, fila.sma_lenta, fila.rsi_min, fila.rsi_max, fila.volumen_sma)
+        assert fila.retorno_cartera == pytest.approx(retorno_cartera_esperado(datos, combinacion, config))
@@ -0,0 +1,66 @@
+import json
+
+import pandas as pd
+import pytest
+
+import parser_klines
+from benchmarks.cliente_falso import ClienteBinanceFalso
+from parser_klines import DTYPE_KLINES, array_a_dataframe, klines_a_array, klines_json_a_array
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Con y sin orjson: el parser usa el que esté instalado
+DECODIFICADORES = [
+    pytest.param(json.loads, id='json'),
+    pytest.param(orjson.loads if orjson else None, id='orjson',
+                 marks=pytest.mark.skipif(orjson is None, reason='orjson no está instalado')),
+]
+
+COLUMNAS_BINANCE = ['Open Time', 'Open', 'High', 'Low', 'Close', 'Volume', 'Close Time', 'Quote Asset Volume',
+                    'Number of Trades', 'Taker Buy Base Asset Volume', 'Taker Buy Quote Asset Volume', 'Ignore']
+
+
+def dataframe_de_referencia(klines):
+    """El DataFrame que construía obtener_datos_historicos_binance antes de los arrays tipados."""
+    df = pd.DataFrame(klines, columns=COLUMNAS_BINANCE)
+    if df.empty:
+        return df
+    for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df['Open Time'] = pd.to_datetime(df['Open Time'], unit='ms')
+    return df
+
+
+@pytest.fixture(scope='module')
+def klines():
+    cliente = ClienteBinanceFalso(num_simbolos=1, latencia=0, probabilidad_429=0)
+    return cliente.get_klines(cliente.simbolos[0], '1h', limit=1000)
+
+
+def test_array_a_dataframe_igual_que_el_dataframe_de_pandas(klines):
+    referencia = dataframe_de_referencia(klines)[list(DTYPE_KLINES.names)]
+
+    df = array_a_dataframe(klines_a_array(klines))
+
+    assert list(df.columns) == list(DTYPE_KLINES.names)
+    pd.testing.assert_frame_equal(df, referencia, check_exact=True)
+
+
+@pytest.mark.parametrize('decodificar', DECODIFICADORES)
+def test_cuerpo_json_igual_que_la_lista_de_python_binance(klines, decodificar, monkeypatch):
+    monkeypatch.setattr(parser_klines, '_decodificar_json', decodificar)
+    cuerpo = json.dumps(klines).encode('utf-8')
+
+    df = array_a_dataframe(klines_json_a_array(cuerpo))
+
+    pd.testing.assert_frame_equal(df, dataframe_de_referencia(klines)[list(DTYPE_KLINES.names)], check_exact=True)
+
+
+def test_sin_velas():
+    datos = klines_a_array([])
+
+    assert datos.dtype == DTYPE_KLINES and len(datos) == 0
+    assert array_a_dataframe(datos).empty